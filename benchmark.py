@@ -0,0 +1,622 @@
+#!/usr/bin/env python3
+"""
+Offline Benchmark Suite
+Drives the TradingBot handlers against in-process fakes for Discord guilds, members
+and channels plus the local mock price server, and reports throughput and latency
+percentiles per scenario. Runs fully offline; no Discord token or API keys needed.
+
+    python benchmark.py                          # every scenario at default sizes
+    python benchmark.py joins expiries --joins 20000
+    python benchmark.py --json results.json      # save results
+    python benchmark.py --baseline results.json  # fail (exit 1) on a regression
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+import main
+from mock_price_server import MockPriceServer
+
+AUTO_ROLE_ID = 900_000_000_000_000_001
+GIVEAWAY_ROLE_ID = 900_000_000_000_000_002
+GUILD_ID = 910_000_000_000_000_000
+SIGNAL_CHANNEL_ID = 920_000_000_000_000_001
+GIVEAWAY_CHANNEL_ID = 920_000_000_000_000_002
+CHAT_CHANNEL_ID = 920_000_000_000_000_003
+MEMBER_ID_BASE = 1_100_000_000_000_000_000
+
+
+# ===== FAKE DISCORD =====
+
+class FakeDiscord:
+    """Shared state for the fakes: simulated REST latency and every object by id"""
+
+    def __init__(self, rest_latency: float = 0.0):
+        self.rest_latency = rest_latency
+        self.rest_calls = 0
+        self.channels: Dict[int, "FakeChannel"] = {}
+        self.guilds: Dict[int, "FakeGuild"] = {}
+        self._next_id = 950_000_000_000_000_000
+
+    def new_id(self) -> int:
+        self._next_id += 1
+        return self._next_id
+
+    async def rest(self):
+        """Stand-in for one REST round trip; always yields to the loop like a real request"""
+        self.rest_calls += 1
+        await asyncio.sleep(self.rest_latency)
+
+
+class FakeRole:
+    __slots__ = ("id", "name")
+
+    def __init__(self, role_id: int, name: str):
+        self.id = role_id
+        self.name = name
+
+
+class FakeInvite:
+    __slots__ = ("code", "uses", "max_uses", "inviter", "guild")
+
+    def __init__(self, code: str, inviter: "FakeMember", guild: "FakeGuild"):
+        self.code = code
+        self.uses = 0
+        self.max_uses = 0
+        self.inviter = inviter
+        self.guild = guild
+
+
+class FakeMessage:
+    __slots__ = ("id", "channel", "author", "content", "guild", "created_at", "reactions", "replies")
+
+    def __init__(self, discord_: FakeDiscord, channel: "FakeChannel", author, content: str):
+        self.id = discord_.new_id()
+        self.channel = channel
+        self.author = author
+        self.content = content
+        self.guild = channel.guild
+        self.created_at = datetime.now(timezone.utc)
+        self.reactions = []
+        self.replies = 0
+
+    async def reply(self, content=None, **kwargs):
+        await self.channel.discord.rest()
+        self.replies += 1
+
+
+class FakeChannel:
+    def __init__(self, discord_: FakeDiscord, channel_id: int, guild: Optional["FakeGuild"] = None):
+        self.discord = discord_
+        self.id = channel_id
+        self.guild = guild
+        self.mention = f"<#{channel_id}>"
+        self.sent = 0
+        self.last_sent_at = None
+        discord_.channels[channel_id] = self
+
+    async def send(self, content=None, **kwargs):
+        await self.discord.rest()
+        self.sent += 1
+        self.last_sent_at = time.perf_counter()
+
+    async def fetch_message(self, message_id: int) -> FakeMessage:
+        await self.discord.rest()
+        return FakeMessage(self.discord, self, None, "")
+
+
+class FakeMember:
+    __slots__ = ("discord", "id", "guild", "roles", "bot", "display_name", "name", "mention", "dm_channel",
+                 "role_added_at", "role_removed_at", "dms")
+
+    def __init__(self, discord_: FakeDiscord, member_id: int, guild: "FakeGuild", roles=(), bot: bool = False):
+        self.discord = discord_
+        self.id = member_id
+        self.guild = guild
+        self.roles = list(roles)
+        self.bot = bot
+        self.display_name = self.name = f"member-{member_id % 1_000_000}"
+        self.mention = f"<@{member_id}>"
+        self.dm_channel = None
+        self.role_added_at = None
+        self.role_removed_at = None
+        self.dms = 0
+
+    async def add_roles(self, *roles, reason=None):
+        await self.discord.rest()
+        self.roles.extend(role for role in roles if role not in self.roles)
+        self.role_added_at = time.perf_counter()
+
+    async def remove_roles(self, *roles, reason=None):
+        await self.discord.rest()
+        self.roles = [role for role in self.roles if role not in roles]
+        self.role_removed_at = time.perf_counter()
+
+    async def create_dm(self) -> FakeChannel:
+        await self.discord.rest()
+        self.dm_channel = FakeChannel(self.discord, self.discord.new_id())
+        return self.dm_channel
+
+
+class FakeGuild:
+    def __init__(self, discord_: FakeDiscord, guild_id: int, name: str):
+        self.discord = discord_
+        self.id = guild_id
+        self.name = name
+        self.chunked = True
+        self.roles: Dict[int, FakeRole] = {}
+        self.members: Dict[int, FakeMember] = {}
+        self.invite_list: List[FakeInvite] = []
+        discord_.guilds[guild_id] = self
+
+    def add_role(self, role_id: int, name: str) -> FakeRole:
+        role = self.roles[role_id] = FakeRole(role_id, name)
+        return role
+
+    def add_member(self, member_id: int, roles=(), bot: bool = False) -> FakeMember:
+        member = self.members[member_id] = FakeMember(self.discord, member_id, self, roles, bot)
+        return member
+
+    def get_role(self, role_id: int) -> Optional[FakeRole]:
+        return self.roles.get(role_id)
+
+    def get_member(self, member_id: int) -> Optional[FakeMember]:
+        return self.members.get(member_id)
+
+    async def invites(self) -> List[FakeInvite]:
+        await self.discord.rest()
+        return list(self.invite_list)
+
+    async def query_members(self, user_ids=None, limit=5, cache=True) -> List[FakeMember]:
+        await self.discord.rest()
+        return [self.members[user_id] for user_id in user_ids if user_id in self.members]
+
+    async def chunk(self):
+        await self.discord.rest()
+
+
+class FakeResponse:
+    def __init__(self):
+        self.deferred = False
+
+    async def defer(self, **kwargs):
+        self.deferred = True
+
+    async def send_message(self, *args, **kwargs):
+        pass
+
+
+class FakeFollowup:
+    async def send(self, *args, **kwargs):
+        pass
+
+
+class FakeInteraction:
+    def __init__(self, user, guild: FakeGuild):
+        self.user = user
+        self.guild = guild
+        self.response = FakeResponse()
+        self.followup = FakeFollowup()
+
+
+# ===== HARNESS =====
+
+def percentile(samples: List[float], p: float) -> Optional[float]:
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p))]
+
+
+def result(name: str, ops: int, elapsed: float, latencies: List[float], notes: str = "") -> Dict:
+    return {
+        "scenario": name,
+        "ops": ops,
+        "seconds": round(elapsed, 3),
+        "ops_per_second": round(ops / elapsed, 1) if elapsed > 0 else None,
+        "p50_ms": round(percentile(latencies, 0.5) * 1000, 2) if latencies else None,
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2) if latencies else None,
+        "max_ms": round(max(latencies) * 1000, 2) if latencies else None,
+        "notes": notes,
+    }
+
+
+class Harness:
+    """Wires main.bot to the fakes and the mock price server and resets state between scenarios"""
+
+    def __init__(self, args: argparse.Namespace):
+        self.args = args
+        self.bot = main.bot
+        self.discord = FakeDiscord(args.rest_latency)
+        self.guild = FakeGuild(self.discord, GUILD_ID, "Benchmark Guild")
+        self.auto_role = self.guild.add_role(AUTO_ROLE_ID, "Premium Trial")
+        self.giveaway_role = self.guild.add_role(GIVEAWAY_ROLE_ID, "Giveaway Eligible")
+        for level, role_id in main.LEVEL_SYSTEM["level_roles"].items():
+            self.guild.add_role(role_id, f"Level {level}")
+        self.owner = self.guild.add_member(int(main.BOT_OWNER_USER_ID or 1))
+        self.inviter = self.guild.add_member(self.discord.new_id())
+        self.invite = FakeInvite("benchmk1", self.inviter, self.guild)
+        self.guild.invite_list.append(self.invite)
+        self.signal_channel = FakeChannel(self.discord, SIGNAL_CHANNEL_ID, self.guild)
+        self.giveaway_channel = FakeChannel(self.discord, GIVEAWAY_CHANNEL_ID, self.guild)
+        self.chat_channel = FakeChannel(self.discord, CHAT_CHANNEL_ID, self.guild)
+        self.log_channel = FakeChannel(self.discord, main.LOG_CHANNEL_ID, self.guild)
+        self.prices = MockPriceServer()
+        self._next_member = MEMBER_ID_BASE
+
+    def new_member_id(self) -> int:
+        self._next_member += 4_194_304  # spread like snowflakes
+        return self._next_member
+
+    async def setup(self):
+        self.prices.configure(latency=self.args.provider_latency, rate_limit=self.args.provider_rate_limit)
+        await self.prices.start()
+        bot = self.bot
+        bot.get_guild = self.discord.guilds.get
+        bot.get_channel = self.discord.channels.get
+        bot.get_partial_messageable = lambda channel_id, **kwargs: self.discord.channels[channel_id]
+        if not self.args.real_limits:
+            # Fake Discord has no rate limits; pace nothing so the scenarios measure the bot's own code
+            bot.rate_limiter = main.RouteRateLimiter({route: (1_000_000, 1.0) for route in main.DISCORD_ROUTE_LIMITS})
+
+        main.AUTO_ROLE_CONFIG["enabled"] = True
+        main.AUTO_ROLE_CONFIG["role_id"] = AUTO_ROLE_ID
+        main.PRICE_TRACKING_CONFIG["enabled"] = True
+        main.PRICE_TRACKING_CONFIG["api_endpoints"] = self.prices.endpoints()
+        for key in main.PRICE_TRACKING_CONFIG["api_keys"]:
+            main.PRICE_TRACKING_CONFIG["api_keys"][key] = "benchmark"
+        # Recorded ticks go to a scratch directory instead of the bot's tick_data
+        bot.ticks = main.TickStore(tempfile.mkdtemp(prefix="fxbot-ticks-"))
+
+        if self.args.database_url:
+            bot.db = await main.BotRepository.connect(self.args.database_url)
+            await bot.db.run_migrations()
+
+    async def teardown(self):
+        await self.bot.join_pipeline.stop()
+        await self.bot.dm_service.stop()
+        await self.prices.stop()
+        await self.bot.ticks.flush()
+        shutil.rmtree(self.bot.ticks.directory, ignore_errors=True)
+        if self.bot.db:
+            await self.bot.db.close()
+            self.bot.db = None
+
+    def reset(self):
+        """Clear the registries so scenarios do not see each other's state"""
+        main.AUTO_ROLE_CONFIG["active_members"].clear()
+        main.AUTO_ROLE_CONFIG["weekend_pending"].clear()
+        main.AUTO_ROLE_CONFIG["dm_schedule"].clear()
+        main.LEVEL_SYSTEM["user_data"].clear()
+        main.PRICE_TRACKING_CONFIG["active_trades"].clear()
+        main.ACTIVE_GIVEAWAYS.clear()
+        main.GIVEAWAY_MESSAGE_INDEX.clear()
+        main.INVITE_TRACKING.clear()
+        main.ROLE_HISTORY = main.MemberIdSet()
+        self.bot.log_sink._pending.clear()
+        self.bot.trade_stats.rollups.clear()
+        self.prices.reset_counters()
+
+    # ----- Scenarios -----
+
+    async def joins(self) -> Dict:
+        """A burst of member joins through on_member_join and the join pipeline"""
+        count = self.args.joins
+        members, submitted = [], {}
+        for _ in range(count):
+            members.append(self.guild.add_member(self.new_member_id()))
+
+        # Prime the invite cache as the invite_cache startup stage does
+        await self.bot.invite_cache.fetch(self.guild)
+        started = time.perf_counter()
+        for member in members:
+            self.invite.uses += 1
+            submitted[member.id] = time.perf_counter()
+            await self.bot.on_member_join(member)
+        pipeline = self.bot.join_pipeline
+        await pipeline.queue.join()
+        elapsed = time.perf_counter() - started
+
+        latencies = [member.role_added_at - submitted[member.id] for member in members if member.role_added_at]
+        return result("joins", count, elapsed, latencies,
+                      f"{len(latencies)} roles added, {pipeline.failed} failed; latency = join event to role added")
+
+    async def expiries(self) -> Dict:
+        """One role_removal_task pass over members whose trial has expired"""
+        count = self.args.expiries
+        expired_at = datetime.now(main.AMSTERDAM_TZ) - timedelta(hours=main.AUTO_ROLE_CONFIG["duration_hours"] + 1)
+        members = []
+        for _ in range(count):
+            member = self.guild.add_member(self.new_member_id(), roles=[self.auto_role])
+            main.AUTO_ROLE_CONFIG["active_members"][member.id] = main.ActiveMember(expired_at, AUTO_ROLE_ID, GUILD_ID)
+            members.append(member)
+
+        started = time.perf_counter()
+        await self.bot.role_removal_task()
+        elapsed = time.perf_counter() - started
+
+        latencies = [member.role_removed_at - started for member in members if member.role_removed_at]
+        return result("expiries", count, elapsed, latencies,
+                      f"{len(latencies)} roles removed; latency = tick start to role removed")
+
+    async def tracking(self) -> Dict:
+        """price_tracking_task ticks over many active trades; a share of them hit TP1 on the last tick"""
+        count, ticks = self.args.trades, self.args.ticks
+        pairs = list(self.prices.prices)
+        checks: List[float] = []
+        original = self.bot.check_price_levels
+
+        async def timed_check(message_id, trade_data):
+            check_started = time.perf_counter()
+            try:
+                return await original(message_id, trade_data)
+            finally:
+                checks.append(time.perf_counter() - check_started)
+
+        for index in range(count):
+            pair = pairs[index % len(pairs)]
+            price = self.prices.prices[pair]
+            pip = main.PAIR_CONFIG.get(pair, {}).get("pip_value", 0.0001)
+            message = FakeMessage(self.discord, self.signal_channel, self.owner, "")
+            main.PRICE_TRACKING_CONFIG["active_trades"][str(message.id)] = {
+                "pair": pair, "action": "BUY", "entry": price,
+                "tp1": price + 20 * pip, "tp2": price + 40 * pip, "tp3": price + 70 * pip, "sl": price - 50 * pip,
+                "status": "active", "tp_hits": [], "breakeven_active": False,
+                "channel_id": SIGNAL_CHANNEL_ID, "message_id": str(message.id),
+            }
+
+        self.bot.check_price_levels = timed_check
+        tick_durations = []
+        try:
+            started = time.perf_counter()
+            for tick in range(ticks):
+                if tick == ticks - 1:
+                    # Move the first pair up past TP1 so the last tick also exercises the hit path
+                    pip = main.PAIR_CONFIG.get(pairs[0], {}).get("pip_value", 0.0001)
+                    self.prices.set_price(pairs[0], self.prices.prices[pairs[0]] + 25 * pip)
+                tick_started = time.perf_counter()
+                await self.bot.price_tracking_task()
+                tick_durations.append(time.perf_counter() - tick_started)
+            elapsed = time.perf_counter() - started
+        finally:
+            del self.bot.check_price_levels
+
+        requests = sum(self.prices.requests.values())
+        limited = sum(counts.get("rate_limited", 0) for counts in self.prices.responses.values())
+        hits = sum(1 for trade in main.PRICE_TRACKING_CONFIG["active_trades"].values() if trade["tp_hits"])
+        return result("tracking", len(checks), elapsed, checks,
+                      f"{ticks} ticks, slowest {max(tick_durations):.2f}s; {requests} provider requests ({limited} got 429); "
+                      f"{hits} TP1 hits; latency = one trade check")
+
+    async def signals(self) -> Dict:
+        """Signal messages through on_message: parse plus the all-provider price verification"""
+        count = self.args.signals
+        pairs = list(self.prices.prices)
+        latencies = []
+        started = time.perf_counter()
+        for index in range(count):
+            pair = pairs[index % len(pairs)]
+            price = self.prices.prices[pair]
+            content = (f"Trade Signal For: {pair[:3]}/{pair[3:]}\nBUY\nEntry: {price}\n"
+                       f"TP1: {price * 1.002:.5f}\nTP2: {price * 1.004:.5f}\nTP3: {price * 1.007:.5f}\n"
+                       f"SL: {price * 0.995:.5f}")
+            message = FakeMessage(self.discord, self.signal_channel, self.owner, content)
+            message_started = time.perf_counter()
+            await self.bot.on_message(message)
+            latencies.append(time.perf_counter() - message_started)
+        elapsed = time.perf_counter() - started
+
+        tracked = len(main.PRICE_TRACKING_CONFIG["active_trades"])
+        return result("signals", count, elapsed, latencies, f"{tracked} of {count} signals tracked")
+
+    def seed_levels(self):
+        """Level records for every user; the top ones are also guild members for the leaderboard"""
+        users = self.args.users
+        ids = [MEMBER_ID_BASE + 7 + index * 4_194_304 for index in range(users)]
+        for user_id in ids:
+            count = random.randint(0, 600)
+            main.LEVEL_SYSTEM["user_data"][user_id] = main.LevelRecord(
+                count, self.bot.calculate_level(count), GUILD_ID)
+            self.guild.add_member(user_id)
+        return ids
+
+    async def messages(self) -> Dict:
+        """Chat messages through on_message into the level system"""
+        ids = self.seed_levels()
+        count = self.args.messages
+        latencies = []
+        started = time.perf_counter()
+        for _ in range(count):
+            author = self.guild.members[random.choice(ids)]
+            message = FakeMessage(self.discord, self.chat_channel, author, "gm")
+            message_started = time.perf_counter()
+            await self.bot.on_message(message)
+            latencies.append(time.perf_counter() - message_started)
+        elapsed = time.perf_counter() - started
+        return result("messages", count, elapsed, latencies, f"{self.args.users:,} users with level records")
+
+    async def leaderboard(self) -> Dict:
+        """/level show_leaderboard over every level record"""
+        if not main.LEVEL_SYSTEM["user_data"]:
+            self.seed_levels()
+        count = self.args.leaderboards
+        latencies = []
+        started = time.perf_counter()
+        for _ in range(count):
+            interaction = FakeInteraction(self.owner, self.guild)
+            command_started = time.perf_counter()
+            await main.level_command.callback(interaction, show_leaderboard=True)
+            latencies.append(time.perf_counter() - command_started)
+        elapsed = time.perf_counter() - started
+        return result("leaderboard", count, elapsed, latencies,
+                      f"{len(main.LEVEL_SYSTEM['user_data']):,} users ranked per call")
+
+    async def giveaways(self) -> Dict:
+        """end_giveaway for giveaways with many participants"""
+        count, participants = self.args.giveaways, self.args.participants
+        ids = []
+        for giveaway_index in range(count):
+            members = [self.guild.add_member(self.new_member_id(), roles=[self.giveaway_role])
+                       for _ in range(participants)]
+            giveaway = main.Giveaway(
+                self.discord.new_id(), GIVEAWAY_CHANNEL_ID, self.owner.id, GIVEAWAY_ROLE_ID, 3,
+                datetime.now(main.AMSTERDAM_TZ), participants={member.id for member in members})
+            giveaway_id = f"benchmark_{giveaway_index}"
+            self.bot.track_giveaway(giveaway_id, giveaway)
+            ids.append(giveaway_id)
+
+        latencies = []
+        started = time.perf_counter()
+        for giveaway_id in ids:
+            giveaway_started = time.perf_counter()
+            await main.end_giveaway(giveaway_id)
+            latencies.append(time.perf_counter() - giveaway_started)
+        elapsed = time.perf_counter() - started
+        ended = count - len(main.ACTIVE_GIVEAWAYS)
+        return result("giveaways", count, elapsed, latencies, f"{ended} ended, {participants:,} participants each")
+
+    async def backtest(self) -> Dict:
+        """run_backtest over synthetic 1-minute bars, one call per pair as loaded by /backtest"""
+        if not main.NUMPY_AVAILABLE:
+            return result("backtest", 0, 0.0, [], "skipped: NumPy not installed")
+        np = main.np
+        count, bars = self.args.backtest_signals, self.args.backtest_days * 1440
+        pairs = list(main.PAIR_CONFIG)[:8]
+        rng = np.random.default_rng(self.args.seed)
+        ts = np.arange(bars, dtype=np.int64) * 60_000
+        series = {}
+        for pair in pairs:
+            price = 1.0 * np.exp(np.cumsum(rng.normal(0, 0.0003, bars)))
+            series[pair] = (ts, price, price * 1.0001, price * 0.9999)
+        signals = [{"pair": pairs[index % len(pairs)], "action": random.choice(("BUY", "SELL")),
+                    "timestamp": int(ts[random.randrange(bars)]),
+                    "entry": 0.0, "tp1": 0.0, "tp2": 0.0, "tp3": 0.0, "sl": 0.0} for index in range(count)]
+
+        latencies = []
+        started = time.perf_counter()
+        for pair in pairs:
+            pair_started = time.perf_counter()
+            main.run_backtest([signal for signal in signals if signal["pair"] == pair], {pair: series[pair]},
+                              self.bot.calculate_live_tracking_levels)
+            latencies.append(time.perf_counter() - pair_started)
+        elapsed = time.perf_counter() - started
+        return result("backtest", count, elapsed, latencies,
+                      f"{len(pairs)} pairs x {bars:,} bars; latency = one pair")
+
+
+SCENARIOS = ("joins", "expiries", "tracking", "signals", "messages", "leaderboard", "giveaways", "backtest")
+
+
+def compare(results: List[Dict], baseline_path: str, tolerance: float) -> List[str]:
+    """Regressions against a saved run: throughput down or p99 up by more than `tolerance`"""
+    with open(baseline_path) as handle:
+        baseline = {entry["scenario"]: entry for entry in json.load(handle)["results"]}
+    regressions = []
+    for entry in results:
+        before = baseline.get(entry["scenario"])
+        if not before:
+            continue
+        if before["ops_per_second"] and entry["ops_per_second"] is not None and \
+                entry["ops_per_second"] < before["ops_per_second"] * (1 - tolerance):
+            regressions.append(f"{entry['scenario']}: throughput {before['ops_per_second']} -> {entry['ops_per_second']} ops/s")
+        if before["p99_ms"] and entry["p99_ms"] is not None and entry["p99_ms"] > before["p99_ms"] * (1 + tolerance):
+            regressions.append(f"{entry['scenario']}: p99 {before['p99_ms']} -> {entry['p99_ms']} ms")
+    return regressions
+
+
+def print_table(results: List[Dict]):
+    print(f"{'scenario':<12} {'ops':>8} {'seconds':>9} {'ops/s':>10} {'p50 ms':>9} {'p99 ms':>9} {'max ms':>9}  notes")
+    for entry in results:
+        def cell(value, width):
+            return f"{value:>{width}}" if value is not None else f"{'-':>{width}}"
+        print(f"{entry['scenario']:<12} {entry['ops']:>8} {entry['seconds']:>9} {cell(entry['ops_per_second'], 10)} "
+              f"{cell(entry['p50_ms'], 9)} {cell(entry['p99_ms'], 9)} {cell(entry['max_ms'], 9)}  {entry['notes']}")
+
+
+async def run(args: argparse.Namespace) -> List[Dict]:
+    harness = Harness(args)
+    await harness.setup()
+    results = []
+    try:
+        for name in args.scenarios or SCENARIOS:
+            harness.reset()
+            print(f"⏱️ Running {name}...", file=sys.stderr)
+            # The handlers print a line per event; keep that out of the report
+            with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                results.append(await getattr(harness, name)())
+    finally:
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            await harness.teardown()
+    return results
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Offline benchmarks for the trading bot's hot paths")
+    parser.add_argument("scenarios", nargs="*", metavar="scenario",
+                        help=f"scenarios to run (default: all of {', '.join(SCENARIOS)})")
+    parser.add_argument("--joins", type=int, default=10_000, help="member joins (default: one busy hour, 10k)")
+    parser.add_argument("--expiries", type=int, default=10_000, help="expired trial roles in one removal pass")
+    parser.add_argument("--trades", type=int, default=1_000, help="active trades tracked")
+    parser.add_argument("--ticks", type=int, default=3, help="price tracking ticks")
+    parser.add_argument("--signals", type=int, default=200, help="signal messages")
+    parser.add_argument("--users", type=int, default=100_000, help="users with level records")
+    parser.add_argument("--messages", type=int, default=20_000, help="chat messages for the level system")
+    parser.add_argument("--leaderboards", type=int, default=20, help="leaderboard commands")
+    parser.add_argument("--giveaways", type=int, default=5, help="giveaways ended")
+    parser.add_argument("--participants", type=int, default=10_000, help="participants per giveaway")
+    parser.add_argument("--backtest-signals", type=int, default=5_000, help="signals replayed by the backtest")
+    parser.add_argument("--backtest-days", type=int, default=30, help="days of 1-minute bars per pair for the backtest")
+    parser.add_argument("--rest-latency", type=float, default=0.0,
+                        help="seconds each fake Discord REST call takes (default 0: measure only the bot's code)")
+    parser.add_argument("--provider-latency", type=float, default=0.0, help="seconds the mock price APIs take per request")
+    parser.add_argument("--provider-rate-limit", type=float, default=0.0,
+                        help="share of mock price API requests answered with 429 (0-1)")
+    parser.add_argument("--real-limits", action="store_true",
+                        help="keep DISCORD_ROUTE_LIMITS pacing (slow: joins are paced to 1 role add per second)")
+    parser.add_argument("--database-url", help="also write through BotRepository to this SCRATCH database")
+    parser.add_argument("--seed", type=int, default=1, help="random seed")
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--baseline", help="results file from an earlier run; exit 1 on regressions")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed regression vs the baseline (0.25 = 25%%)")
+    args = parser.parse_args(argv)
+    unknown = [name for name in args.scenarios if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenario(s): {', '.join(unknown)}")
+    return args
+
+
+def cli(argv=None) -> int:
+    args = parse_args(argv)
+    random.seed(args.seed)
+    results = asyncio.run(run(args))
+    print_table(results)
+
+    if args.json:
+        with open(args.json, "w") as handle:
+            json.dump({"created_at": datetime.now(timezone.utc).isoformat(), "args": vars(args), "results": results},
+                      handle, indent=2)
+        print(f"\n📄 Results written to {args.json}")
+
+    if args.baseline:
+        regressions = compare(results, args.baseline, args.tolerance)
+        if regressions:
+            print("\n❌ Regressions against the baseline:")
+            for line in regressions:
+                print(f"   {line}")
+            return 1
+        print("\n✅ No regressions against the baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(cli())
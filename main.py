@@ -8,7 +8,9 @@ Discord Trading Bot - Professional Signal Distribution System
 DEPLOYMENT INFO:
 - Hosted on Render.com web service (24/7 uptime)
 - PostgreSQL database managed by Render
-- Health endpoint: /health for monitoring
+- Health endpoint: /health for monitoring (cached snapshot), /livez and /readyz for probes
+- Metrics endpoint: /metrics (Prometheus text format, METRICS_TOKEN bearer auth if set)
+- Debug endpoints: /debug/profile and /debug/memory (need DEBUG_TOKEN bearer auth)
 - Environment variables set in Render dashboard
 - Manual deployments via render.yaml configuration
 
@@ -25,9 +27,23 @@ import asyncio
 import aiohttp
 from aiohttp import web
 import json
+import hashlib
 from datetime import datetime, timedelta, timezone
 import asyncpg
+import io
 import logging
+import mmap
+import shutil
+import sys
+import threading
+import time
+import tracemalloc
+import heapq
+import random
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
 from typing import Optional, Dict
 import re
 
@@ -40,6 +56,15 @@ except ImportError:
     PYTZ_AVAILABLE = False
     print("⚠️ Pytz not available - Using basic timezone handling")
 
+# Try to import NumPy for zero-copy tick replay, fallback to memoryviews over mmap if not available
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+    print("✅ NumPy loaded - Zero-copy tick replay enabled")
+except ImportError:
+    NUMPY_AVAILABLE = False
+    print("⚠️ NumPy not available - Tick replay uses plain memoryviews")
+
 # Telegram integration removed as per user request
 
 # Price tracking APIs
@@ -98,19 +123,26 @@ AUTO_ROLE_CONFIG = {
     "duration_hours": 24,  # Fixed at 24 hours
     "custom_message":
     "Hey! Your **24-hour free access** to the <#1350929852299214999> channel has unfortunately **ran out**. We truly hope you were able to benefit with us & we hope to see you back soon! For now, feel free to continue following our trade signals in ⁠<#1350929790148022324>",
-    "active_members":
-    {},  # member_id: {"role_added_time": datetime, "role_id": role_id, "weekend_delayed": bool, "guild_id": guild_id, "expiry_time": datetime}
-    "weekend_pending":
-    {},  # member_id: {"join_time": datetime, "guild_id": guild_id} for weekend joiners
-    "role_history":
-    {},  # member_id: {"first_granted": datetime, "times_granted": int, "last_expired": datetime, "guild_id": guild_id}
-    "dm_schedule": {
-    }  # member_id: {"role_expired": datetime, "guild_id": guild_id, "dm_3_sent": bool, "dm_7_sent": bool, "dm_14_sent": bool}
+    "active_members": {},  # member_id (int): ActiveMember
+    "weekend_pending": {},  # member_id (int): WeekendPending, for weekend joiners
+    "dm_schedule": {}  # member_id (int): FollowupSchedule
 }
 
+# Sync slash commands to this guild only (instant updates while iterating) instead of globally
+COMMAND_SYNC_GUILD_ID = os.getenv("COMMAND_SYNC_GUILD_ID")
+# Set to "true" to sync even when the command tree hash is unchanged
+FORCE_COMMAND_SYNC = os.getenv("FORCE_COMMAND_SYNC", "false").lower() == "true"
+
 # Log channel ID for Discord logging
 LOG_CHANNEL_ID = 1350888185487429642
 
+# Log channel per severity (errors/warnings can be split out via environment variables)
+LOG_ROUTES = {
+    "error": int(os.getenv("LOG_ERROR_CHANNEL_ID", LOG_CHANNEL_ID)),
+    "warning": int(os.getenv("LOG_WARNING_CHANNEL_ID", LOG_CHANNEL_ID)),
+    "info": LOG_CHANNEL_ID,
+}
+
 # Gold Pioneer role ID for checking membership before sending follow-up DMs
 GOLD_PIONEER_ROLE_ID = 1384489575187091466
 
@@ -118,10 +150,11 @@ GOLD_PIONEER_ROLE_ID = 1384489575187091466
 GIVEAWAY_CHANNEL_ID = 1405490561963786271
 
 # Global storage for active giveaways
-ACTIVE_GIVEAWAYS = {}  # giveaway_id: {message_id, participants, settings, etc}
+ACTIVE_GIVEAWAYS = {}  # giveaway_id: Giveaway
+GIVEAWAY_MESSAGE_INDEX = {}  # message_id: giveaway_id, for reaction lookups
 
 # Global storage for invite tracking
-INVITE_TRACKING = {}  # invite_code: {"nickname": str, "total_joins": int, "total_left": int, "current_members": int, "creator_id": int, "guild_id": int}
+INVITE_TRACKING = {}  # invite_code: InviteStats
 
 # Live price tracking system configuration
 PRICE_TRACKING_CONFIG = {
@@ -147,10 +180,14 @@ PRICE_TRACKING_CONFIG = {
     "api_rotation_index": 0  # for rotating through APIs efficiently
 }
 
+# Point the price APIs elsewhere (e.g. a local mock_price_server.py) without code changes
+if os.getenv("PRICE_API_ENDPOINTS"):
+    PRICE_TRACKING_CONFIG["api_endpoints"].update(json.loads(os.getenv("PRICE_API_ENDPOINTS")))
+
 # Level system configuration
 LEVEL_SYSTEM = {
     "enabled": True,
-    "user_data": {},  # user_id: {"message_count": int, "current_level": int, "guild_id": guild_id}
+    "user_data": {},  # user_id (int): LevelRecord
     "level_requirements": {
         1: 10,      # Level 1: 10 messages (very easy start)
         2: 25,      # Level 2: 25 messages (easy)
@@ -182,32 +219,3147 @@ else:
     AMSTERDAM_TZ = timezone(
         timedelta(hours=1))  # Basic Amsterdam timezone without DST
 
+# Versioned database schema migrations, applied in order by BotRepository.run_migrations().
+# Each entry is (version, description, [statements]). Never edit a released migration -
+# append a new one instead so every deployment converges on the same schema.
+SCHEMA_MIGRATIONS = [
+    (1, "baseline tables", [
+        '''
+        CREATE TABLE IF NOT EXISTS role_history (
+            member_id BIGINT PRIMARY KEY,
+            first_granted TIMESTAMP WITH TIME ZONE NOT NULL,
+            times_granted INTEGER DEFAULT 1,
+            last_expired TIMESTAMP WITH TIME ZONE,
+            guild_id BIGINT NOT NULL
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS active_members (
+            member_id BIGINT PRIMARY KEY,
+            role_added_time TIMESTAMP WITH TIME ZONE NOT NULL,
+            role_id BIGINT NOT NULL,
+            guild_id BIGINT NOT NULL,
+            weekend_delayed BOOLEAN DEFAULT FALSE,
+            expiry_time TIMESTAMP WITH TIME ZONE,
+            custom_duration BOOLEAN DEFAULT FALSE
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS weekend_pending (
+            member_id BIGINT PRIMARY KEY,
+            join_time TIMESTAMP WITH TIME ZONE NOT NULL,
+            guild_id BIGINT NOT NULL
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS dm_schedule (
+            member_id BIGINT PRIMARY KEY,
+            role_expired TIMESTAMP WITH TIME ZONE NOT NULL,
+            guild_id BIGINT NOT NULL,
+            dm_3_sent BOOLEAN DEFAULT FALSE,
+            dm_7_sent BOOLEAN DEFAULT FALSE,
+            dm_14_sent BOOLEAN DEFAULT FALSE
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS auto_role_config (
+            id SERIAL PRIMARY KEY,
+            enabled BOOLEAN DEFAULT FALSE,
+            role_id BIGINT,
+            duration_hours INTEGER DEFAULT 24,
+            custom_message TEXT
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS bot_status (
+            id INTEGER PRIMARY KEY DEFAULT 1,
+            last_online TIMESTAMP WITH TIME ZONE,
+            heartbeat_time TIMESTAMP WITH TIME ZONE,
+            CONSTRAINT single_row_constraint UNIQUE (id)
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS user_levels (
+            user_id BIGINT PRIMARY KEY,
+            message_count INTEGER DEFAULT 0,
+            current_level INTEGER DEFAULT 0,
+            guild_id BIGINT NOT NULL
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS invite_tracking (
+            invite_code VARCHAR(20) PRIMARY KEY,
+            guild_id BIGINT NOT NULL,
+            creator_id BIGINT NOT NULL,
+            nickname VARCHAR(255),
+            total_joins INTEGER DEFAULT 0,
+            total_left INTEGER DEFAULT 0,
+            current_members INTEGER DEFAULT 0,
+            created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+            last_updated TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS member_joins (
+            id SERIAL PRIMARY KEY,
+            member_id BIGINT NOT NULL,
+            guild_id BIGINT NOT NULL,
+            invite_code VARCHAR(20),
+            joined_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+            left_at TIMESTAMP WITH TIME ZONE NULL,
+            is_currently_member BOOLEAN DEFAULT TRUE
+        )
+        ''',
+    ]),
+    (2, "member_joins and expiry indexes", [
+        # track_member_leave: WHERE member_id AND guild_id AND is_currently_member ORDER BY joined_at DESC
+        '''
+        CREATE INDEX IF NOT EXISTS idx_member_joins_current_member
+        ON member_joins (member_id, guild_id, joined_at DESC)
+        WHERE is_currently_member
+        ''',
+        # Per-invite retention queries and the /invitetracking reset cleanup
+        '''
+        CREATE INDEX IF NOT EXISTS idx_member_joins_invite_code
+        ON member_joins (invite_code)
+        WHERE invite_code IS NOT NULL
+        ''',
+        '''
+        CREATE INDEX IF NOT EXISTS idx_active_members_expiry
+        ON active_members (expiry_time)
+        WHERE expiry_time IS NOT NULL
+        ''',
+        '''
+        CREATE INDEX IF NOT EXISTS idx_dm_schedule_pending
+        ON dm_schedule (role_expired)
+        WHERE NOT dm_14_sent
+        ''',
+        '''
+        CREATE INDEX IF NOT EXISTS idx_user_levels_guild_rank
+        ON user_levels (guild_id, current_level DESC, message_count DESC)
+        ''',
+    ]),
+    (3, "scheduled jobs", [
+        '''
+        CREATE TABLE IF NOT EXISTS scheduled_jobs (
+            id BIGSERIAL PRIMARY KEY,
+            kind VARCHAR(32) NOT NULL,
+            member_id BIGINT NOT NULL,
+            guild_id BIGINT NOT NULL,
+            due_at TIMESTAMP WITH TIME ZONE NOT NULL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            locked_until TIMESTAMP WITH TIME ZONE,
+            last_error TEXT,
+            outcome VARCHAR(32),
+            completed_at TIMESTAMP WITH TIME ZONE,
+            created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+            UNIQUE (kind, member_id, guild_id, due_at)
+        )
+        ''',
+        # The dispatcher only ever reads open jobs in due order
+        '''
+        CREATE INDEX IF NOT EXISTS idx_scheduled_jobs_due
+        ON scheduled_jobs (due_at)
+        WHERE completed_at IS NULL
+        ''',
+        # Carry over follow-up DMs that were still outstanding in dm_schedule
+        '''
+        INSERT INTO scheduled_jobs (kind, member_id, guild_id, due_at)
+        SELECT 'followup_' || d.days, s.member_id, s.guild_id, s.role_expired + make_interval(days => d.days)
+        FROM dm_schedule s CROSS JOIN (VALUES (3), (7), (14)) AS d(days)
+        WHERE NOT COALESCE(CASE d.days WHEN 3 THEN s.dm_3_sent WHEN 7 THEN s.dm_7_sent ELSE s.dm_14_sent END, FALSE)
+        ON CONFLICT DO NOTHING
+        ''',
+        # ...and Monday activation DMs for weekend joiners whose access has not started yet.
+        # Weekend joins expire Monday 23:59; custom-duration grants also set weekend_delayed
+        '''
+        INSERT INTO scheduled_jobs (kind, member_id, guild_id, due_at)
+        SELECT 'monday_activation', member_id, guild_id,
+               ((expiry_time AT TIME ZONE 'Europe/Amsterdam')::date + TIME '00:01') AT TIME ZONE 'Europe/Amsterdam'
+        FROM active_members
+        WHERE weekend_delayed AND NOT COALESCE(custom_duration, FALSE) AND expiry_time > NOW()
+          AND EXTRACT(ISODOW FROM expiry_time AT TIME ZONE 'Europe/Amsterdam') = 1
+        ON CONFLICT DO NOTHING
+        ''',
+    ]),
+    (4, "persisted DM channels", [
+        '''
+        CREATE TABLE IF NOT EXISTS dm_channels (
+            user_id BIGINT PRIMARY KEY,
+            channel_id BIGINT NOT NULL,
+            updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+        )
+        ''',
+    ]),
+    (5, "command sync state", [
+        # scope is the guild id for per-guild syncs, 0 for the global command set
+        '''
+        CREATE TABLE IF NOT EXISTS command_sync_state (
+            scope BIGINT PRIMARY KEY,
+            command_hash VARCHAR(64) NOT NULL,
+            command_count INTEGER NOT NULL,
+            synced_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+        )
+        ''',
+    ]),
+    (6, "manual anti-abuse blocks", [
+        'ALTER TABLE role_history ADD COLUMN IF NOT EXISTS blocked_reason TEXT',
+        'ALTER TABLE role_history ADD COLUMN IF NOT EXISTS blocked_by BIGINT',
+        'ALTER TABLE role_history ADD COLUMN IF NOT EXISTS blocked_at TIMESTAMP WITH TIME ZONE',
+        'CREATE INDEX IF NOT EXISTS idx_role_history_blocked ON role_history(blocked_at) WHERE blocked_reason IS NOT NULL',
+    ]),
+    (7, "persisted giveaways", [
+        '''
+        CREATE TABLE IF NOT EXISTS giveaways (
+            giveaway_id VARCHAR(50) PRIMARY KEY,
+            message_id BIGINT NOT NULL,
+            channel_id BIGINT NOT NULL,
+            creator_id BIGINT NOT NULL,
+            required_role_id BIGINT NOT NULL,
+            winner_count INTEGER NOT NULL,
+            end_time TIMESTAMP WITH TIME ZONE NOT NULL,
+            message TEXT,
+            chosen_winners BIGINT[] NOT NULL DEFAULT '{}',
+            created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+            ended_at TIMESTAMP WITH TIME ZONE
+        )
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_giveaways_open ON giveaways(end_time) WHERE ended_at IS NULL',
+    ]),
+    (8, "giveaway participants", [
+        '''
+        CREATE TABLE IF NOT EXISTS giveaway_participants (
+            giveaway_id VARCHAR(50) NOT NULL,
+            user_id BIGINT NOT NULL,
+            entered_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+            PRIMARY KEY (giveaway_id, user_id)
+        )
+        ''',
+    ]),
+    (9, "closed-trade ledger and stats rollups", [
+        '''
+        CREATE TABLE IF NOT EXISTS closed_trades (
+            message_id VARCHAR(32) PRIMARY KEY,
+            channel_id BIGINT,
+            pair VARCHAR(16) NOT NULL,
+            action VARCHAR(4) NOT NULL,
+            outcome VARCHAR(16) NOT NULL,
+            entry DOUBLE PRECISION NOT NULL,
+            exit_price DOUBLE PRECISION NOT NULL,
+            pips DOUBLE PRECISION NOT NULL,
+            tp_hits TEXT[] NOT NULL DEFAULT '{}',
+            opened_at TIMESTAMP WITH TIME ZONE,
+            closed_at TIMESTAMP WITH TIME ZONE NOT NULL
+        )
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_closed_trades_closed_at ON closed_trades(closed_at)',
+        # period is 'all', 'day:YYYY-MM-DD', 'week:YYYY-Www' or 'month:YYYY-MM';
+        # bucket is 'all', 'pair:<PAIR>' or 'channel:<id>'
+        '''
+        CREATE TABLE IF NOT EXISTS trade_stats (
+            period VARCHAR(16) NOT NULL,
+            bucket VARCHAR(40) NOT NULL,
+            trades INTEGER NOT NULL DEFAULT 0,
+            wins INTEGER NOT NULL DEFAULT 0,
+            losses INTEGER NOT NULL DEFAULT 0,
+            breakevens INTEGER NOT NULL DEFAULT 0,
+            tp1_hits INTEGER NOT NULL DEFAULT 0,
+            tp2_hits INTEGER NOT NULL DEFAULT 0,
+            tp3_hits INTEGER NOT NULL DEFAULT 0,
+            pips DOUBLE PRECISION NOT NULL DEFAULT 0,
+            PRIMARY KEY (period, bucket)
+        )
+        ''',
+    ]),
+    (10, "drop Monday activation DMs carried over for custom grants", [
+        # Version 3 also carried over custom-duration grants, due on their expiry date instead of a Monday
+        '''
+        DELETE FROM scheduled_jobs
+        WHERE kind = 'monday_activation' AND completed_at IS NULL
+          AND (EXTRACT(ISODOW FROM due_at AT TIME ZONE 'Europe/Amsterdam') <> 1
+               OR member_id IN (SELECT member_id FROM active_members WHERE custom_duration))
+        ''',
+    ]),
+]
+
+# Arbitrary constant used as the advisory lock key so two instances never migrate concurrently
+SCHEMA_MIGRATION_LOCK_ID = 715_517_026
+
+
+# ===== METRICS =====
+# Latency buckets in seconds, shared by every histogram (provider calls, DB statements,
+# join-to-role, tracking ticks and event-loop lag all fall within this range)
+METRICS_LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+METRICS_CONFIG = {
+    "token": os.getenv("METRICS_TOKEN", ""),  # optional bearer token required by /metrics
+}
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple) -> str:
+    if not names:
+        return ""
+    pairs = []
+    for name, value in zip(names, values):
+        value = str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        pairs.append(f'{name}="{value}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, int) or float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Counter:
+    """Monotonic counter, optionally split by label values"""
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self.values: Dict[Tuple, float] = {}
+
+    def inc(self, *label_values, amount: float = 1):
+        self.values[label_values] = self.values.get(label_values, 0) + amount
+
+    def set_total(self, *label_values, value: float):
+        """Mirror a running total that another service already keeps"""
+        self.values[label_values] = value
+
+    def samples(self):
+        for label_values, value in self.values.items():
+            yield self.name, _format_labels(self.labels, label_values), value
+
+
+class Gauge(Counter):
+    """Point-in-time value, optionally split by label values"""
+    kind = "gauge"
+
+    def set(self, *label_values, value: float):
+        self.values[label_values] = value
+
+
+class Histogram:
+    """Cumulative bucket histogram, optionally split by label values"""
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = METRICS_LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self.buckets = buckets
+        self.values: Dict[Tuple, List] = {}  # label values: [bucket counts..., sum, count]
+
+    def observe(self, *label_values, value: float):
+        series = self.values.get(label_values)
+        if series is None:
+            series = self.values[label_values] = [0] * (len(self.buckets) + 2)
+        index = bisect_left(self.buckets, value)
+        if index < len(self.buckets):
+            series[index] += 1
+        series[-2] += value
+        series[-1] += 1
+
+    def samples(self):
+        for label_values, series in self.values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                yield (f"{self.name}_bucket",
+                       _format_labels(self.labels + ("le",), label_values + (_format_value(bound),)), cumulative)
+            yield (f"{self.name}_bucket",
+                   _format_labels(self.labels + ("le",), label_values + ("+Inf",)), series[-1])
+            yield f"{self.name}_sum", _format_labels(self.labels, label_values), series[-2]
+            yield f"{self.name}_count", _format_labels(self.labels, label_values), series[-1]
+
+
+class MetricsRegistry:
+    """Holds the bot's metrics and renders them in the Prometheus text format"""
+
+    def __init__(self):
+        self.metrics: Dict[str, object] = {}
+        self.collectors = []  # callables that refresh gauges from existing stats just before rendering
+
+    def _add(self, metric):
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help_text: str, labels: Tuple[str, ...] = ()) -> Counter:
+        return self._add(Counter(name, help_text, labels))
+
+    def gauge(self, name: str, help_text: str, labels: Tuple[str, ...] = ()) -> Gauge:
+        return self._add(Gauge(name, help_text, labels))
+
+    def histogram(self, name: str, help_text: str, labels: Tuple[str, ...] = ()) -> Histogram:
+        return self._add(Histogram(name, help_text, labels))
+
+    def add_collector(self, collector):
+        self.collectors.append(collector)
+
+    def render(self) -> str:
+        for collector in self.collectors:
+            try:
+                collector()
+            except Exception as e:
+                print(f"⚠️ Metrics collector {getattr(collector, '__name__', collector)} failed: {e}")
+
+        lines = []
+        for metric in self.metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{labels} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+METRICS = MetricsRegistry()
+PROVIDER_LATENCY = METRICS.histogram(
+    "fxbot_provider_request_seconds", "Price provider HTTP request latency", ("provider", "status"))
+PROVIDER_REQUESTS_TODAY = METRICS.gauge(
+    "fxbot_provider_requests_today", "Price provider requests made since UTC midnight (free tier quota usage)",
+    ("provider",))
+PROVIDER_LIMIT_HITS = METRICS.counter(
+    "fxbot_provider_limit_hits_total", "Price provider rate or usage limit responses", ("provider",))
+TRACKING_TICK = METRICS.histogram(
+    "fxbot_price_tracking_tick_seconds", "Duration of one price tracking pass over the active trades")
+TRADE_EVENTS = METRICS.counter(
+    "fxbot_trade_events_total", "TP, SL and breakeven hits detected by price tracking", ("event", "pair"))
+JOIN_TO_ROLE = METRICS.histogram(
+    "fxbot_join_to_role_seconds", "Time from the gateway member join to the auto role being added")
+DM_SENDS = METRICS.counter(
+    "fxbot_dm_sends_total", "DM send attempts by outcome", ("outcome",))
+DB_STATEMENT_LATENCY = METRICS.histogram(
+    "fxbot_db_statement_seconds", "Database statement latency", ("statement",))
+DB_POOL = METRICS.gauge(
+    "fxbot_db_pool_connections", "Database pool connections by state", ("state",))
+DISCORD_RATE_LIMITS = METRICS.counter(
+    "fxbot_discord_rate_limited_total", "429 responses reported by discord.py", ("scope",))
+DISCORD_PACING_WAITS = METRICS.counter(
+    "fxbot_discord_pacing_waits_total", "Times the route limiter delayed a request to stay under Discord limits",
+    ("route",))
+LOOP_LAG = METRICS.histogram(
+    "fxbot_event_loop_lag_seconds", "How late the event loop woke a sleeping sampler")
+SLOW_CALLBACKS = METRICS.counter(
+    "fxbot_slow_callbacks_total", "Event-loop callbacks that held the loop past the slow threshold", ("source",))
+SLOW_CALLBACK_SECONDS = METRICS.histogram(
+    "fxbot_slow_callback_seconds", "How long slow event-loop callbacks held the loop")
+
+# Request counts per provider for the current UTC day
+PROVIDER_USAGE = {"day": None, "requests": {}}
+
+
+def provider_for_url(url) -> str:
+    """Map a price API request URL back to its PRICE_TRACKING_CONFIG endpoint name"""
+    url = str(url)
+    for name, endpoint in PRICE_TRACKING_CONFIG["api_endpoints"].items():
+        if url.startswith(endpoint):
+            return name
+    return "other"
+
+
+def _record_provider_request(provider: str, status: str, elapsed: float):
+    PROVIDER_LATENCY.observe(provider, status, value=elapsed)
+    today = datetime.now(timezone.utc).date()
+    if PROVIDER_USAGE["day"] != today:
+        PROVIDER_USAGE["day"] = today
+        PROVIDER_USAGE["requests"] = {}
+        PROVIDER_REQUESTS_TODAY.values.clear()
+    count = PROVIDER_USAGE["requests"][provider] = PROVIDER_USAGE["requests"].get(provider, 0) + 1
+    PROVIDER_REQUESTS_TODAY.set(provider, value=count)
+
+
+async def _on_provider_request_start(session, context, params):
+    context.started = time.perf_counter()
+
+
+async def _on_provider_request_end(session, context, params):
+    _record_provider_request(provider_for_url(params.url), str(params.response.status),
+                             time.perf_counter() - context.started)
+
+
+async def _on_provider_request_exception(session, context, params):
+    _record_provider_request(provider_for_url(params.url), "error", time.perf_counter() - context.started)
+
+
+PROVIDER_TRACE = aiohttp.TraceConfig()
+PROVIDER_TRACE.on_request_start.append(_on_provider_request_start)
+PROVIDER_TRACE.on_request_end.append(_on_provider_request_end)
+PROVIDER_TRACE.on_request_exception.append(_on_provider_request_exception)
+
+
+def provider_session() -> aiohttp.ClientSession:
+    """ClientSession for price API calls that records per-provider latency and usage"""
+    return aiohttp.ClientSession(trace_configs=[PROVIDER_TRACE])
+
+
+class DiscordRateLimitCounter(logging.Handler):
+    """Counts the 429 warnings discord.py logs while it sleeps out a rate limit"""
+
+    def emit(self, record: logging.LogRecord):
+        message = record.msg if isinstance(record.msg, str) else ""
+        if message.startswith("We are being rate limited"):
+            DISCORD_RATE_LIMITS.inc("route")
+        elif message.startswith("Global rate limit"):
+            DISCORD_RATE_LIMITS.inc("global")
+
+
+logging.getLogger("discord.http").addHandler(DiscordRateLimitCounter(logging.WARNING))
+
+
+# ===== EVENT LOOP MONITOR =====
+# Gateway heartbeats, background loops, the web server and DB calls all share one
+# event loop, so any synchronous stretch longer than a few ms delays all of them.
+LOOP_MONITOR_CONFIG = {
+    "lag_interval": 0.5,                                          # seconds between lag samples
+    "slow_callback_ms": int(os.getenv("SLOW_CALLBACK_MS", "100")),  # report callbacks holding the loop this long
+    "recent_events": 50,                                          # slow callbacks kept for /debug
+}
+
+
+class LoopLagSampler:
+    """Sleeps for a fixed interval and records how late the event loop wakes it up"""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self.recent = deque(maxlen=600)  # last five minutes of samples at the default interval
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="loop_lag_sampler")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - expected)
+            self.last_lag = lag
+            self.max_lag = max(self.max_lag, lag)
+            self.recent.append(lag)
+            LOOP_LAG.observe(value=lag)
+
+    def percentile(self, p: float) -> Optional[float]:
+        samples = sorted(self.recent)
+        return samples[min(len(samples) - 1, int(len(samples) * p))] if samples else None
+
+
+def describe_callback(handle: asyncio.Handle) -> Tuple[str, str]:
+    """(stable source name, detail) for an event-loop callback; tasks report their coroutine and next await"""
+    callback = handle._callback
+    owner = getattr(callback, "__self__", None)
+    if isinstance(owner, asyncio.Task):
+        coro = owner.get_coro()
+        source = getattr(coro, "__qualname__", type(coro).__name__)
+        # Follow the await chain to the last frame in this file where the coroutine suspended after the slow step
+        frame, inner = None, coro
+        while inner is not None and getattr(inner, "cr_frame", None) is not None:
+            if frame is None or inner.cr_frame.f_code.co_filename == __file__:
+                frame = inner.cr_frame
+            inner = getattr(inner, "cr_await", None)
+        detail = f"task {owner.get_name()}"
+        if frame is not None:
+            detail += f", suspended in {frame.f_code.co_name} line {frame.f_lineno}"
+        elif owner.done():
+            detail += ", finished"
+        return source, detail
+    source = getattr(callback, "__qualname__", None) or repr(callback)
+    return source, "callback"
+
+
+class SlowCallbackMonitor:
+    """Times every event-loop callback and records the ones that hold the loop past the threshold"""
+
+    def __init__(self, threshold_ms: int, keep: int):
+        self.threshold = threshold_ms / 1000
+        self.recent = deque(maxlen=keep)         # (wall time, seconds, source, detail)
+        self.by_source: Dict[str, List] = {}     # source: [count, total seconds, max seconds]
+        self._original_run = None
+
+    def install(self):
+        """Wrap asyncio's Handle._run; costs two perf_counter calls per callback"""
+        if self._original_run is not None:
+            return
+        original = self._original_run = asyncio.events.Handle._run
+        monitor = self
+
+        def _run(handle):
+            started = time.perf_counter()
+            try:
+                return original(handle)
+            finally:
+                elapsed = time.perf_counter() - started
+                if elapsed >= monitor.threshold:
+                    monitor.record(handle, elapsed)
+
+        asyncio.events.Handle._run = _run
+
+    def uninstall(self):
+        if self._original_run is not None:
+            asyncio.events.Handle._run = self._original_run
+            self._original_run = None
+
+    def record(self, handle: asyncio.Handle, elapsed: float):
+        try:
+            source, detail = describe_callback(handle)
+        except Exception:
+            source, detail = repr(handle), "callback"
+        self.recent.append((datetime.now(timezone.utc), elapsed, source, detail))
+        stats = self.by_source.get(source)
+        if stats is None:
+            stats = self.by_source[source] = [0, 0.0, 0.0]
+        stats[0] += 1
+        stats[1] += elapsed
+        stats[2] = max(stats[2], elapsed)
+        SLOW_CALLBACKS.inc(source)
+        SLOW_CALLBACK_SECONDS.observe(value=elapsed)
+
+    def top(self, limit: int = 10) -> List[Tuple[str, List]]:
+        return sorted(self.by_source.items(), key=lambda item: item[1][1], reverse=True)[:limit]
+
+
+# ===== PROFILING =====
+DEBUG_CONFIG = {
+    "token": os.getenv("DEBUG_TOKEN", ""),  # bearer token for /debug/* HTTP endpoints (disabled when unset)
+    "sample_interval": 0.005,               # seconds between stack samples
+    "max_profile_seconds": 60,
+    "tracemalloc_frames": 1,                # frames kept per allocation; more is slower but shows callers
+    "memory_top": 25,                       # lines shown in a tracemalloc diff
+}
+
+
+def _frame_label(frame) -> Tuple[str, str, int]:
+    code = frame.f_code
+    return code.co_name, code.co_filename, code.co_firstlineno
+
+
+def sample_stacks(thread_id: int, seconds: float, interval: float) -> Dict[Tuple, int]:
+    """Sample one thread's Python stack every `interval` seconds; blocking, so run it in a helper thread"""
+    stacks: Dict[Tuple, int] = {}
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        frame = sys._current_frames().get(thread_id)
+        stack = []
+        while frame is not None:
+            stack.append(_frame_label(frame))
+            frame = frame.f_back
+        if stack:
+            key = tuple(reversed(stack))
+            stacks[key] = stacks.get(key, 0) + 1
+        time.sleep(interval)
+    return stacks
+
+
+def collapsed_profile(stacks: Dict[Tuple, int]) -> str:
+    """Brendan Gregg collapsed-stack format (flamegraph.pl, speedscope, inferno)"""
+    lines = []
+    for stack, count in sorted(stacks.items(), key=lambda item: item[1], reverse=True):
+        names = ";".join(f"{name} ({os.path.basename(filename)}:{line})" for name, filename, line in stack)
+        lines.append(f"{names} {count}")
+    return "\n".join(lines) + "\n"
+
+
+def speedscope_profile(stacks: Dict[Tuple, int], interval: float, seconds: float) -> Dict:
+    """Sampled profile in the speedscope file format"""
+    frames, frame_index, samples, weights = [], {}, [], []
+    for stack, count in stacks.items():
+        indexes = []
+        for label in stack:
+            if label not in frame_index:
+                frame_index[label] = len(frames)
+                frames.append({"name": label[0], "file": label[1], "line": label[2]})
+            indexes.append(frame_index[label])
+        samples.append(indexes)
+        weights.append(count * interval)
+    return {
+        "$schema": "https://www.speedscope.app/file-format-schema.json",
+        "shared": {"frames": frames},
+        "profiles": [{
+            "type": "sampled", "name": "event loop thread", "unit": "seconds",
+            "startValue": 0, "endValue": seconds, "samples": samples, "weights": weights,
+        }],
+        "name": f"discord-trading-bot {datetime.now(timezone.utc):%Y-%m-%d %H:%M:%S} UTC",
+        "exporter": "discord-trading-bot",
+    }
+
+
+class Profiler:
+    """On-demand stack sampling of the event-loop thread and tracemalloc snapshot diffs"""
+
+    def __init__(self):
+        self.baseline: Optional[tracemalloc.Snapshot] = None
+        self.baseline_registries: Dict[str, Dict[str, int]] = {}
+        self._lock = asyncio.Lock()
+
+    def busy(self) -> bool:
+        return self._lock.locked()
+
+    async def profile(self, seconds: float) -> Dict[Tuple, int]:
+        """Sample the loop thread for `seconds`; one profile at a time"""
+        seconds = max(0.1, min(float(seconds), DEBUG_CONFIG["max_profile_seconds"]))
+        async with self._lock:
+            # Sampling runs in a helper thread so the loop keeps doing its normal work meanwhile
+            return await asyncio.to_thread(
+                sample_stacks, threading.get_ident(), seconds, DEBUG_CONFIG["sample_interval"])
+
+    def start_memory_tracking(self):
+        """Start tracemalloc (if needed) and take the baseline snapshot later diffs compare against"""
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(DEBUG_CONFIG["tracemalloc_frames"])
+        self.baseline = tracemalloc.take_snapshot()
+        self.baseline_registries = registry_memory_report()
+
+    def stop_memory_tracking(self):
+        tracemalloc.stop()
+        self.baseline = None
+        self.baseline_registries = {}
+
+    def memory_diff(self) -> Dict:
+        """Allocation growth per source line since the baseline, plus the registries' size change"""
+        if self.baseline is None:
+            self.start_memory_tracking()
+            return {"status": "baseline taken", "tracing": True}
+
+        snapshot = tracemalloc.take_snapshot()
+        filters = [tracemalloc.Filter(False, tracemalloc.__file__)]
+        stats = snapshot.filter_traces(filters).compare_to(self.baseline.filter_traces(filters), "lineno")
+        current, peak = tracemalloc.get_traced_memory()
+        registries = registry_memory_report()
+        return {
+            "status": "diff",
+            "traced_bytes": current,
+            "traced_peak_bytes": peak,
+            "registries": {
+                name: {**usage,
+                       "entries_change": usage["entries"] - self.baseline_registries.get(name, {}).get("entries", 0),
+                       "bytes_change": usage["bytes"] - self.baseline_registries.get(name, {}).get("bytes", 0)}
+                for name, usage in registries.items()
+            },
+            "top_growth": [
+                {"location": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+                 "size_change": stat.size_diff, "size": stat.size,
+                 "count_change": stat.count_diff}
+                for stat in stats[:DEBUG_CONFIG["memory_top"]]
+            ],
+        }
+
+
+# ===== DATABASE REPOSITORY =====
+
+# Every SQL statement the bot runs, keyed by name. BotRepository is the only code that
+# executes them, so each one is prepared once per pool connection and timed per name.
+SQL_STATEMENTS = {
+    # Bot status / offline recovery
+    "save_bot_status": '''
+        INSERT INTO bot_status (last_online, heartbeat_time)
+        VALUES ($1, $2)
+        ON CONFLICT (id) DO UPDATE SET
+        last_online = $1, heartbeat_time = $2
+    ''',
+    "load_last_online": 'SELECT last_online FROM bot_status WHERE id = 1',
+
+    # Auto-role system
+    "load_auto_role_config": 'SELECT * FROM auto_role_config ORDER BY id DESC LIMIT 1',
+    "load_active_members": 'SELECT * FROM active_members',
+    "load_weekend_pending": 'SELECT * FROM weekend_pending',
+    "load_role_history_ids": '''
+        SELECT member_id FROM role_history
+        WHERE member_id > $1
+        ORDER BY member_id
+        LIMIT $2
+    ''',
+    "load_dm_schedule": 'SELECT * FROM dm_schedule',
+    "save_auto_role_config": '''
+        INSERT INTO auto_role_config (id, enabled, role_id, duration_hours, custom_message)
+        VALUES (1, $1, $2, $3, $4)
+        ON CONFLICT (id) DO UPDATE SET
+            enabled = $1,
+            role_id = $2,
+            duration_hours = $3,
+            custom_message = $4
+    ''',
+    "clear_active_members": 'DELETE FROM active_members',
+    "insert_active_member": '''
+        INSERT INTO active_members
+        (member_id, role_added_time, role_id, guild_id, weekend_delayed, expiry_time, custom_duration)
+        VALUES ($1, $2, $3, $4, $5, $6, $7)
+    ''',
+    "clear_weekend_pending": 'DELETE FROM weekend_pending',
+    "insert_weekend_pending": '''
+        INSERT INTO weekend_pending (member_id, join_time, guild_id)
+        VALUES ($1, $2, $3)
+    ''',
+    "record_role_grant": '''
+        INSERT INTO role_history (member_id, first_granted, times_granted, guild_id)
+        VALUES ($1, $2, 1, $3)
+        ON CONFLICT (member_id) DO UPDATE SET
+            times_granted = role_history.times_granted + 1,
+            guild_id = EXCLUDED.guild_id
+    ''',
+    "record_role_expired": 'UPDATE role_history SET last_expired = $2 WHERE member_id = $1',
+    "block_member": '''
+        INSERT INTO role_history (member_id, first_granted, guild_id, blocked_reason, blocked_by, blocked_at)
+        VALUES ($1, $4, $5, $2, $3, $4)
+        ON CONFLICT (member_id) DO UPDATE SET
+            blocked_reason = EXCLUDED.blocked_reason,
+            blocked_by = EXCLUDED.blocked_by,
+            blocked_at = EXCLUDED.blocked_at
+    ''',
+    "delete_role_history": 'DELETE FROM role_history WHERE member_id = $1',
+    "load_blocked_members": '''
+        SELECT member_id, blocked_reason, blocked_at
+        FROM role_history
+        WHERE blocked_reason IS NOT NULL
+        ORDER BY blocked_at DESC
+        LIMIT $1
+    ''',
+    "role_history_stats": '''
+        SELECT COUNT(*) AS total,
+               COUNT(blocked_reason) AS blocked,
+               COUNT(*) FILTER (WHERE blocked_reason = 'account_too_new') AS new_accounts,
+               COUNT(*) FILTER (WHERE blocked_reason = 'rapid_join_pattern') AS rapid_joins,
+               COUNT(*) FILTER (WHERE blocked_reason LIKE 'manual_block%') AS manual_blocks
+        FROM role_history
+    ''',
+    "upsert_dm_schedule": '''
+        INSERT INTO dm_schedule (member_id, role_expired, guild_id, dm_3_sent, dm_7_sent, dm_14_sent)
+        VALUES ($1, $2, $3, $4, $5, $6)
+        ON CONFLICT (member_id) DO UPDATE SET
+            role_expired = $2,
+            guild_id = $3,
+            dm_3_sent = $4,
+            dm_7_sent = $5,
+            dm_14_sent = $6
+    ''',
+
+    # Level system
+    "load_user_levels": 'SELECT user_id, message_count, current_level, guild_id FROM user_levels',
+    "upsert_user_level": '''
+        INSERT INTO user_levels (user_id, message_count, current_level, guild_id)
+        VALUES ($1, $2, $3, $4)
+        ON CONFLICT (user_id) DO UPDATE SET
+            message_count = $2,
+            current_level = $3,
+            guild_id = $4
+    ''',
+
+    # Invite tracking
+    "load_invite_tracking": 'SELECT * FROM invite_tracking',
+    "upsert_invite_tracking": '''
+        INSERT INTO invite_tracking
+        (invite_code, guild_id, creator_id, nickname, total_joins, total_left, current_members, last_updated)
+        VALUES ($1, $2, $3, $4, $5, $6, $7, NOW())
+        ON CONFLICT (invite_code) DO UPDATE SET
+            nickname = $4,
+            total_joins = $5,
+            total_left = $6,
+            current_members = $7,
+            last_updated = NOW()
+    ''',
+    "insert_member_join": '''
+        INSERT INTO member_joins (member_id, guild_id, invite_code, joined_at, is_currently_member)
+        VALUES ($1, $2, $3, NOW(), TRUE)
+    ''',
+    "mark_member_left": '''
+        UPDATE member_joins
+        SET left_at = NOW(), is_currently_member = FALSE
+        WHERE member_id = $1 AND guild_id = $2 AND is_currently_member = TRUE
+        RETURNING invite_code, joined_at
+    ''',
+    "record_invite_leave": '''
+        UPDATE invite_tracking
+        SET total_left = total_left + 1,
+            current_members = GREATEST(current_members - 1, 0),
+            last_updated = NOW()
+        WHERE invite_code = $1
+    ''',
+    "clear_invite_tracking": 'DELETE FROM invite_tracking',
+    "clear_member_joins": 'DELETE FROM member_joins',
+
+    # Status / health
+    "server_version": 'SELECT version()',
+    "ping": 'SELECT 1',
+    "server_time": 'SELECT NOW()',
+    "public_table_count": '''
+        SELECT COUNT(*) FROM information_schema.tables
+        WHERE table_schema = 'public'
+    ''',
+    "existing_tables": '''
+        SELECT table_name FROM information_schema.tables
+        WHERE table_schema = 'public' AND table_name = ANY($1::text[])
+    ''',
+    "schedule_job": '''
+        INSERT INTO scheduled_jobs (kind, member_id, guild_id, due_at)
+        VALUES ($1, $2, $3, $4)
+        ON CONFLICT DO NOTHING
+    ''',
+    # Lease due jobs so a concurrent dispatcher (or a crash mid-run) never double-sends
+    "claim_due_jobs": '''
+        UPDATE scheduled_jobs
+        SET attempts = attempts + 1, locked_until = NOW() + make_interval(secs => $2)
+        WHERE id IN (
+            SELECT id FROM scheduled_jobs
+            WHERE completed_at IS NULL AND due_at <= NOW()
+              AND (locked_until IS NULL OR locked_until < NOW())
+            ORDER BY due_at
+            LIMIT $1
+            FOR UPDATE SKIP LOCKED
+        )
+        RETURNING id, kind, member_id, guild_id, due_at, attempts
+    ''',
+    "complete_job": '''
+        UPDATE scheduled_jobs
+        SET completed_at = NOW(), outcome = $2, locked_until = NULL
+        WHERE id = $1 AND completed_at IS NULL
+    ''',
+    "retry_job": '''
+        UPDATE scheduled_jobs
+        SET due_at = NOW() + make_interval(secs => $2), locked_until = NULL, last_error = $3
+        WHERE id = $1 AND completed_at IS NULL
+    ''',
+    "mark_followup_sent": '''
+        UPDATE dm_schedule
+        SET dm_3_sent = dm_3_sent OR $2 = 3,
+            dm_7_sent = dm_7_sent OR $2 = 7,
+            dm_14_sent = dm_14_sent OR $2 = 14
+        WHERE member_id = $1
+    ''',
+    "pending_job_counts": '''
+        SELECT kind, COUNT(*) AS pending, MIN(due_at) AS next_due
+        FROM scheduled_jobs
+        WHERE completed_at IS NULL
+        GROUP BY kind
+    ''',
+    "load_dm_channels": 'SELECT user_id, channel_id FROM dm_channels WHERE user_id = ANY($1::bigint[])',
+    "upsert_dm_channel": '''
+        INSERT INTO dm_channels (user_id, channel_id, updated_at)
+        VALUES ($1, $2, NOW())
+        ON CONFLICT (user_id) DO UPDATE SET channel_id = EXCLUDED.channel_id, updated_at = NOW()
+    ''',
+    "delete_dm_channel": 'DELETE FROM dm_channels WHERE user_id = $1',
+    "load_command_hash": 'SELECT command_hash FROM command_sync_state WHERE scope = $1',
+    "save_command_hash": '''
+        INSERT INTO command_sync_state (scope, command_hash, command_count, synced_at)
+        VALUES ($1, $2, $3, NOW())
+        ON CONFLICT (scope) DO UPDATE
+        SET command_hash = EXCLUDED.command_hash, command_count = EXCLUDED.command_count, synced_at = NOW()
+    ''',
+    "save_giveaway": '''
+        INSERT INTO giveaways
+        (giveaway_id, message_id, channel_id, creator_id, required_role_id, winner_count, end_time, message, chosen_winners)
+        VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9)
+        ON CONFLICT (giveaway_id) DO UPDATE SET
+            end_time = EXCLUDED.end_time,
+            chosen_winners = EXCLUDED.chosen_winners
+    ''',
+    "load_open_giveaways": 'SELECT * FROM giveaways WHERE ended_at IS NULL ORDER BY end_time',
+    "mark_giveaway_ended": 'UPDATE giveaways SET ended_at = NOW() WHERE giveaway_id = $1',
+    "insert_giveaway_participant": '''
+        INSERT INTO giveaway_participants (giveaway_id, user_id)
+        VALUES ($1, $2)
+        ON CONFLICT DO NOTHING
+    ''',
+    "delete_giveaway_participant": 'DELETE FROM giveaway_participants WHERE giveaway_id = $1 AND user_id = $2',
+    "load_giveaway_participants": '''
+        SELECT giveaway_id, user_id FROM giveaway_participants
+        WHERE giveaway_id = ANY($1::varchar[])
+    ''',
+    "schema_version": 'SELECT MAX(version) FROM schema_version',
+
+    # Trade statistics
+    "insert_closed_trade": '''
+        INSERT INTO closed_trades
+        (message_id, channel_id, pair, action, outcome, entry, exit_price, pips, tp_hits, opened_at, closed_at)
+        VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11)
+        ON CONFLICT (message_id) DO NOTHING
+        RETURNING message_id
+    ''',
+    "increment_trade_stats": '''
+        INSERT INTO trade_stats
+        (period, bucket, trades, wins, losses, breakevens, tp1_hits, tp2_hits, tp3_hits, pips)
+        VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10)
+        ON CONFLICT (period, bucket) DO UPDATE SET
+            trades = trade_stats.trades + EXCLUDED.trades,
+            wins = trade_stats.wins + EXCLUDED.wins,
+            losses = trade_stats.losses + EXCLUDED.losses,
+            breakevens = trade_stats.breakevens + EXCLUDED.breakevens,
+            tp1_hits = trade_stats.tp1_hits + EXCLUDED.tp1_hits,
+            tp2_hits = trade_stats.tp2_hits + EXCLUDED.tp2_hits,
+            tp3_hits = trade_stats.tp3_hits + EXCLUDED.tp3_hits,
+            pips = trade_stats.pips + EXCLUDED.pips
+    ''',
+    "load_trade_stats": 'SELECT * FROM trade_stats',
+}
+
+
+class BotConnection(asyncpg.Connection):
+    """Pool connection class that can warm asyncpg's per-connection statement cache"""
+
+    async def prepare_cached(self, query):
+        """Prepare a statement into the connection's statement cache (Parse once, Bind/Execute after)"""
+        # The public prepare() bypasses the statement cache (use_cache=False), so warming it needs
+        # asyncpg's private _get_statement(query, timeout); pyproject.toml pins the asyncpg versions
+        # it was verified against. If the signature changes, statements are prepared on first use instead.
+        try:
+            await self._get_statement(query, None)
+        except (AttributeError, TypeError) as e:
+            print(f"⚠️ Statement cache warm-up unavailable on this asyncpg version: {e}")
+            raise asyncpg.InterfaceError("statement cache warm-up unavailable") from e
+
+
+class BotRepository:
+    """Owns the PostgreSQL pool and every query the bot runs"""
+
+    def __init__(self, pool: asyncpg.Pool):
+        self.pool = pool
+        self.query_stats: Dict[str, Dict[str, float]] = {}  # statement name: {"calls", "total_seconds", "max_seconds"}
+        self.last_success: Optional[float] = None  # monotonic time of the last statement that succeeded
+
+    @classmethod
+    async def connect(cls, database_url: str) -> "BotRepository":
+        """Create the connection pool with Render-optimized settings"""
+        pool = await asyncpg.create_pool(
+            database_url,
+            min_size=1,
+            max_size=5,  # Lower for Render's limits
+            command_timeout=30,
+            statement_cache_size=len(SQL_STATEMENTS) * 2,
+            connection_class=BotConnection,
+            init=cls.prepare_connection,
+            server_settings={'application_name': 'discord-trading-bot'})
+        return cls(pool)
+
+    @staticmethod
+    async def prepare_connection(conn: BotConnection):
+        """Pool init hook - prepare every known statement once on each new connection"""
+        for query in SQL_STATEMENTS.values():
+            try:
+                await conn.prepare_cached(query)
+            except asyncpg.PostgresError:
+                # Table not created yet (first boot) - it is prepared on first use instead
+                continue
+            except asyncpg.InterfaceError:
+                # Warm-up not supported by this asyncpg version - every statement is prepared on first use
+                return
+
+    async def close(self):
+        await self.pool.close()
+
+    def pool_size(self) -> int:
+        return self.pool.get_size()
+
+    def pool_idle(self) -> int:
+        return self.pool.get_idle_size()
+
+    def _record_timing(self, name: str, elapsed: float):
+        stats = self.query_stats.get(name)
+        if stats is None:
+            stats = self.query_stats[name] = {"calls": 0, "total_seconds": 0.0, "max_seconds": 0.0}
+        stats["calls"] += 1
+        stats["total_seconds"] += elapsed
+        if elapsed > stats["max_seconds"]:
+            stats["max_seconds"] = elapsed
+        DB_STATEMENT_LATENCY.observe(name, value=elapsed)
+
+    async def _run(self, conn, method: str, name: str, *args):
+        """Run a named statement on conn with per-statement timing"""
+        started = time.perf_counter()
+        try:
+            result = await getattr(conn, method)(SQL_STATEMENTS[name], *args)
+            self.last_success = time.monotonic()
+            return result
+        finally:
+            self._record_timing(name, time.perf_counter() - started)
+
+    async def _run_many(self, conn, name: str, rows: List[Tuple]):
+        if not rows:
+            return
+        started = time.perf_counter()
+        try:
+            await conn.executemany(SQL_STATEMENTS[name], rows)
+            self.last_success = time.monotonic()
+        finally:
+            self._record_timing(name, time.perf_counter() - started)
+
+    async def _fetch(self, name: str, *args) -> List[asyncpg.Record]:
+        async with self.pool.acquire() as conn:
+            return await self._run(conn, "fetch", name, *args)
+
+    async def _fetchval(self, name: str, *args):
+        async with self.pool.acquire() as conn:
+            return await self._run(conn, "fetchval", name, *args)
+
+    async def _execute(self, name: str, *args):
+        async with self.pool.acquire() as conn:
+            return await self._run(conn, "execute", name, *args)
+
+    # ----- Schema -----
+
+    async def run_migrations(self):
+        """Apply pending SCHEMA_MIGRATIONS in version order, one transaction per migration"""
+        async with self.pool.acquire() as conn:
+            await conn.execute('''
+                CREATE TABLE IF NOT EXISTS schema_version (
+                    version INTEGER PRIMARY KEY,
+                    description TEXT NOT NULL,
+                    applied_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+                )
+            ''')
+
+            # Serialize migrations across instances (e.g. overlapping Render deploys)
+            await conn.execute('SELECT pg_advisory_lock($1)', SCHEMA_MIGRATION_LOCK_ID)
+            try:
+                applied = {
+                    row['version']
+                    for row in await conn.fetch('SELECT version FROM schema_version')
+                }
+
+                migrated = False
+                for version, description, statements in sorted(SCHEMA_MIGRATIONS, key=lambda m: m[0]):
+                    if version in applied:
+                        continue
+
+                    async with conn.transaction():
+                        for statement in statements:
+                            await conn.execute(statement)
+                        await conn.execute(
+                            'INSERT INTO schema_version (version, description) VALUES ($1, $2)',
+                            version, description)
+
+                    migrated = True
+                    print(f"✅ Applied schema migration {version}: {description}")
+            finally:
+                await conn.execute('SELECT pg_advisory_unlock($1)', SCHEMA_MIGRATION_LOCK_ID)
+
+        if migrated:
+            # Recycle idle connections so their init hook prepares against the new schema
+            await self.pool.expire_connections()
+
+    # ----- Bot status -----
+
+    async def save_bot_status(self, timestamp: datetime):
+        await self._execute("save_bot_status", timestamp, timestamp)
+
+    async def load_last_online(self) -> Optional[datetime]:
+        return await self._fetchval("load_last_online")
+
+    # ----- Auto-role system -----
+
+    async def load_auto_role_state(self) -> Dict[str, List[asyncpg.Record]]:
+        """Load config, active members, weekend pending and DM schedule on one connection"""
+        state = {}
+        async with self.pool.acquire() as conn:
+            for key, name in (("config", "load_auto_role_config"),
+                              ("active_members", "load_active_members"),
+                              ("weekend_pending", "load_weekend_pending"),
+                              ("dm_schedule", "load_dm_schedule")):
+                state[key] = await self._run(conn, "fetch", name)
+        return state
+
+    async def save_auto_role_state(self, config: Tuple, active_members: List[Tuple],
+                                   weekend_pending: List[Tuple], dm_schedule: List[Tuple]):
+        """Persist the whole auto-role state in a single transaction"""
+        async with self.pool.acquire() as conn:
+            async with conn.transaction():
+                await self._run(conn, "execute", "save_auto_role_config", *config)
+                await self._run(conn, "execute", "clear_active_members")
+                await self._run_many(conn, "insert_active_member", active_members)
+                await self._run(conn, "execute", "clear_weekend_pending")
+                await self._run_many(conn, "insert_weekend_pending", weekend_pending)
+                await self._run_many(conn, "upsert_dm_schedule", dm_schedule)
+
+    # ----- Level system -----
+
+    async def load_user_levels(self) -> List[asyncpg.Record]:
+        return await self._fetch("load_user_levels")
+
+    async def save_user_levels(self, rows: List[Tuple]):
+        async with self.pool.acquire() as conn:
+            async with conn.transaction():
+                await self._run_many(conn, "upsert_user_level", rows)
+
+    # ----- Invite tracking -----
+
+    async def load_invites(self) -> List[asyncpg.Record]:
+        return await self._fetch("load_invite_tracking")
+
+    async def save_invites(self, rows: List[Tuple]):
+        async with self.pool.acquire() as conn:
+            async with conn.transaction():
+                await self._run_many(conn, "upsert_invite_tracking", rows)
+
+    async def record_invite_joins(self, joins: List[Tuple], invite_rows: List[Tuple]):
+        """Record a batch of joins and the updated stats of the invites used in one transaction"""
+        async with self.pool.acquire() as conn:
+            async with conn.transaction():
+                await self._run_many(conn, "insert_member_join", joins)
+                await self._run_many(conn, "upsert_invite_tracking", invite_rows)
+
+    async def record_member_leave(self, member_id: int, guild_id: int) -> Optional[str]:
+        """Close the member's open join records and count the leave against their invite.
+
+        Returns the invite code of the most recent join, if any."""
+        async with self.pool.acquire() as conn:
+            async with conn.transaction():
+                rows = await self._run(conn, "fetch", "mark_member_left", member_id, guild_id)
+                if not rows:
+                    return None
+                latest = max(rows, key=lambda row: row['joined_at'])
+                invite_code = latest['invite_code']
+                if invite_code:
+                    await self._run(conn, "execute", "record_invite_leave", invite_code)
+                return invite_code
+
+    async def reset_invite_tracking(self):
+        async with self.pool.acquire() as conn:
+            async with conn.transaction():
+                await self._run(conn, "execute", "clear_invite_tracking")
+                await self._run(conn, "execute", "clear_member_joins")
+
+    # ----- Scheduled jobs -----
+
+    async def schedule_jobs(self, rows: List[Tuple]):
+        """Insert (kind, member_id, guild_id, due_at) jobs; already scheduled jobs are ignored"""
+        async with self.pool.acquire() as conn:
+            await self._run_many(conn, "schedule_job", rows)
+
+    async def claim_due_jobs(self, limit: int, lease_seconds: float) -> List[asyncpg.Record]:
+        return await self._fetch("claim_due_jobs", limit, float(lease_seconds))
+
+    async def complete_job(self, job_id: int, outcome: str, followup_member_id: Optional[int] = None,
+                           followup_days: Optional[int] = None):
+        """Mark a job done, and its dm_schedule flag if it was a follow-up DM, in one transaction"""
+        async with self.pool.acquire() as conn:
+            async with conn.transaction():
+                await self._run(conn, "execute", "complete_job", job_id, outcome)
+                if followup_days:
+                    await self._run(conn, "execute", "mark_followup_sent", followup_member_id, followup_days)
+
+    async def retry_job(self, job_id: int, delay_seconds: float, error: str):
+        await self._execute("retry_job", job_id, float(delay_seconds), error)
+
+    async def pending_job_counts(self) -> List[asyncpg.Record]:
+        return await self._fetch("pending_job_counts")
+
+    # ----- Anti-abuse role history -----
+
+    async def load_role_history_ids(self, page_size: int = 50000) -> array:
+        """Every member id in role_history as a sorted array, read in keyset-paginated pages"""
+        ids = array('Q')
+        last_id = 0
+        async with self.pool.acquire() as conn:
+            while True:
+                rows = await self._run(conn, "fetch", "load_role_history_ids", last_id, page_size)
+                ids.extend(row['member_id'] for row in rows)
+                if len(rows) < page_size:
+                    return ids
+                last_id = ids[-1]
+
+    async def record_role_history(self, grants: List[Tuple], expiries: List[Tuple]):
+        """Write buffered role grants and expiries in one transaction"""
+        async with self.pool.acquire() as conn:
+            async with conn.transaction():
+                await self._run_many(conn, "record_role_grant", grants)
+                await self._run_many(conn, "record_role_expired", expiries)
+
+    async def block_member(self, member_id: int, reason: str, blocked_by: int, blocked_at: datetime, guild_id: int):
+        await self._execute("block_member", member_id, reason, blocked_by, blocked_at, guild_id)
+
+    async def delete_role_history(self, member_id: int):
+        await self._execute("delete_role_history", member_id)
+
+    async def load_blocked_members(self, limit: int) -> List[asyncpg.Record]:
+        return await self._fetch("load_blocked_members", limit)
+
+    async def role_history_stats(self) -> asyncpg.Record:
+        rows = await self._fetch("role_history_stats")
+        return rows[0]
+
+    # ----- DM channels -----
+
+    async def load_dm_channels(self, user_ids: List[int]) -> Dict[int, int]:
+        """Persisted DM channel ids for the given users"""
+        rows = await self._fetch("load_dm_channels", list(user_ids))
+        return {row['user_id']: row['channel_id'] for row in rows}
+
+    async def save_dm_channel(self, user_id: int, channel_id: int):
+        await self._execute("upsert_dm_channel", user_id, channel_id)
+
+    async def delete_dm_channel(self, user_id: int):
+        await self._execute("delete_dm_channel", user_id)
+
+    # ----- Command sync -----
+
+    async def load_command_hash(self, scope: int) -> Optional[str]:
+        return await self._fetchval("load_command_hash", scope)
+
+    async def save_command_hash(self, scope: int, command_hash: str, command_count: int):
+        await self._execute("save_command_hash", scope, command_hash, command_count)
+
+    # ----- Giveaways -----
+
+    async def save_giveaway(self, row: Tuple):
+        await self._execute("save_giveaway", *row)
+
+    async def load_open_giveaways(self) -> List[asyncpg.Record]:
+        return await self._fetch("load_open_giveaways")
+
+    async def mark_giveaway_ended(self, giveaway_id: str):
+        await self._execute("mark_giveaway_ended", giveaway_id)
+
+    async def save_giveaway_entries(self, entries: List[Tuple], withdrawals: List[Tuple]):
+        """Write buffered (giveaway_id, user_id) entries and withdrawals in one transaction"""
+        async with self.pool.acquire() as conn:
+            async with conn.transaction():
+                await self._run_many(conn, "insert_giveaway_participant", entries)
+                await self._run_many(conn, "delete_giveaway_participant", withdrawals)
+
+    async def load_giveaway_participants(self, giveaway_ids: List[str]) -> List[asyncpg.Record]:
+        return await self._fetch("load_giveaway_participants", list(giveaway_ids))
+
+    # ----- Trade statistics -----
+
+    async def record_closed_trade(self, trade: Tuple, rollups: List[Tuple]) -> bool:
+        """Add a closed trade to the ledger and its rollups in one transaction.
+
+        Returns False (and changes nothing) if the trade was already recorded."""
+        async with self.pool.acquire() as conn:
+            async with conn.transaction():
+                if await self._run(conn, "fetchval", "insert_closed_trade", *trade) is None:
+                    return False
+                await self._run_many(conn, "increment_trade_stats", rollups)
+                return True
+
+    async def load_trade_stats(self) -> List[asyncpg.Record]:
+        return await self._fetch("load_trade_stats")
+
+    # ----- Status / health -----
+
+    async def server_version(self) -> str:
+        return await self._fetchval("server_version")
+
+    async def ping(self, timeout: float):
+        """Cheap round trip that gives up instead of queueing for a connection"""
+        async with self.pool.acquire(timeout=timeout) as conn:
+            await self._run(conn, "fetchval", "ping")
+
+    async def get_status(self, tables: List[str]) -> Dict:
+        """Collect the information shown by /dbstatus"""
+        async with self.pool.acquire() as conn:
+            existing = await self._run(conn, "fetch", "existing_tables", tables)
+            existing_names = {row['table_name'] for row in existing}
+            return {
+                "version": await self._run(conn, "fetchval", "server_version"),
+                "server_time": await self._run(conn, "fetchval", "server_time"),
+                "table_count": await self._run(conn, "fetchval", "public_table_count"),
+                "schema_version": await self._run(conn, "fetchval", "schema_version"),
+                "existing_tables": [table for table in tables if table in existing_names],
+            }
+
+
+# ===== INVITE CACHE =====
+# Per-guild invite state keyed by code. Joins that arrive while a fetch is in
+# flight share the next guild.invites() call instead of each doing their own.
+INVITE_CLAIM_WINDOW_SECONDS = 30
+
+class InviteSnapshot:
+    """Cached state of a single guild invite"""
+    __slots__ = ("code", "uses", "max_uses", "inviter_id", "inviter_name", "inviter_bot", "deleted")
+
+    def __init__(self, invite: discord.Invite):
+        self.code = invite.code
+        self.uses = invite.uses or 0
+        self.max_uses = invite.max_uses or 0
+        self.inviter_id = invite.inviter.id if invite.inviter else 0
+        self.inviter_name = invite.inviter.display_name if invite.inviter else None
+        self.inviter_bot = bool(invite.inviter and invite.inviter.bot)
+        self.deleted = False
+
+
+class InviteCache:
+
+    def __init__(self):
+        self.guilds: Dict[int, Dict[str, InviteSnapshot]] = {}
+        self.fetch_count = 0
+        self._waiters: Dict[int, List[asyncio.Future]] = {}
+        self._drains: Dict[int, asyncio.Task] = {}
+        self._unclaimed: Dict[int, List[Tuple[float, InviteSnapshot]]] = {}
+
+    def store(self, guild_id: int, invites: List[discord.Invite]) -> List[InviteSnapshot]:
+        """Replace a guild's cached invites and return the uses gained since the last snapshot"""
+        before = self.guilds.get(guild_id)
+        after = {invite.code: InviteSnapshot(invite) for invite in invites}
+        self.guilds[guild_id] = after
+        if before is None:
+            # First sighting: the uses so far are history, not new joins
+            return []
+
+        used = []
+        for code, snapshot in after.items():
+            # Codes never seen (not even through add()) have no baseline to count from
+            previous = before.get(code)
+            if previous is not None:
+                used.extend([snapshot] * max(0, snapshot.uses - previous.uses))
+
+        # An invite that hit max_uses is deleted by Discord, so the last use only shows up as a disappearance
+        for code, previous in before.items():
+            if code not in after and previous.max_uses and previous.uses + 1 == previous.max_uses:
+                previous.uses += 1
+                used.append(previous)
+
+        return used
+
+    def add(self, invite: discord.Invite):
+        """Track an invite created after the last fetch, with its uses at creation as the baseline"""
+        if invite.guild and invite.guild.id in self.guilds:
+            self.guilds[invite.guild.id][invite.code] = InviteSnapshot(invite)
+
+    def remove(self, invite: discord.Invite):
+        """Mark a deleted invite; the next fetch drops it (counting it if it was used up)"""
+        if invite.guild:
+            snapshot = self.guilds.get(invite.guild.id, {}).get(invite.code)
+            if snapshot:
+                snapshot.deleted = True
+                if not snapshot.max_uses:
+                    del self.guilds[invite.guild.id][invite.code]
+
+    def get(self, guild_id: int, code: str) -> Optional[InviteSnapshot]:
+        return self.guilds.get(guild_id, {}).get(code)
+
+    async def fetch(self, guild: discord.Guild) -> List[InviteSnapshot]:
+        """Fetch a guild's invites into the cache and return the uses gained"""
+        invites = await guild.invites()
+        self.fetch_count += 1
+        return self.store(guild.id, invites)
+
+    async def resolve_join(self, guild: discord.Guild) -> Optional[InviteSnapshot]:
+        """Find the invite used by a member who just joined"""
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(guild.id, []).append(waiter)
+
+        drain = self._drains.get(guild.id)
+        if drain is None or drain.done():
+            self._drains[guild.id] = asyncio.create_task(self._drain(guild), name=f"invite_drain:{guild.id}")
+
+        return await waiter
+
+    async def _drain(self, guild: discord.Guild):
+        """Serve queued joins with as few invite fetches as possible"""
+        unclaimed = self._unclaimed.setdefault(guild.id, [])
+        while self._waiters.get(guild.id):
+            batch = self._waiters.pop(guild.id)
+            try:
+                fetched_at = time.monotonic()
+                unclaimed.extend((fetched_at, snapshot) for snapshot in await self.fetch(guild))
+            except Exception as e:
+                print(f"❌ Error fetching invites for {guild.name}: {e}")
+
+            # Uses beyond this batch belong to joins whose events have not arrived yet,
+            # unless they are too old to still be waiting for one
+            cutoff = time.monotonic() - INVITE_CLAIM_WINDOW_SECONDS
+            unclaimed[:] = [entry for entry in unclaimed if entry[0] >= cutoff]
+            for waiter in batch:
+                if not waiter.done():
+                    waiter.set_result(unclaimed.pop(0)[1] if unclaimed else None)
+
+
+# ===== MEMBER STATE =====
+# Records held in the in-memory registries. Registries are keyed by int snowflake
+# (invite code for INVITE_TRACKING, giveaway id for ACTIVE_GIVEAWAYS) and times are
+# stored as aware datetimes, so lookups need no str()/int() or ISO conversions.
+@dataclass(slots=True)
+class ActiveMember:
+    """A member currently holding the timed auto-role"""
+    role_added_time: datetime
+    role_id: int
+    guild_id: int
+    weekend_delayed: bool = False
+    expiry_time: Optional[datetime] = None
+    custom_duration: bool = False
+
+    def expires_at(self) -> datetime:
+        # Weekend and custom grants carry an explicit expiry, normal grants last 24 hours
+        if self.weekend_delayed and self.expiry_time:
+            return self.expiry_time
+        return self.role_added_time + timedelta(hours=24)
+
+
+@dataclass(slots=True)
+class WeekendPending:
+    join_time: datetime
+    guild_id: int
+
+
+@dataclass(slots=True)
+class FollowupSchedule:
+    """Which follow-up DMs a member has received since their role expired"""
+    role_expired: datetime
+    guild_id: int
+    dm_3_sent: bool = False
+    dm_7_sent: bool = False
+    dm_14_sent: bool = False
+
+
+@dataclass(slots=True)
+class LevelRecord:
+    message_count: int = 0
+    current_level: int = 0
+    guild_id: int = 0
+
+
+@dataclass(slots=True)
+class InviteStats:
+    nickname: str
+    creator_id: int
+    guild_id: int
+    total_joins: int = 0
+    total_left: int = 0
+    current_members: int = 0
+    created_at: Optional[datetime] = None
+
+
+@dataclass(slots=True)
+class Giveaway:
+    message_id: int
+    channel_id: int
+    creator_id: int
+    required_role_id: int
+    winner_count: int
+    end_time: datetime
+    message: str = ""
+    participants: set = field(default_factory=set)
+    chosen_winners: List[int] = field(default_factory=list)
+    # One set per running reconcile crawl: ids the live reaction handlers changed meanwhile
+    reconcile_touched: List[set] = field(default_factory=list)
+
+
+def deep_sizeof(obj, seen: Optional[set] = None) -> int:
+    """Approximate bytes retained by an object graph (containers, slotted records and their fields)"""
+    if seen is None:
+        seen = set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_sizeof(key, seen) + deep_sizeof(value, seen) for key, value in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(deep_sizeof(item, seen) for item in obj)
+    elif hasattr(obj, "__slots__"):
+        size += sum(deep_sizeof(getattr(obj, name, None), seen) for name in obj.__slots__)
+    elif hasattr(obj, "__dict__"):
+        size += deep_sizeof(obj.__dict__, seen)
+    return size
+
+
+def registry_memory_report() -> Dict[str, Dict[str, int]]:
+    """Entry count and approximate size of every in-memory registry"""
+    registries = {
+        "active_members": AUTO_ROLE_CONFIG["active_members"],
+        "weekend_pending": AUTO_ROLE_CONFIG["weekend_pending"],
+        "dm_schedule": AUTO_ROLE_CONFIG["dm_schedule"],
+        "level_users": LEVEL_SYSTEM["user_data"],
+        "invite_tracking": INVITE_TRACKING,
+        "giveaways": ACTIVE_GIVEAWAYS,
+        "active_trades": PRICE_TRACKING_CONFIG["active_trades"],
+    }
+    report = {name: {"entries": len(registry), "bytes": deep_sizeof(registry)}
+              for name, registry in registries.items()}
+    report["role_history"] = {"entries": len(ROLE_HISTORY), "bytes": ROLE_HISTORY.nbytes()}
+    return report
+
+
+def synthetic_registry_comparison(count: int) -> Dict[str, Tuple[int, int]]:
+    """Bytes used by `count` synthetic members in the old str-keyed dict layout and in the slotted layout"""
+    now = datetime.now(AMSTERDAM_TZ)
+    base_id = 1_100_000_000_000_000_000
+    guild_id = 1_300_000_000_000_000_000
+    legacy_active, active = {}, {}
+    legacy_levels, levels = {}, {}
+    for offset in range(count):
+        member_id = base_id + offset * 4_194_304
+        added = now - timedelta(seconds=offset)
+        legacy_active[str(member_id)] = {
+            "role_added_time": added.isoformat(),
+            "role_id": 1_384_000_000_000_000_000,
+            "guild_id": guild_id,
+            "weekend_delayed": False,
+            "expiry_time": None,
+            "custom_duration": False,
+        }
+        active[member_id] = ActiveMember(added, 1_384_000_000_000_000_000, guild_id)
+        legacy_levels[str(member_id)] = {"message_count": offset % 1500, "current_level": offset % 9, "guild_id": guild_id}
+        levels[member_id] = LevelRecord(offset % 1500, offset % 9, guild_id)
+    return {
+        "active_members": (deep_sizeof(legacy_active), deep_sizeof(active)),
+        "level_users": (deep_sizeof(legacy_levels), deep_sizeof(levels)),
+    }
+
+
+# ===== ANTI-ABUSE HISTORY =====
+class MemberIdSet:
+    """Compact set of member ids: a sorted array('Q') plus a small buffer of recent additions"""
+
+    __slots__ = ("_ids", "_recent")
+
+    # Recent additions are merged into the sorted array once the buffer reaches this size
+    MERGE_THRESHOLD = 4096
+
+    def __init__(self, ids=()):
+        self._ids = array('Q', sorted(set(ids)))
+        self._recent = set()
+
+    def load(self, sorted_ids: array):
+        """Replace the contents with an already sorted, de-duplicated array"""
+        self._ids = sorted_ids
+        self._recent = set()
+
+    def __contains__(self, member_id: int) -> bool:
+        if member_id in self._recent:
+            return True
+        ids = self._ids
+        index = bisect_left(ids, member_id)
+        return index < len(ids) and ids[index] == member_id
+
+    def __len__(self) -> int:
+        return len(self._ids) + len(self._recent)
+
+    def add(self, member_id: int):
+        if member_id in self:
+            return
+        self._recent.add(member_id)
+        if len(self._recent) >= self.MERGE_THRESHOLD:
+            self._merge()
+
+    def discard(self, member_id: int):
+        if member_id in self._recent:
+            self._recent.discard(member_id)
+            return
+        index = bisect_left(self._ids, member_id)
+        if index < len(self._ids) and self._ids[index] == member_id:
+            del self._ids[index]
+
+    def _merge(self):
+        # Single pass copying sorted runs between the new ids, so no per-id Python objects are created
+        merged = array('Q')
+        start = 0
+        for member_id in sorted(self._recent):
+            index = bisect_left(self._ids, member_id, start)
+            merged.extend(self._ids[start:index])
+            merged.append(member_id)
+            start = index
+        merged.extend(self._ids[start:])
+        self._ids = merged
+        self._recent = set()
+
+    def nbytes(self) -> int:
+        return self._ids.buffer_info()[1] * self._ids.itemsize + sys.getsizeof(self._recent)
+
+
+# Every member who has ever been given the auto-role; full records stay in Postgres
+ROLE_HISTORY = MemberIdSet()
+
+
+# ===== RATE LIMITING =====
+# Requests allowed per window for the Discord REST routes the bot hits in bulk.
+# discord.py retries 429s itself, but pacing below the limits keeps a burst on
+# one route from stalling every other request behind a rate-limit sleep.
+DISCORD_ROUTE_LIMITS = {
+    "add_roles": (10, 10.0),     # per guild
+    "remove_roles": (10, 10.0),  # per guild
+    "dm": (5, 5.0),              # DM message sends
+    "dm_create": (5, 5.0),       # DM channel creation
+    "log_message": (5, 5.0),     # per log channel
+}
+
+
+class RouteRateLimiter:
+    """Token bucket per (route, major id) pacing outgoing Discord REST calls"""
+
+    def __init__(self, limits: Dict[str, Tuple[int, float]]):
+        self.limits = limits
+        self.waits = {route: 0 for route in limits}
+        self._buckets: Dict[Tuple[str, int], Tuple[float, float]] = {}
+        self._locks: Dict[Tuple[str, int], asyncio.Lock] = {}
+
+    async def acquire(self, route: str, major_id: int = 0):
+        """Wait until a request on this route is within the limit"""
+        rate, per = self.limits[route]
+        key = (route, major_id)
+        lock = self._locks.get(key)
+        if lock is None:
+            lock = self._locks[key] = asyncio.Lock()
+
+        async with lock:
+            now = time.monotonic()
+            tokens, updated = self._buckets.get(key, (float(rate), now))
+            tokens = min(float(rate), tokens + (now - updated) * rate / per)
+            if tokens < 1:
+                self.waits[route] += 1
+                await asyncio.sleep((1 - tokens) * per / rate)
+                now = time.monotonic()
+                tokens = 1.0
+            self._buckets[key] = (tokens - 1, now)
+
+
+# ===== JOIN PIPELINE =====
+JOIN_PIPELINE_CONFIG = {
+    "queue_size": 5000,      # joins buffered before on_member_join waits for space
+    "workers": 4,
+    "flush_interval": 5.0,   # seconds between batched DB writes
+}
+
+
+class JoinPipeline:
+    """Bounded queue and worker pool that handles member joins off the gateway event path"""
+
+    def __init__(self, bot: "TradingBot"):
+        self.bot = bot
+        self.queue: Optional[asyncio.Queue] = None
+        self.processed = 0
+        self.failed = 0
+        self.join_to_role = deque(maxlen=1000)  # seconds from gateway event to role added
+        self.config_dirty = False
+        self._pending_joins: List[Tuple] = []
+        self._dirty_invites = set()
+        self._pending_jobs: List[Tuple] = []
+        self._pending_grants: List[Tuple] = []
+        self._pending_expiries: List[Tuple] = []
+        self._tasks: List[asyncio.Task] = []
+        self._flush_lock = asyncio.Lock()
+
+    def start(self):
+        if self._tasks:
+            return
+        self.queue = asyncio.Queue(maxsize=JOIN_PIPELINE_CONFIG["queue_size"])
+        self._tasks = [asyncio.create_task(self._worker(), name=f"join_worker:{index}")
+                       for index in range(JOIN_PIPELINE_CONFIG["workers"])]
+        self._tasks.append(asyncio.create_task(self._flush_loop(), name="join_flush"))
+
+    async def stop(self, timeout: float = 10.0):
+        """Drain queued joins, stop the workers and write everything out"""
+        if self.queue is not None:
+            try:
+                await asyncio.wait_for(self.queue.join(), timeout)
+            except asyncio.TimeoutError:
+                print(f"⚠️ Join pipeline stopped with {self.queue.qsize()} joins still queued")
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+        await self.flush()
+
+    async def submit(self, member: discord.Member):
+        """Queue a member join; waits only if the queue is full"""
+        if self.queue is None:
+            self.start()
+        # Start the invite lookup now so every join in a burst shares the same invite fetches
+        invite_lookup = asyncio.ensure_future(self.bot.invite_cache.resolve_join(member.guild))
+        await self.queue.put((member, time.monotonic(), invite_lookup))
+
+    def log(self, message: str):
+        self.bot.log_sink.emit(message)
+
+    def record_role_added(self, enqueued_at: float):
+        elapsed = time.monotonic() - enqueued_at
+        self.join_to_role.append(elapsed)
+        JOIN_TO_ROLE.observe(value=elapsed)
+
+    def record_invite_join(self, member_id: int, guild_id: int, invite_code: str):
+        """Buffer a member_joins row (and its invite's totals) for the next batched write"""
+        self._pending_joins.append((member_id, guild_id, invite_code))
+        self._dirty_invites.add(invite_code)
+
+    async def _worker(self):
+        while True:
+            member, enqueued_at, invite_lookup = await self.queue.get()
+            try:
+                await self.bot.process_member_join(member, enqueued_at, invite_lookup)
+                self.processed += 1
+            except Exception as e:
+                self.failed += 1
+                self.log(f"❌ Error processing join for {member.display_name}: {str(e)}")
+            finally:
+                self.queue.task_done()
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(JOIN_PIPELINE_CONFIG["flush_interval"])
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"❌ Join pipeline flush failed: {e}")
+
+    async def flush(self):
+        """Persist buffered join state"""
+        if self.config_dirty:
+            self.config_dirty = False
+            await self.bot.save_auto_role_config()
+
+        await self.flush_joins()
+
+        if self._pending_jobs and self.bot.db:
+            jobs, self._pending_jobs = self._pending_jobs, []
+            try:
+                await self.bot.db.schedule_jobs(jobs)
+            except Exception as e:
+                self._pending_jobs[:0] = jobs
+                print(f"❌ Error scheduling jobs: {e}")
+
+        if (self._pending_grants or self._pending_expiries) and self.bot.db:
+            grants, self._pending_grants = self._pending_grants, []
+            expiries, self._pending_expiries = self._pending_expiries, []
+            try:
+                await self.bot.db.record_role_history(grants, expiries)
+            except Exception as e:
+                self._pending_grants[:0] = grants
+                self._pending_expiries[:0] = expiries
+                print(f"❌ Error saving role history: {e}")
+
+    def schedule_job(self, row: Tuple):
+        """Buffer a scheduled_jobs row for the next batched write"""
+        self._pending_jobs.append(row)
+
+    def record_role_grant(self, member_id: int, granted_at: datetime, guild_id: int):
+        """Buffer a role_history grant for the next batched write"""
+        self._pending_grants.append((member_id, granted_at, guild_id))
+
+    def record_role_expiry(self, member_id: int, expired_at: datetime):
+        self._pending_expiries.append((member_id, expired_at))
+
+    def has_pending_join(self, member_id: int) -> bool:
+        return any(row[0] == member_id for row in self._pending_joins)
+
+    async def flush_joins(self):
+        """Write buffered member_joins rows and invite totals in one transaction"""
+        async with self._flush_lock:
+            if not self._pending_joins or not self.bot.db:
+                return
+            joins, codes = self._pending_joins, self._dirty_invites
+            self._pending_joins, self._dirty_invites = [], set()
+            try:
+                await self.bot.db.record_invite_joins(
+                    joins, [self.bot.invite_tracking_row(code) for code in codes if code in INVITE_TRACKING])
+            except Exception as e:
+                # Keep the rows for the next flush
+                self._pending_joins[:0] = joins
+                self._dirty_invites |= codes
+                print(f"❌ Error saving member joins to database: {e}")
+
+    def stats(self) -> Dict:
+        latencies = sorted(self.join_to_role)
+
+        def percentile(p):
+            return round(latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000) if latencies else None
+
+        return {
+            "queue_depth": self.queue.qsize() if self.queue else 0,
+            "queue_capacity": JOIN_PIPELINE_CONFIG["queue_size"],
+            "workers": JOIN_PIPELINE_CONFIG["workers"],
+            "processed": self.processed,
+            "failed": self.failed,
+            "join_to_role_ms": {"p50": percentile(0.5), "p95": percentile(0.95), "max": percentile(1.0)},
+            "rate_limit_waits": dict(self.bot.rate_limiter.waits),
+        }
+
+
+# ===== LOG SINK =====
+LOG_SINK_CONFIG = {
+    "flush_interval": 2.0,   # seconds between coalesced log messages
+    "max_pending": 500,      # buffered entries per channel before entries are dropped
+    "message_limit": 2000,   # Discord message length limit
+}
+LOG_SEVERITY_ORDER = ("info", "warning", "error")
+
+
+def log_severity(message: str) -> str:
+    """Infer a log entry's severity from its emoji prefix"""
+    if message.startswith(("❌", "🚨")):
+        return "error"
+    if message.startswith("⚠️"):
+        return "warning"
+    return "info"
+
+
+class LogSink:
+    """Buffers log entries and sends them to the log channels as coalesced, rate-limited messages"""
+
+    def __init__(self, bot: "TradingBot"):
+        self.bot = bot
+        self.sent_messages = 0
+        self.sent_entries = 0
+        self.dropped = {severity: 0 for severity in LOG_SEVERITY_ORDER}
+        self._pending: Dict[int, List[Tuple[str, str]]] = {}
+        self._unreported_drops: Dict[int, int] = {}
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._flush_loop(), name="log_sink_flush")
+
+    async def stop(self):
+        """Stop the flusher and send whatever is still buffered"""
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        await self.flush()
+
+    def emit(self, message: str, severity: Optional[str] = None):
+        """Queue a log entry without waiting for Discord"""
+        print(message)
+        severity = severity or log_severity(message)
+        channel_id = LOG_ROUTES.get(severity, LOG_CHANNEL_ID)
+        pending = self._pending.setdefault(channel_id, [])
+
+        if len(pending) >= LOG_SINK_CONFIG["max_pending"]:
+            # Overloaded: drop the oldest entry of the lowest severity, or this one if it ranks lowest
+            rank = LOG_SEVERITY_ORDER.index
+            victim = min(range(len(pending)), key=lambda i: rank(pending[i][0]))
+            if rank(pending[victim][0]) > rank(severity):
+                victim = None
+            dropped_severity = severity if victim is None else pending.pop(victim)[0]
+            self.dropped[dropped_severity] += 1
+            self._unreported_drops[channel_id] = self._unreported_drops.get(channel_id, 0) + 1
+            if victim is None:
+                return
+
+        pending.append((severity, message))
+        if severity == "error":
+            self._wakeup.set()
+
+    async def _flush_loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), LOG_SINK_CONFIG["flush_interval"])
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"Failed to flush Discord log: {e}")
+
+    async def flush(self):
+        """Send all buffered entries, coalesced into as few messages as possible"""
+        if not self.bot.is_ready():
+            return
+
+        for channel_id in list(self._pending):
+            entries = self._pending.pop(channel_id)
+            drops = self._unreported_drops.pop(channel_id, 0)
+            if drops:
+                entries.append(("warning", f"⚠️ {drops} log entries dropped under load"))
+            if not entries:
+                continue
+
+            channel = self.bot.get_channel(channel_id)
+            if channel is None:
+                continue
+
+            for message, count in self._coalesce([text for _, text in entries]):
+                await self.bot.rate_limiter.acquire("log_message", channel_id)
+                try:
+                    await channel.send(message)
+                    self.sent_messages += 1
+                    self.sent_entries += count
+                except Exception as e:
+                    print(f"Failed to send log to Discord: {e}")
+
+    def _coalesce(self, lines: List[str]) -> List[Tuple[str, int]]:
+        """Pack lines into messages under the Discord length limit"""
+        limit = LOG_SINK_CONFIG["message_limit"]
+        header = "📋 **Bot Log:**"
+        messages = []
+        current: List[str] = []
+        length = len(header)
+        for line in lines:
+            line = line[:limit - len(header) - 1]
+            if current and length + 1 + len(line) > limit:
+                messages.append(current)
+                current, length = [], len(header)
+            current.append(line)
+            length += 1 + len(line)
+        if current:
+            messages.append(current)
+
+        return [
+            (f"{header} {chunk[0]}" if len(chunk) == 1 else header + "\n" + "\n".join(chunk), len(chunk))
+            for chunk in messages
+        ]
+
+    def stats(self) -> Dict:
+        return {
+            "pending": sum(len(entries) for entries in self._pending.values()),
+            "sent_messages": self.sent_messages,
+            "sent_entries": self.sent_entries,
+            "dropped": dict(self.dropped),
+        }
+
+
+# ===== JOB SCHEDULER =====
+JOB_SCHEDULER_CONFIG = {
+    "batch_size": 50,            # due jobs claimed per dispatcher run
+    "lease_seconds": 300,        # a claimed job is retried if not finished within this time
+    "max_attempts": 3,
+    "retry_delay_seconds": 300,  # multiplied by the attempt number
+}
+
+# Job kind -> days after role expiry
+FOLLOWUP_JOB_KINDS = {"followup_3": 3, "followup_7": 7, "followup_14": 14}
+
+FOLLOWUP_DM_MESSAGES = {
+    3:
+    "Hey! It's been 3 days since your **24-hour free access to the Premium Signals channel** ended. We hope you were able to catch good trades with us during that time.\n\nAs you've probably seen, the **free signals channel only gets about 1 signal a day**, while inside **Gold Pioneers**, members receive **8–10 high-quality signals every single day in <#1350929852299214999>**. That means way more chances to profit and grow consistently.\n\nWe'd love to **invite you back to Premium Signals** so you don't miss out on more solid opportunities.\n\n**Feel free to join us again through this link:** https://whop.com/gold-pioneer",
+    7:
+    "It's been a week since your Premium Signals trial ended. Since then, our **Gold Pioneers  have been catching trade setups daily in <#1350929852299214999>**.\n\nIf you found value in just 24 hours, imagine the results you could be seeing by now with full access. It's all about **consistency and staying plugged into the right information**.\n\nWe'd like to **personally invite you to rejoin Premium Signals** and get back into the rhythm.\n\n\n**Feel free to join us again through this link:** https://whop.com/gold-pioneer",
+    14:
+    "Hey! It's been two weeks since your access to Premium Signals ended. We hope you've stayed active. \n\nIf you've been trading solo or passively following the free channel, you might be feeling the difference. in <#1350929852299214999>, it's not just about more signals. It's about the **structure, support, and smarter decision-making**. That edge can make all the difference over time.\n\nWe'd love to **officially invite you back into Premium Signals** and help you start compounding results again.\n\n**Feel free to join us again through this link:** https://whop.com/gold-pioneer"
+}
+
+MONDAY_ACTIVATION_MESSAGE = (
+    "Hey! The weekend is over, so the trading markets have been opened again. "
+    "That means your 24-hour welcome gift has officially started. "
+    "You now have full access to the premium channel. "
+    "Let's make the most of it by securing some wins together!"
+)
+
+
+# ===== MEMBER RESOLUTION =====
+MEMBER_RESOLVER_CONFIG = {
+    "query_batch_size": 100,      # gateway query_members accepts at most 100 user ids
+    "chunk_threshold": 1000,      # this many misses in an unchunked guild: chunk the whole guild instead
+    "missing_ttl_seconds": 600,   # how long an id that is not in the guild is remembered as missing
+}
+
+
+class MemberResolver:
+    """Resolves member ids from the gateway member cache, querying the gateway only for misses"""
+
+    def __init__(self, bot: "TradingBot"):
+        self.bot = bot
+        self.cache_hits = 0
+        self.gateway_queries = 0
+        self._missing: Dict[Tuple[int, int], float] = {}
+
+    async def resolve(self, guild_id: int, member_ids) -> Dict[int, discord.Member]:
+        """Members of one guild by id; ids that are not (or no longer) in the guild are left out"""
+        guild = self.bot.get_guild(guild_id)
+        if not guild:
+            return {}
+
+        now = time.monotonic()
+        if len(self._missing) > 10000:
+            self._missing = {key: expires for key, expires in self._missing.items() if expires > now}
+
+        found = {}
+        misses = []
+        for member_id in set(member_ids):
+            member = guild.get_member(member_id)
+            if member:
+                found[member_id] = member
+            elif self._missing.get((guild_id, member_id), 0) <= now:
+                misses.append(member_id)
+        self.cache_hits += len(found)
+
+        if len(misses) >= MEMBER_RESOLVER_CONFIG["chunk_threshold"] and not guild.chunked:
+            try:
+                await guild.chunk()
+                self.gateway_queries += 1
+            except Exception as e:
+                print(f"❌ Error chunking members for {guild.name}: {e}")
+            for member_id in misses:
+                member = guild.get_member(member_id)
+                if member:
+                    found[member_id] = member
+            misses = [member_id for member_id in misses if member_id not in found]
+
+        batch_size = MEMBER_RESOLVER_CONFIG["query_batch_size"]
+        for start in range(0, len(misses), batch_size):
+            batch = misses[start:start + batch_size]
+            try:
+                members = await guild.query_members(user_ids=batch, limit=len(batch), cache=True)
+                self.gateway_queries += 1
+            except Exception as e:
+                print(f"❌ Error querying members for {guild.name}: {e}")
+                continue
+            for member in members:
+                found[member.id] = member
+            expires = time.monotonic() + MEMBER_RESOLVER_CONFIG["missing_ttl_seconds"]
+            for member_id in batch:
+                if member_id not in found:
+                    self._missing[(guild_id, member_id)] = expires
+
+        return found
+
+    async def resolve_many(self, pairs) -> Dict[int, discord.Member]:
+        """Members for (guild_id, member_id) pairs across guilds, one lookup batch per guild"""
+        by_guild: Dict[int, List[int]] = {}
+        for guild_id, member_id in pairs:
+            by_guild.setdefault(guild_id, []).append(member_id)
+
+        found = {}
+        for guild_id, member_ids in by_guild.items():
+            found.update(await self.resolve(guild_id, member_ids))
+        return found
+
+    async def resolve_one(self, guild_id: int, member_id: int) -> Optional[discord.Member]:
+        return (await self.resolve(guild_id, [member_id])).get(member_id)
+
+
+# ===== DM DELIVERY =====
+DM_SERVICE_CONFIG = {
+    "workers": 4,
+    "queue_size": 1000,
+    "max_attempts": 4,
+    "backoff_base": 2.0,          # seconds; doubles per retry, full jitter
+    "backoff_max": 60.0,
+    "channel_cache_size": 10000,  # user id -> DM channel id entries kept
+}
+DM_OUTCOMES = ("sent", "forbidden", "not_found", "rate_limited", "failed")
+
+
+class DMService:
+    """Worker pool delivering DMs with cached DM channels, route rate limits and jittered retries"""
+
+    def __init__(self, bot: "TradingBot"):
+        self.bot = bot
+        self.queue: Optional[asyncio.Queue] = None
+        self.channels: "OrderedDict[int, int]" = OrderedDict()
+        self.outcomes = {outcome: 0 for outcome in DM_OUTCOMES}
+        self.retries = 0
+        self.channels_created = 0
+        self._sent_at = deque(maxlen=10000)
+        self._tasks: List[asyncio.Task] = []
+
+    def start(self):
+        if self._tasks:
+            return
+        self.queue = asyncio.Queue(maxsize=DM_SERVICE_CONFIG["queue_size"])
+        self._tasks = [asyncio.create_task(self._worker(), name=f"dm_worker:{index}")
+                       for index in range(DM_SERVICE_CONFIG["workers"])]
+
+    async def stop(self, timeout: float = 10.0):
+        if self.queue is not None:
+            try:
+                await asyncio.wait_for(self.queue.join(), timeout)
+            except asyncio.TimeoutError:
+                print(f"⚠️ DM service stopped with {self.queue.qsize()} DMs still queued")
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+
+    async def send(self, user: discord.abc.User, content: str) -> str:
+        """Queue a DM and wait for its delivery outcome (one of DM_OUTCOMES)"""
+        if self.queue is None:
+            self.start()
+        result = asyncio.get_running_loop().create_future()
+        await self.queue.put((user, content, result))
+        return await result
+
+    async def _worker(self):
+        while True:
+            user, content, result = await self.queue.get()
+            try:
+                outcome = await self._deliver(user, content)
+            except Exception as e:
+                print(f"❌ Unexpected error sending DM to {user}: {e}")
+                outcome = "failed"
+            finally:
+                self.queue.task_done()
+
+            self.outcomes[outcome] += 1
+            if outcome == "sent":
+                self._sent_at.append(time.monotonic())
+            if not result.done():
+                result.set_result(outcome)
+
+    async def _deliver(self, user: discord.abc.User, content: str) -> str:
+        outcome = "failed"
+        for attempt in range(1, DM_SERVICE_CONFIG["max_attempts"] + 1):
+            try:
+                channel = await self._dm_channel(user)
+                await self.bot.rate_limiter.acquire("dm")
+                await channel.send(content)
+                return "sent"
+            except discord.Forbidden:
+                return "forbidden"
+            except discord.NotFound:
+                # A cached channel that no longer exists is recreated on the next attempt
+                if self.channels.pop(user.id, None) is None:
+                    return "not_found"
+                await self._forget_channel(user.id)
+                outcome = "not_found"
+            except discord.HTTPException as e:
+                if e.status != 429 and e.status < 500:
+                    return "failed"
+                outcome = "rate_limited" if e.status == 429 else "failed"
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                outcome = "failed"
+
+            if attempt < DM_SERVICE_CONFIG["max_attempts"]:
+                self.retries += 1
+                backoff = min(DM_SERVICE_CONFIG["backoff_max"], DM_SERVICE_CONFIG["backoff_base"] * 2 ** (attempt - 1))
+                await asyncio.sleep(random.uniform(0, backoff))
+        return outcome
+
+    def _cache_channel(self, user_id: int, channel_id: int):
+        self.channels[user_id] = channel_id
+        self.channels.move_to_end(user_id)
+        if len(self.channels) > DM_SERVICE_CONFIG["channel_cache_size"]:
+            self.channels.popitem(last=False)
+
+    async def warm(self, user_ids: List[int]):
+        """Load persisted DM channel ids for users about to be messaged, in one query"""
+        missing = [user_id for user_id in set(user_ids) if user_id not in self.channels]
+        if not missing or not self.bot.db:
+            return
+        try:
+            for user_id, channel_id in (await self.bot.db.load_dm_channels(missing)).items():
+                self._cache_channel(user_id, channel_id)
+        except Exception as e:
+            print(f"❌ Error loading DM channels: {e}")
+
+    async def _forget_channel(self, user_id: int):
+        if self.bot.db:
+            try:
+                await self.bot.db.delete_dm_channel(user_id)
+            except Exception as e:
+                print(f"❌ Error deleting DM channel for {user_id}: {e}")
+
+    async def _dm_channel(self, user: discord.abc.User) -> discord.abc.Messageable:
+        """DM channel for a user, creating it through the REST API only if it is neither cached nor persisted"""
+        if user.id not in self.channels:
+            await self.warm([user.id])
+
+        channel_id = self.channels.get(user.id)
+        if channel_id is not None:
+            self.channels.move_to_end(user.id)
+            return self.bot.get_partial_messageable(channel_id, type=discord.ChannelType.private)
+
+        channel = user.dm_channel
+        if channel is None:
+            await self.bot.rate_limiter.acquire("dm_create")
+            channel = await user.create_dm()
+            self.channels_created += 1
+        self._cache_channel(user.id, channel.id)
+
+        if self.bot.db:
+            try:
+                await self.bot.db.save_dm_channel(user.id, channel.id)
+            except Exception as e:
+                print(f"❌ Error saving DM channel for {user.id}: {e}")
+        return channel
+
+    def stats(self) -> Dict:
+        cutoff = time.monotonic() - 60
+        return {
+            "queue_depth": self.queue.qsize() if self.queue else 0,
+            "workers": DM_SERVICE_CONFIG["workers"],
+            "sent_last_minute": sum(1 for sent_at in self._sent_at if sent_at >= cutoff),
+            "outcomes": dict(self.outcomes),
+            "retries": self.retries,
+            "cached_channels": len(self.channels),
+            "channels_created": self.channels_created,
+        }
+
+
+# ===== GIVEAWAY SCHEDULER =====
+GIVEAWAY_CONFIG = {
+    "emoji": "🎉",
+    "entry_flush_interval": 5.0,  # seconds between batched participant writes
+    # Crawl reactions once after a restart to pick up entries made while the bot was offline
+    "reconcile_on_resume": True,
+    # Crawl reactions again when a giveaway ends (slow for large giveaways; participants are tracked live)
+    "reconcile_on_end": os.getenv("GIVEAWAY_RECONCILE_ON_END", "false").lower() == "true",
+}
+
+
+class GiveawayEntryLog:
+    """Buffers giveaway entries and withdrawals and writes them to the database in batches"""
+
+    def __init__(self, bot: "TradingBot"):
+        self.bot = bot
+        self._pending: Dict[Tuple[str, int], bool] = {}  # (giveaway_id, user_id): entered
+        self._flush_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._flush_loop(), name="giveaway_entry_flush")
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        await self.flush()
+
+    def record(self, giveaway_id: str, user_id: int, entered: bool):
+        # Only the latest change per participant needs writing
+        self._pending[(giveaway_id, user_id)] = entered
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(GIVEAWAY_CONFIG["entry_flush_interval"])
+            await self.flush()
+
+    async def flush(self):
+        async with self._flush_lock:
+            if not self._pending or not self.bot.db:
+                return
+            pending, self._pending = self._pending, {}
+            try:
+                await self.bot.db.save_giveaway_entries(
+                    [key for key, entered in pending.items() if entered],
+                    [key for key, entered in pending.items() if not entered])
+            except Exception as e:
+                # Retry on the next flush unless a newer change replaced the entry
+                for key, entered in pending.items():
+                    self._pending.setdefault(key, entered)
+                print(f"❌ Error saving giveaway entries: {e}")
+
+
+class GiveawayScheduler:
+    """One timer task that ends giveaways as their end_time passes"""
+
+    # Upper bound on a single sleep so long waits re-check the wall clock
+    MAX_SLEEP_SECONDS = 3600
+    # A giveaway that failed to end is retried after 1, 2, 4 ... minutes, at most an hour apart
+    RETRY_BASE_SECONDS = 60
+    RETRY_MAX_SECONDS = 3600
+
+    def __init__(self):
+        self._heap: List[Tuple[datetime, str, datetime]] = []  # (due, giveaway id, end_time it was scheduled for)
+        self._failures: Dict[str, int] = {}
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="giveaway_scheduler")
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    def schedule(self, giveaway_id: str, end_time: datetime):
+        self._failures.pop(giveaway_id, None)
+        heapq.heappush(self._heap, (end_time, giveaway_id, end_time))
+        self._wakeup.set()
+
+    def _retry(self, giveaway_id: str, end_time: datetime, now: datetime):
+        failures = self._failures[giveaway_id] = self._failures.get(giveaway_id, 0) + 1
+        delay = min(self.RETRY_BASE_SECONDS * 2 ** (failures - 1), self.RETRY_MAX_SECONDS)
+        print(f"⚠️ Giveaway {giveaway_id} failed to end (attempt {failures}), retrying in {delay}s")
+        heapq.heappush(self._heap, (now + timedelta(seconds=delay), giveaway_id, end_time))
+
+    def next_due(self) -> Optional[datetime]:
+        return self._heap[0][0] if self._heap else None
+
+    async def _run(self):
+        while True:
+            self._wakeup.clear()
+            now = datetime.now(AMSTERDAM_TZ)
+            due = []
+            while self._heap and self._heap[0][0] <= now:
+                _, giveaway_id, end_time = heapq.heappop(self._heap)
+                giveaway = ACTIVE_GIVEAWAYS.get(giveaway_id)
+                # Entries for giveaways that already ended or were rescheduled are stale
+                if giveaway is not None and giveaway.end_time == end_time:
+                    due.append((giveaway_id, end_time))
+
+            if due:
+                results = await asyncio.gather(*(end_giveaway(giveaway_id) for giveaway_id, _ in due),
+                                               return_exceptions=True)
+                for (giveaway_id, end_time), result in zip(due, results):
+                    if isinstance(result, Exception):
+                        print(f"❌ Error ending giveaway {giveaway_id}: {result}")
+                    if result is True:
+                        self._failures.pop(giveaway_id, None)
+                    elif giveaway_id in ACTIVE_GIVEAWAYS:
+                        self._retry(giveaway_id, end_time, datetime.now(AMSTERDAM_TZ))
+                continue
+
+            timeout = None
+            if self._heap:
+                timeout = min(max(0.0, (self._heap[0][0] - now).total_seconds()), self.MAX_SLEEP_SECONDS)
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+
+# ===== STARTUP ORCHESTRATION =====
+class StartupOrchestrator:
+    """Runs startup stages as a dependency graph: independent stages run concurrently, each with a timeout"""
+
+    def __init__(self):
+        self.created_at = time.monotonic()
+        self.completed_after: Optional[float] = None
+        self.stages: Dict[str, Dict] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._completion: Optional[asyncio.Task] = None
+
+    def add(self, name: str, func, depends_on: Tuple[str, ...] = (), timeout: Optional[float] = 60):
+        """Register a stage; func is an async callable run once its dependencies have succeeded"""
+        self.stages[name] = {"func": func, "depends_on": depends_on, "timeout": timeout,
+                             "status": "pending", "duration_ms": None, "error": None}
+
+    def start(self):
+        """Schedule every registered stage"""
+        for name in self.stages:
+            if name not in self._tasks:
+                self._tasks[name] = asyncio.create_task(self._run_stage(name), name=f"startup:{name}")
+        self._completion = asyncio.create_task(self._wait_all(), name="startup")
+
+    async def wait_for(self, name: str) -> bool:
+        """Wait for one stage and return whether it succeeded"""
+        await asyncio.shield(self._tasks[name])
+        return self.stages[name]["status"] == "ok"
+
+    async def _run_stage(self, name: str):
+        stage = self.stages[name]
+        for dependency in stage["depends_on"]:
+            if not await self.wait_for(dependency):
+                stage["status"] = "skipped"
+                stage["error"] = f"dependency '{dependency}' did not succeed"
+                print(f"⏭️ Startup stage '{name}' skipped: {stage['error']}")
+                return
+
+        stage["status"] = "running"
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(stage["func"](), stage["timeout"])
+            stage["status"] = "ok"
+        except asyncio.TimeoutError:
+            stage["status"] = "timeout"
+            stage["error"] = f"timed out after {stage['timeout']}s"
+        except Exception as e:
+            stage["status"] = "failed"
+            stage["error"] = str(e)
+        stage["duration_ms"] = round((time.monotonic() - started) * 1000)
+
+        if stage["status"] == "ok":
+            print(f"✅ Startup stage '{name}' finished in {stage['duration_ms']}ms")
+        else:
+            print(f"❌ Startup stage '{name}' {stage['status']}: {stage['error']}")
+
+    async def _wait_all(self):
+        await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+        self.completed_after = time.monotonic() - self.created_at
+        print(f"🚀 Startup complete in {self.completed_after:.1f}s")
+
+    def report(self) -> Dict:
+        return {
+            "complete": self.completed_after is not None,
+            "total_ms": round(self.completed_after * 1000) if self.completed_after is not None else None,
+            "stages": {
+                name: {key: stage[key] for key in ("status", "duration_ms", "error", "depends_on")}
+                for name, stage in self.stages.items()
+            },
+        }
+
+
+# ===== TICK STORE =====
+TICK_STORE_CONFIG = {
+    "enabled": os.getenv("TICK_STORE_ENABLED", "true").lower() != "false",
+    "directory": os.getenv("TICK_STORE_DIR", "tick_data"),
+    "flush_interval": 10.0,         # seconds between appends to disk
+    "max_pending": 10000,           # buffered ticks before new ones are dropped
+    "maintenance_interval": 3600,   # seconds between compaction and retention runs
+    "compact_after_days": 1,        # closed days older than this are compacted once
+    "compact_resolution": int(os.getenv("TICK_COMPACT_RESOLUTION", "0")),  # seconds per source kept by compaction (0 = every tick)
+    "retention_days": int(os.getenv("TICK_RETENTION_DAYS", "90")),          # 0 keeps every day
+}
+
+# Column -> typecode; each column is a file of fixed-width native-endian values (<day>/<column>.bin)
+TICK_COLUMNS = {"ts": "q", "price": "d", "source": "q"}  # ts = epoch milliseconds UTC
+TICK_SOURCES = ("fxapi", "twelve_data", "alpha_vantage", "fmp")  # "source" column codes, -1 = unknown
+TICK_COMPACTED_MARKER = ".compacted"
+
+
+class TickStore:
+    """Appends every fetched quote to per-pair, per-day columnar files for replay and audits"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.recorded = 0
+        self.written = 0
+        self.dropped = 0
+        self.compacted_days = 0
+        self.removed_days = 0
+        self._pending: Dict[Tuple[str, str], Dict[str, array]] = {}
+        self._pending_count = 0
+        self._lock = threading.Lock()  # appends and maintenance run in worker threads
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None and TICK_STORE_CONFIG["enabled"]:
+            self._task = asyncio.create_task(self._flush_loop(), name="tick_store_flush")
+
+    async def stop(self):
+        """Stop the flusher and write whatever is still buffered"""
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        await self.flush()
+
+    def record(self, pair: str, price: float, source: str, ts: Optional[float] = None):
+        """Buffer one quote without touching the disk"""
+        if not TICK_STORE_CONFIG["enabled"]:
+            return
+        if self._pending_count >= TICK_STORE_CONFIG["max_pending"]:
+            self.dropped += 1
+            return
+        ts_ms = int((time.time() if ts is None else ts) * 1000)
+        pair = pair.replace("/", "").upper()
+        day = datetime.fromtimestamp(ts_ms / 1000, timezone.utc).strftime("%Y-%m-%d")
+        columns = self._pending.get((pair, day))
+        if columns is None:
+            columns = self._pending[(pair, day)] = {name: array(code) for name, code in TICK_COLUMNS.items()}
+        columns["ts"].append(ts_ms)
+        columns["price"].append(price)
+        columns["source"].append(TICK_SOURCES.index(source) if source in TICK_SOURCES else -1)
+        self._pending_count += 1
+        self.recorded += 1
+
+    async def _flush_loop(self):
+        last_maintenance = 0.0
+        while True:
+            await asyncio.sleep(TICK_STORE_CONFIG["flush_interval"])
+            try:
+                await self.flush()
+                if time.monotonic() - last_maintenance >= TICK_STORE_CONFIG["maintenance_interval"]:
+                    last_maintenance = time.monotonic()
+                    await self.maintain()
+            except Exception as e:
+                print(f"⚠️ Tick store flush failed: {e}")
+
+    async def flush(self):
+        """Append all buffered ticks to their day files"""
+        if not self._pending:
+            return
+        pending, self._pending, self._pending_count = self._pending, {}, 0
+        await asyncio.to_thread(self._append, pending)
+
+    def _append(self, pending: Dict[Tuple[str, str], Dict[str, array]]):
+        with self._lock:
+            for (pair, day), columns in pending.items():
+                path = self.day_path(pair, day)
+                os.makedirs(path, exist_ok=True)
+                for name, values in columns.items():
+                    with open(os.path.join(path, f"{name}.bin"), "ab") as f:
+                        values.tofile(f)
+                # Late ticks for an already compacted day: compact it again next time
+                marker = os.path.join(path, TICK_COMPACTED_MARKER)
+                if os.path.exists(marker):
+                    os.remove(marker)
+                self.written += len(columns["ts"])
+
+    # ----- Reading -----
+
+    def day_path(self, pair: str, day: str) -> str:
+        return os.path.join(self.directory, pair.replace("/", "").upper(), day)
+
+    def pairs(self) -> List[str]:
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(name for name in os.listdir(self.directory)
+                      if os.path.isdir(os.path.join(self.directory, name)))
+
+    def days(self, pair: str) -> List[str]:
+        """Recorded days for a pair as YYYY-MM-DD strings, oldest first"""
+        path = os.path.join(self.directory, pair.replace("/", "").upper())
+        return sorted(os.listdir(path)) if os.path.isdir(path) else []
+
+    def read(self, pair: str, day: str) -> Dict[str, object]:
+        """One day's columns mapped read-only: NumPy memmaps when available, else memoryviews"""
+        path = self.day_path(pair, day)
+        files = {name: os.path.join(path, f"{name}.bin") for name in TICK_COLUMNS}
+        # A crash mid-append can leave one column longer than the others; trim to complete rows
+        rows = min((os.path.getsize(file) // 8 if os.path.exists(file) else 0) for file in files.values())
+        columns = {}
+        for name, code in TICK_COLUMNS.items():
+            if rows == 0:
+                columns[name] = np.empty(0, dtype=code) if NUMPY_AVAILABLE else memoryview(array(code))
+            elif NUMPY_AVAILABLE:
+                columns[name] = np.memmap(files[name], dtype=code, mode="r", shape=(rows,))
+            else:
+                with open(files[name], "rb") as f:
+                    mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                columns[name] = memoryview(mapped).cast(code)[:rows]
+        return columns
+
+    def load(self, pair: str, since_ms: int, until_ms: int) -> Tuple:
+        """Time-ordered (ts, price) arrays for a pair between two epoch-ms times (needs NumPy)"""
+        first_day, last_day = (datetime.fromtimestamp(ms / 1000, timezone.utc).strftime("%Y-%m-%d")
+                               for ms in (since_ms, until_ms))
+        parts = [self.read(pair, day) for day in self.days(pair) if first_day <= day <= last_day]
+        if not parts:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        ts = np.concatenate([part["ts"] for part in parts])
+        price = np.concatenate([part["price"] for part in parts])
+        keep = (ts >= since_ms) & (ts <= until_ms)
+        ts, price = ts[keep], price[keep]
+        order = np.argsort(ts, kind="stable")
+        return ts[order], price[order]
+
+    # ----- Compaction and retention -----
+
+    async def maintain(self) -> Tuple[int, int]:
+        """Compact closed days and delete expired ones; returns (compacted, removed)"""
+        return await asyncio.to_thread(self._maintain, datetime.now(timezone.utc).date())
+
+    def _maintain(self, today) -> Tuple[int, int]:
+        compacted = removed = 0
+        retention = TICK_STORE_CONFIG["retention_days"]
+        compact_before = str(today - timedelta(days=TICK_STORE_CONFIG["compact_after_days"]))
+        remove_before = str(today - timedelta(days=retention)) if retention else None
+        with self._lock:
+            for pair in self.pairs():
+                for day in self.days(pair):
+                    path = self.day_path(pair, day)
+                    if remove_before and day < remove_before:
+                        shutil.rmtree(path, ignore_errors=True)
+                        removed += 1
+                    elif day < compact_before and not os.path.exists(os.path.join(path, TICK_COMPACTED_MARKER)):
+                        self._compact_day(path)
+                        compacted += 1
+                pair_path = os.path.join(self.directory, pair)
+                if not os.listdir(pair_path):
+                    os.rmdir(pair_path)
+        self.compacted_days += compacted
+        self.removed_days += removed
+        return compacted, removed
+
+    def _compact_day(self, path: str):
+        """Sort a day by time, drop duplicates and optionally keep one tick per source per bucket"""
+        columns = {}
+        for name, code in TICK_COLUMNS.items():
+            columns[name] = array(code)
+            file = os.path.join(path, f"{name}.bin")
+            if os.path.exists(file):
+                with open(file, "rb") as f:
+                    columns[name].frombytes(f.read())
+        rows = sorted(set(zip(columns["ts"], columns["price"], columns["source"])))
+
+        resolution = TICK_STORE_CONFIG["compact_resolution"] * 1000
+        if resolution:
+            # Rows are time-ordered, so the last row written per bucket wins
+            rows = sorted({(ts // resolution, source): (ts, price, source) for ts, price, source in rows}.values())
+
+        # Write every column before replacing any, so a crash leaves the old day intact
+        for index, (name, code) in enumerate(TICK_COLUMNS.items()):
+            with open(os.path.join(path, f"{name}.bin.tmp"), "wb") as f:
+                array(code, (row[index] for row in rows)).tofile(f)
+        for name in TICK_COLUMNS:
+            os.replace(os.path.join(path, f"{name}.bin.tmp"), os.path.join(path, f"{name}.bin"))
+        open(os.path.join(path, TICK_COMPACTED_MARKER), "w").close()
+
+    def stats(self) -> Dict:
+        return {
+            "enabled": TICK_STORE_CONFIG["enabled"],
+            "recorded": self.recorded,
+            "written": self.written,
+            "pending": self._pending_count,
+            "dropped": self.dropped,
+            "compacted_days": self.compacted_days,
+            "removed_days": self.removed_days,
+        }
+
+
+# ===== BACKTEST =====
+BACKTEST_CONFIG = {
+    "max_hold_hours": 72,        # signals with no outcome after this long count as open
+    "chunk_size": 512,           # signals per array batch; memory is chunk_size x bars in the hold window
+    "history_limit": 2000,       # channel messages scanned by /backtest
+    "candle_interval": "5min",   # Twelve Data time_series interval for downloaded candles
+    "candle_page_size": 5000,    # Twelve Data's maximum outputsize
+    "max_candle_pages": 4,       # time_series requests per pair per backtest
+}
+
+# Outcome codes returned by backtest_outcomes
+BACKTEST_OUTCOMES = ("open", "tp3", "sl", "breakeven")
+
+
+def pip_value_for(pair: str) -> float:
+    """Pip size for a pair from PAIR_CONFIG, 0.0001 for unknown pairs"""
+    return PAIR_CONFIG.get(pair.replace("/", "").upper(), {}).get("pip_value", 0.0001)
+
+
+def backtest_outcomes(ts, high, low, signals: Dict) -> Dict:
+    """Evaluate one pair's signals against its price bars with array operations
+
+    `signals` holds equal-length arrays ts (epoch ms), buy (bool), entry, tp1, tp2, tp3 and sl.
+    Follows check_price_levels: the SL is checked before the TPs, TP2 moves the SL to entry,
+    and a bar touching levels on both sides counts the one against the trade.
+    """
+    count = len(signals["ts"])
+    outcome = np.zeros(count, dtype=np.int8)
+    reached = np.zeros(count, dtype=np.int8)  # highest TP reached before the trade closed
+    exit_ts = np.full(count, -1, dtype=np.int64)
+
+    hold = int(BACKTEST_CONFIG["max_hold_hours"] * 3600 * 1000)
+    starts = np.searchsorted(ts, signals["ts"], side="left")
+    ends = np.searchsorted(ts, signals["ts"] + hold, side="right")
+
+    for lo in range(0, count, BACKTEST_CONFIG["chunk_size"]):
+        rows = slice(lo, lo + BACKTEST_CONFIG["chunk_size"])
+        start, end = starts[rows], ends[rows]
+        width = int((end - start).max(initial=0))
+        if width == 0:
+            continue
+
+        # One row per signal, one column per bar since the signal
+        offsets = np.arange(width)
+        index = start[:, None] + offsets
+        valid = index < end[:, None]
+        index = np.minimum(index, len(ts) - 1)
+
+        # Mirror sells so TPs are always crossed upwards and the SL and breakeven downwards
+        buy = signals["buy"][rows][:, None]
+        sign = np.where(buy, 1.0, -1.0)
+        favorable = np.where(buy, high[index], -low[index])
+        adverse = np.where(buy, low[index], -high[index])
+
+        def first(mask):
+            """Bar offset of each row's first True, `width` when there is none"""
+            mask &= valid
+            return np.where(mask.any(axis=1), mask.argmax(axis=1), width)
+
+        tp1 = first(favorable >= sign * signals["tp1"][rows][:, None])
+        tp2 = first(favorable >= sign * signals["tp2"][rows][:, None])
+        tp3 = first(favorable >= sign * signals["tp3"][rows][:, None])
+        sl = first(adverse <= sign * signals["sl"][rows][:, None])
+        # Breakeven only arms on the bars after TP2
+        breakeven = first((adverse <= sign * signals["entry"][rows][:, None]) & (offsets > tp2[:, None]))
+
+        hit_sl = (sl < width) & (sl <= tp2)
+        hit_tp3 = ~hit_sl & (tp3 < width) & (tp3 < breakeven)
+        hit_breakeven = ~hit_sl & ~hit_tp3 & (breakeven < width)
+        exit_bar = np.where(hit_sl, sl, np.where(hit_tp3, tp3, np.where(hit_breakeven, breakeven, width)))
+
+        outcome[rows] = np.select([hit_tp3, hit_sl, hit_breakeven], [1, 2, 3], 0)
+        reached[rows] = np.where(hit_tp3, 3, (tp1 < exit_bar).astype(np.int8) + (tp2 < exit_bar))
+        closed = exit_bar < width
+        exit_ts[rows] = np.where(closed, ts[np.minimum(start + exit_bar, len(ts) - 1)], -1)
+
+    return {"outcome": outcome, "reached": reached, "exit_ts": exit_ts}
+
+
+def run_backtest(signals: List[Dict], series: Dict[str, Tuple], relevel=None) -> Dict[str, Dict]:
+    """Per-pair outcome counts, win rates and pips for parsed signals
+
+    `signals` are parse_signal_message dicts with a "timestamp" in epoch ms. `series` maps each
+    pair to time-ordered (ts, open, high, low) arrays. With `relevel` (calculate_live_tracking_levels),
+    levels are recomputed from the first bar's open as live tracking does, instead of the message's.
+    """
+    by_pair: Dict[str, List[Dict]] = {}
+    for signal in signals:
+        by_pair.setdefault(signal["pair"].replace("/", "").upper(), []).append(signal)
+
+    report = {}
+    for pair, pair_signals in sorted(by_pair.items()):
+        stats = {"signals": len(pair_signals), "no_data": 0, "tp1": 0, "tp2": 0, "tp3": 0,
+                 "sl": 0, "breakeven": 0, "open": 0, "win_rate": None, "pips": 0.0}
+        report[pair] = stats
+        ts, opens, high, low = series.get(pair) or (np.empty(0, dtype=np.int64),) * 4
+        if len(ts) == 0:
+            stats["no_data"] = len(pair_signals)
+            continue
+
+        columns = {name: np.array([signal[name] for signal in pair_signals], dtype=np.float64)
+                   for name in ("entry", "tp1", "tp2", "tp3", "sl")}
+        columns["ts"] = np.array([signal["timestamp"] for signal in pair_signals], dtype=np.int64)
+        columns["buy"] = np.array([signal["action"] == "BUY" for signal in pair_signals])
+        covered = columns["ts"] <= ts[-1]
+        if relevel:
+            first_bar = np.minimum(np.searchsorted(ts, columns["ts"]), len(ts) - 1)
+            for row, signal in enumerate(pair_signals):
+                levels = relevel(float(opens[first_bar[row]]), pair, signal["action"])
+                for name in ("entry", "tp1", "tp2", "tp3", "sl"):
+                    columns[name][row] = levels[name]
+
+        result = backtest_outcomes(ts, high, low, {name: values[covered] for name, values in columns.items()})
+        outcome, reached = result["outcome"], result["reached"]
+        pip = pip_value_for(pair)
+        entry, tp3, sl = columns["entry"][covered], columns["tp3"][covered], columns["sl"][covered]
+
+        stats["no_data"] = int((~covered).sum())
+        for level in (1, 2, 3):
+            stats[f"tp{level}"] = int((reached >= level).sum())
+        for code, name in enumerate(BACKTEST_OUTCOMES):
+            stats[name] = int((outcome == code).sum())
+        # Whole position closes at the exit level: TP3 and SL at their distance, breakeven at zero
+        pips = np.where(outcome == 1, np.abs(tp3 - entry), 0.0) - np.where(outcome == 2, np.abs(sl - entry), 0.0)
+        stats["pips"] = round(float(pips.sum() / pip), 1)
+        closed = stats["tp3"] + stats["sl"] + stats["breakeven"]
+        stats["win_rate"] = round(stats["tp3"] / closed * 100, 1) if closed else None
+    return report
+
+
+async def fetch_candles(pair_clean: str, start: datetime, end: datetime) -> Tuple:
+    """Download (ts, open, high, low) candles from Twelve Data's time_series endpoint, oldest first"""
+    base_url = PRICE_TRACKING_CONFIG["api_endpoints"]["twelve_data"].rsplit("/", 1)[0]
+    page_size = BACKTEST_CONFIG["candle_page_size"]
+    rows = []
+    cursor = end
+    async with provider_session() as session:
+        for _ in range(BACKTEST_CONFIG["max_candle_pages"]):
+            params = {
+                "symbol": pair_clean,
+                "interval": BACKTEST_CONFIG["candle_interval"],
+                "start_date": start.astimezone(timezone.utc).strftime("%Y-%m-%d %H:%M:%S"),
+                "end_date": cursor.astimezone(timezone.utc).strftime("%Y-%m-%d %H:%M:%S"),
+                "outputsize": page_size,
+                "timezone": "UTC",
+                "apikey": PRICE_TRACKING_CONFIG["api_keys"]["twelve_data_key"],
+            }
+            async with session.get(f"{base_url}/time_series", params=params, timeout=30) as response:
+                data = await response.json()
+            values = data.get("values") if isinstance(data, dict) else None
+            if not values:
+                if isinstance(data, dict) and "limit" in str(data.get("message", "")).lower():
+                    print(f"⚠️ Twelve Data limit while downloading {pair_clean} candles: {data['message']}")
+                break
+            for value in values:
+                moment = datetime.fromisoformat(value["datetime"]).replace(tzinfo=timezone.utc)
+                rows.append((int(moment.timestamp() * 1000), float(value["open"]),
+                             float(value["high"]), float(value["low"])))
+            if len(values) < page_size:
+                break
+            # Values are newest first; continue before the oldest one
+            cursor = datetime.fromisoformat(values[-1]["datetime"]).replace(tzinfo=timezone.utc) - timedelta(seconds=1)
+
+    if not rows:
+        return (np.empty(0, dtype=np.int64),) + (np.empty(0),) * 3
+    table = np.array(sorted(set(rows)))
+    return table[:, 0].astype(np.int64), table[:, 1], table[:, 2], table[:, 3]
+
+
+# ===== TRADE STATS =====
+# Closing outcome -> level the trade closed at
+TRADE_EXIT_LEVELS = {"tp3": "tp3", "sl": "sl", "breakeven": "entry"}
+
+
+@dataclass(slots=True)
+class TradeStatsRow:
+    trades: int = 0
+    wins: int = 0
+    losses: int = 0
+    breakevens: int = 0
+    tp1_hits: int = 0
+    tp2_hits: int = 0
+    tp3_hits: int = 0
+    pips: float = 0.0
+
+    def add(self, other: "TradeStatsRow"):
+        self.trades += other.trades
+        self.wins += other.wins
+        self.losses += other.losses
+        self.breakevens += other.breakevens
+        self.tp1_hits += other.tp1_hits
+        self.tp2_hits += other.tp2_hits
+        self.tp3_hits += other.tp3_hits
+        self.pips += other.pips
+
+    def values(self) -> Tuple:
+        return (self.trades, self.wins, self.losses, self.breakevens,
+                self.tp1_hits, self.tp2_hits, self.tp3_hits, self.pips)
+
+    def win_rate(self) -> Optional[float]:
+        return round(self.wins / self.trades * 100, 1) if self.trades else None
+
+
+def trade_periods(moment: datetime) -> Dict[str, str]:
+    """Rollup period keys containing `moment`, by period type (Amsterdam calendar)"""
+    local = moment.astimezone(AMSTERDAM_TZ)
+    year, week, _ = local.isocalendar()
+    return {"all": "all", "day": f"day:{local:%Y-%m-%d}", "week": f"week:{year}-W{week:02d}",
+            "month": f"month:{local:%Y-%m}"}
+
+
+class TradeStats:
+    """Closed-trade rollups per period and per pair/channel, updated in O(1) as trades close"""
+
+    def __init__(self, bot: "TradingBot"):
+        self.bot = bot
+        self.rollups: Dict[str, Dict[str, TradeStatsRow]] = {}  # period -> bucket -> totals
+        # Closed trades whose database write failed: (message id, ledger row, rollup keys, delta).
+        # They reach the in-memory rollups only once saved, so /stats never shows unsaved trades
+        self.unsaved: List[Tuple[str, Tuple, List[Tuple[str, str]], TradeStatsRow]] = []
+        # record_close, the heartbeat and close() all drain the queue; one writer at a time keeps
+        # the head entry from being saved twice and popped twice
+        self._save_lock = asyncio.Lock()
+
+    def _apply(self, period: str, bucket: str, delta: TradeStatsRow):
+        buckets = self.rollups.setdefault(period, {})
+        row = buckets.get(bucket)
+        if row is None:
+            row = buckets[bucket] = TradeStatsRow()
+        row.add(delta)
+
+    def load(self, rows):
+        """Replace the rollups with trade_stats rows from the database"""
+        self.rollups = {}
+        for row in rows:
+            self._apply(row['period'], row['bucket'], TradeStatsRow(
+                row['trades'], row['wins'], row['losses'], row['breakevens'],
+                row['tp1_hits'], row['tp2_hits'], row['tp3_hits'], row['pips']))
+
+    async def record_close(self, message_id: str, trade_data: Dict, outcome: str,
+                           closed_at: Optional[datetime] = None):
+        """Add a trade closed at TP3, SL or breakeven to the ledger and every rollup it belongs to"""
+        closed_at = closed_at or datetime.now(timezone.utc)
+        pair = trade_data["pair"].replace("/", "").upper()
+        entry = trade_data["entry"]
+        exit_price = trade_data[TRADE_EXIT_LEVELS[outcome]]
+        # Same convention as run_backtest: the whole position closes at the exit level
+        pips = round((exit_price - entry if trade_data["action"] == "BUY" else entry - exit_price)
+                     / pip_value_for(pair), 1)
+        # A price jump can skip TP1 or TP2 without a notification; a higher TP implies the lower ones
+        hits = trade_data["tp_hits"]
+        reached = 3 if outcome == "tp3" else 2 if "tp2" in hits else 1 if "tp1" in hits else 0
+        delta = TradeStatsRow(1, outcome == "tp3", outcome == "sl", outcome == "breakeven",
+                              reached >= 1, reached >= 2, reached >= 3, pips)
+
+        buckets = ["all", f"pair:{pair}"]
+        if trade_data.get("channel_id"):
+            buckets.append(f"channel:{trade_data['channel_id']}")
+        keys = [(period, bucket) for period in trade_periods(closed_at).values() for bucket in buckets]
+
+        if not self.bot.db:
+            for period, bucket in keys:
+                self._apply(period, bucket, delta)
+            return
+
+        opened_at = datetime.fromisoformat(trade_data["timestamp"]) if trade_data.get("timestamp") else None
+        trade = (str(message_id), trade_data.get("channel_id"), pair, trade_data["action"], outcome,
+                 entry, exit_price, pips, list(trade_data["tp_hits"]), opened_at, closed_at)
+        self.unsaved.append((str(message_id), trade, keys, delta))
+        await self.save_pending()
+
+    async def save_pending(self):
+        """Write closed trades to the database in close order, then add them to the in-memory rollups"""
+        async with self._save_lock:
+            while self.unsaved and self.bot.db:
+                message_id, trade, keys, delta = self.unsaved[0]
+                try:
+                    saved = await self.bot.db.record_closed_trade(
+                        trade, [(period, bucket, *delta.values()) for period, bucket in keys])
+                except Exception as e:
+                    print(f"⚠️ Could not save closed trade {message_id} ({len(self.unsaved)} waiting for retry): {e}")
+                    return
+                self.unsaved.pop(0)
+                if saved:  # False: already in the ledger and its rollups
+                    for period, bucket in keys:
+                        self._apply(period, bucket, delta)
+
+    def report(self, period: str) -> Tuple[TradeStatsRow, Dict[str, TradeStatsRow], Dict[str, TradeStatsRow]]:
+        """(totals, by pair, by channel id) for one rollup period key"""
+        buckets = self.rollups.get(period, {})
+        by_pair = {bucket[5:]: row for bucket, row in buckets.items() if bucket.startswith("pair:")}
+        by_channel = {bucket[8:]: row for bucket, row in buckets.items() if bucket.startswith("channel:")}
+        return buckets.get("all", TradeStatsRow()), by_pair, by_channel
+
+
+# ===== HEALTH =====
+HEALTH_CONFIG = {
+    "probe_interval": 30,  # seconds between health snapshots
+    "db_timeout": 5,       # seconds the database probe may wait for a connection and answer
+    "stale_after": 120,    # /livez fails once the last snapshot is older than this
+}
+
+
+class HealthProber:
+    """Builds the /health snapshot on a fixed interval so health requests never touch the pool"""
+
+    def __init__(self, bot: "TradingBot"):
+        self.bot = bot
+        self.snapshot: Optional[Dict] = None
+        self.probed_at: Optional[float] = None
+        self.database: Dict = {"status": "Not configured", "details": {}}
+        self.server_version: Optional[str] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="health_prober")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await self.probe()
+            except Exception as e:
+                print(f"⚠️ Health probe failed: {e}")
+            await asyncio.sleep(HEALTH_CONFIG["probe_interval"])
+
+    def age(self) -> Optional[float]:
+        return time.monotonic() - self.probed_at if self.probed_at is not None else None
+
+    async def _probe_database(self) -> Dict:
+        db = self.bot.db
+        if not db:
+            return {"status": "Not configured", "details": {}}
+
+        details = {"pool_size": db.pool_size(), "pool_idle": db.pool_idle()}
+        if db.last_success is not None and time.monotonic() - db.last_success < HEALTH_CONFIG["probe_interval"]:
+            # Real queries succeeded since the last probe - no need to run one of our own
+            details["checked"] = "passive"
+        elif db.pool_idle() == 0 and db.pool_size() >= db.pool.get_max_size():
+            # Every connection is busy with real work; keep the last known status rather than queue behind it
+            return {"status": self.database["status"],
+                    "details": {**self.database["details"], **details, "checked": "skipped (pool busy)"}}
+        else:
+            try:
+                if self.server_version is None:
+                    self.server_version = await asyncio.wait_for(db.server_version(), HEALTH_CONFIG["db_timeout"])
+                else:
+                    await db.ping(HEALTH_CONFIG["db_timeout"])
+                details["checked"] = "probe"
+            except Exception as e:
+                return {"status": f"Error: {str(e)[:50]}", "details": details}
+
+        if self.server_version:
+            details["postgresql_version"] = self.server_version.split()[1]
+        return {"status": "Connected", "details": details}
+
+    async def probe(self):
+        """Refresh the cached health snapshot"""
+        bot = self.bot
+        self.database = await self._probe_database()
+        ready = bot.is_ready()
+        next_giveaway = bot.giveaway_scheduler.next_due()
+        self.snapshot = {
+            "status": "running",
+            "bot_status": "Connected" if ready else "Connecting",
+            "bot_user": str(bot.user) if bot.user else "Not logged in",
+            "bot_id": bot.user.id if bot.user else None,
+            "guild_count": len(bot.guilds) if ready else 0,
+            "guild_names": [guild.name for guild in bot.guilds] if ready else [],
+            "database_status": self.database["status"],
+            "database_details": self.database["details"],
+            "join_pipeline": bot.join_pipeline.stats(),
+            "log_sink": bot.log_sink.stats(),
+            "tick_store": bot.ticks.stats(),
+            "dm_service": bot.dm_service.stats(),
+            "startup": bot.startup.report(),
+            "member_resolver": {
+                "cache_hits": bot.member_resolver.cache_hits,
+                "gateway_queries": bot.member_resolver.gateway_queries,
+            },
+            "role_history": {"members": len(ROLE_HISTORY), "bytes": ROLE_HISTORY.nbytes()},
+            "giveaways": {
+                "active": len(ACTIVE_GIVEAWAYS),
+                "participants": sum(len(giveaway.participants) for giveaway in ACTIVE_GIVEAWAYS.values()),
+                "next_end": str(next_giveaway) if next_giveaway else None,
+            },
+            "event_loop": {
+                "lag_ms": round(bot.loop_lag.last_lag * 1000, 1),
+                "max_lag_ms": round(bot.loop_lag.max_lag * 1000, 1),
+                "slow_callbacks": sum(stats[0] for stats in bot.slow_callbacks.by_source.values()),
+            },
+            "uptime": str(datetime.now()),
+            "version": "2.1",
+            "last_heartbeat": str(bot.last_heartbeat) if bot.last_heartbeat else "N/A",
+            "bot_latency": f"{round(bot.latency * 1000)}ms" if ready else "N/A",
+            "is_ready": ready,
+            "is_closed": bot.is_closed(),
+            "token_length": len(DISCORD_TOKEN) if DISCORD_TOKEN else 0,
+            "intents": str(bot.intents),
+        }
+        self.probed_at = time.monotonic()
+
+    def readiness(self) -> Tuple[bool, Dict]:
+        """Whether the bot can serve traffic, from in-memory state only"""
+        checks = {
+            "gateway": self.bot.is_ready() and not self.bot.is_closed(),
+            "database": self.database["status"] in ("Connected", "Not configured"),
+            "startup": self.bot.startup.stages.get("database", {}).get("status") == "ok",
+        }
+        return all(checks.values()), checks
+
 
 class TradingBot(commands.Bot):
 
     def __init__(self):
         super().__init__(command_prefix='!', intents=intents)
         self.log_channel = None
-        self.db_pool = None
+        self.db: Optional[BotRepository] = None
+        self.invite_cache = InviteCache()
+        self.rate_limiter = RouteRateLimiter(DISCORD_ROUTE_LIMITS)
+        self.join_pipeline = JoinPipeline(self)
+        self.log_sink = LogSink(self)
+        self.dm_service = DMService(self)
+        self.member_resolver = MemberResolver(self)
+        self.giveaway_scheduler = GiveawayScheduler()
+        self.giveaway_entries = GiveawayEntryLog(self)
+        self.startup = StartupOrchestrator()
+        self.health = HealthProber(self)
+        self.profiler = Profiler()
+        self.ticks = TickStore(TICK_STORE_CONFIG["directory"])
+        self.trade_stats = TradeStats(self)
+        self.loop_lag = LoopLagSampler(LOOP_MONITOR_CONFIG["lag_interval"])
+        self.slow_callbacks = SlowCallbackMonitor(LOOP_MONITOR_CONFIG["slow_callback_ms"],
+                                                  LOOP_MONITOR_CONFIG["recent_events"])
+        METRICS.add_collector(self.collect_metrics)
         self.client_session = None
         self.last_online_time = None
         self.last_heartbeat = None
 
-    async def log_to_discord(self, message):
-        """Send log message to Discord channel"""
-        if self.log_channel:
-            try:
-                await self.log_channel.send(f"📋 **Bot Log:** {message}")
-            except Exception as e:
-                print(f"Failed to send log to Discord: {e}")
-        # Always print to console as backup
-        print(message)
+    def collect_metrics(self):
+        """Copy the services' running totals into their gauges before a /metrics scrape"""
+        for outcome, count in self.dm_service.outcomes.items():
+            DM_SENDS.set_total(outcome, value=count)
+        for route, count in self.rate_limiter.waits.items():
+            DISCORD_PACING_WAITS.set_total(route, value=count)
+        if self.db:
+            size, idle = self.db.pool_size(), self.db.pool_idle()
+            DB_POOL.set("in_use", value=size - idle)
+            DB_POOL.set("idle", value=idle)
+            DB_POOL.set("max", value=self.db.pool.get_max_size())
+
+    async def log_to_discord(self, message, severity=None):
+        """Queue a log message for the Discord log channel (also printed to console)"""
+        self.log_sink.emit(message, severity)
     
     async def close(self):
         """Cleanup when bot shuts down"""
         # Record offline time for recovery
         self.last_online_time = datetime.now(AMSTERDAM_TZ)
-        if self.db_pool:
+
+        # Finish queued joins and write out their batched state, then the remaining log entries
+        await self.giveaway_scheduler.stop()
+        await self.giveaway_entries.stop()
+        await self.join_pipeline.stop()
+        await self.dm_service.stop()
+        await self.log_sink.stop()
+        await self.ticks.stop()
+        await self.loop_lag.stop()
+        self.slow_callbacks.uninstall()
+
+        if self.db:
+            await self.trade_stats.save_pending()
+            if self.trade_stats.unsaved:
+                print(f"⚠️ {len(self.trade_stats.unsaved)} closed trades could not be saved before shutdown")
             try:
                 await self.save_bot_status()
             except Exception as e:
@@ -219,8 +3371,8 @@ class TradingBot(commands.Bot):
             print("✅ Aiohttp client session closed properly")
         
         # Close database pool
-        if self.db_pool:
-            await self.db_pool.close()
+        if self.db:
+            await self.db.close()
             print("✅ Database connection pool closed")
         
         # Call parent close
@@ -228,32 +3380,24 @@ class TradingBot(commands.Bot):
     
     async def save_bot_status(self):
         """Save bot status to database for offline recovery"""
-        if not self.db_pool:
+        if not self.db:
             return
             
         try:
-            async with self.db_pool.acquire() as conn:
-                current_time = datetime.now(AMSTERDAM_TZ)
-                await conn.execute("""
-                    INSERT INTO bot_status (last_online, heartbeat_time) 
-                    VALUES ($1, $2)
-                    ON CONFLICT (id) DO UPDATE SET 
-                    last_online = $1, heartbeat_time = $2
-                """, current_time, current_time)
+            await self.db.save_bot_status(datetime.now(AMSTERDAM_TZ))
         except Exception as e:
             print(f"Failed to save bot status: {e}")
     
     async def load_bot_status(self):
         """Load last known bot status from database"""
-        if not self.db_pool:
+        if not self.db:
             return
             
         try:
-            async with self.db_pool.acquire() as conn:
-                result = await conn.fetchrow("SELECT last_online FROM bot_status WHERE id = 1")
-                if result:
-                    self.last_online_time = result['last_online']
-                    print(f"✅ Loaded last online time: {self.last_online_time}")
+            last_online = await self.db.load_last_online()
+            if last_online:
+                self.last_online_time = last_online
+                print(f"✅ Loaded last online time: {self.last_online_time}")
         except Exception as e:
             print(f"Failed to load bot status: {e}")
     
@@ -272,6 +3416,7 @@ class TradingBot(commands.Bot):
                 offline_check_time = datetime.now(AMSTERDAM_TZ) - timedelta(hours=24)
             
             recovered_count = 0
+            offline_since = offline_check_time.astimezone(timezone.utc)
             
             for guild in self.guilds:
                 if not guild:
@@ -281,94 +3426,27 @@ class TradingBot(commands.Bot):
                 if not role:
                     continue
                 
-                # Get all members and check join times
-                async for member in guild.fetch_members(limit=None):
-                    if member.bot:  # Skip bots
-                        continue
-                    
-                    member_id_str = str(member.id)
-                    
-                    # Check if member joined after we went offline
-                    if member.joined_at and member.joined_at.replace(tzinfo=timezone.utc) > offline_check_time.astimezone(timezone.utc):
-                        
-                        # Check if they already have the role or are already tracked
-                        if member_id_str in AUTO_ROLE_CONFIG["active_members"]:
-                            continue  # Already tracked
-                        
-                        if role in member.roles:
-                            continue  # Already has role
-                        
-                        # Check anti-abuse system
-                        if member_id_str in AUTO_ROLE_CONFIG["role_history"]:
-                            await self.log_to_discord(
-                                f"🚫 {member.display_name} joined while offline but blocked by anti-abuse system"
-                            )
-                            continue
-                        
-                        # Process this offline joiner
-                        join_time = member.joined_at.astimezone(AMSTERDAM_TZ)
-                        
-                        # Add the role
-                        await member.add_roles(role, reason="Auto-role recovery for offline join")
-                        
-                        # Determine if it was weekend when they joined
-                        if self.is_weekend_time(join_time):
-                            # Weekend join - expires Monday 23:59
-                            monday_expiry = self.get_monday_expiry_time(join_time)
-                            
-                            AUTO_ROLE_CONFIG["active_members"][member_id_str] = {
-                                "role_added_time": join_time.isoformat(),
-                                "role_id": AUTO_ROLE_CONFIG["role_id"],
-                                "guild_id": guild.id,
-                                "weekend_delayed": True,
-                                "expiry_time": monday_expiry.isoformat()
-                            }
-                            
-                            # Send weekend DM
-                            try:
-                                weekend_message = (
-                                    "**Welcome to FX Pip Pioneers!** As a welcome gift, we usually give our new members "
-                                    "**access to the Premium Signals channel for 24 hours.** However, the trading markets are currently closed for the weekend. "
-                                    "**Your 24-hour countdown will start on Monday at 00:01 Amsterdam time** and your premium access will expire on Tuesday at 01:00 Amsterdam time. "
-                                    "Good luck trading!"
-                                )
-                                await member.send(weekend_message)
-                            except discord.Forbidden:
-                                await self.log_to_discord(f"❌ Could not send weekend DM to {member.display_name} (DMs disabled)")
-                            
-                        else:
-                            # Regular join - 24 hours from join time
-                            expiry_time = join_time + timedelta(hours=24)
-                            
-                            AUTO_ROLE_CONFIG["active_members"][member_id_str] = {
-                                "role_added_time": join_time.isoformat(),
-                                "role_id": AUTO_ROLE_CONFIG["role_id"],
-                                "guild_id": guild.id,
-                                "weekend_delayed": False,
-                                "expiry_time": expiry_time.isoformat()
-                            }
-                            
-                            # Send regular welcome DM
-                            try:
-                                welcome_message = (
-                                    "**Welcome to FX Pip Pioneers!** As a welcome gift, we've given you "
-                                    "**access to the Premium Signals channel for 24 hours.** "
-                                    "Good luck trading!"
-                                )
-                                await member.send(welcome_message)
-                            except discord.Forbidden:
-                                await self.log_to_discord(f"❌ Could not send welcome DM to {member.display_name} (DMs disabled)")
-                        
-                        # Record in role history for anti-abuse
-                        AUTO_ROLE_CONFIG["role_history"][member_id_str] = {
-                            "first_granted": join_time.isoformat(),
-                            "times_granted": 1,
-                            "last_expired": None,
-                            "guild_id": guild.id
-                        }
-                        
+                # Use the gateway member cache (one chunk request if not populated yet)
+                # instead of paging through the whole guild over REST
+                if not guild.chunked:
+                    await guild.chunk()
+                
+                # Only members who joined inside the offline window, newest first
+                offline_joiners = sorted(
+                    (member for member in guild.members
+                     if not member.bot and member.joined_at and member.joined_at > offline_since),
+                    key=lambda member: member.joined_at,
+                    reverse=True)
+                
+                # Recover joiners concurrently; role and DM requests are paced per route
+                results = await asyncio.gather(
+                    *(self.recover_offline_joiner(guild, role, member) for member in offline_joiners),
+                    return_exceptions=True)
+                for member, result in zip(offline_joiners, results):
+                    if isinstance(result, Exception):
+                        await self.log_to_discord(f"❌ Error recovering offline joiner {member.display_name}: {str(result)}")
+                    elif result:
                         recovered_count += 1
-                        await self.log_to_discord(f"✅ Recovered offline joiner: {member.display_name}")
             
             # Save the updated configuration
             await self.save_auto_role_config()
@@ -382,88 +3460,73 @@ class TradingBot(commands.Bot):
             await self.log_to_discord(f"❌ Error during offline member recovery: {str(e)}")
             print(f"Offline recovery error: {e}")
 
-    async def recover_offline_dm_reminders(self):
-        """Check for DM reminders that should have been sent while bot was offline"""
-        if not AUTO_ROLE_CONFIG["enabled"] or not self.db_pool:
-            return
+    async def recover_offline_joiner(self, guild, role, member) -> bool:
+        """Give the auto-role to a member who joined while the bot was offline"""
+        # Check if they already have the role or are already tracked
+        if member.id in AUTO_ROLE_CONFIG["active_members"]:
+            return False  # Already tracked
+        
+        if role in member.roles:
+            return False  # Already has role
+        
+        # Check anti-abuse system
+        if member.id in ROLE_HISTORY:
+            await self.log_to_discord(
+                f"🚫 {member.display_name} joined while offline but blocked by anti-abuse system"
+            )
+            return False
+        
+        # Process this offline joiner
+        join_time = member.joined_at.astimezone(AMSTERDAM_TZ)
+        
+        # Add the role
+        await self.rate_limiter.acquire("add_roles", guild.id)
+        await member.add_roles(role, reason="Auto-role recovery for offline join")
+        
+        # Determine if it was weekend when they joined
+        if self.is_weekend_time(join_time):
+            # Weekend join - expires Monday 23:59
+            monday_expiry = self.get_monday_expiry_time(join_time)
             
-        try:
-            await self.log_to_discord("🔍 Checking for missed DM reminders while offline...")
+            AUTO_ROLE_CONFIG["active_members"][member.id] = ActiveMember(
+                join_time, AUTO_ROLE_CONFIG["role_id"], guild.id,
+                weekend_delayed=True, expiry_time=monday_expiry)
             
-            current_time = datetime.now(AMSTERDAM_TZ)
-            recovered_dms = 0
+            # Schedule the Monday activation DM
+            self.join_pipeline.schedule_job(
+                ("monday_activation", member.id, guild.id, self.get_next_monday_activation_time()))
             
-            # Check all members in DM schedule for missed reminders
-            for member_id_str, dm_data in AUTO_ROLE_CONFIG["dm_schedule"].items():
-                try:
-                    role_expired = datetime.fromisoformat(dm_data["role_expired"]).replace(tzinfo=AMSTERDAM_TZ)
-                    guild_id = dm_data["guild_id"]
-                    
-                    # Calculate when each DM should have been sent
-                    dm_3_time = role_expired + timedelta(days=3)
-                    dm_7_time = role_expired + timedelta(days=7)
-                    dm_14_time = role_expired + timedelta(days=14)
-                    
-                    guild = self.get_guild(guild_id)
-                    if not guild:
-                        continue
-                        
-                    member = guild.get_member(int(member_id_str))
-                    if not member:
-                        continue
-                    
-                    # Check if member has Gold Pioneer role (skip DMs if they do)
-                    if any(role.id == GOLD_PIONEER_ROLE_ID for role in member.roles):
-                        continue
-                    
-                    # Send missed 3-day DM
-                    if not dm_data["dm_3_sent"] and current_time >= dm_3_time:
-                        try:
-                            dm_message = "Hey! It's been 3 days since your **24-hour free access to the Premium Signals channel** ended. We hope you were able to catch good trades with us during that time.\n\nAs you've probably seen, the **free signals channel only gets about 1 signal a day**, while inside **Gold Pioneers**, members receive **8–10 high-quality signals every single day in <#1350929852299214999>**. That means way more chances to profit and grow consistently.\n\nWe'd love to **invite you back to Premium Signals** so you don't miss out on more solid opportunities.\n\n**Feel free to join us again through this link:** https://whop.com/gold-pioneer"
-                            await member.send(dm_message)
-                            AUTO_ROLE_CONFIG["dm_schedule"][member_id_str]["dm_3_sent"] = True
-                            recovered_dms += 1
-                            await self.log_to_discord(f"📤 Sent missed 3-day DM to {member.display_name}")
-                        except discord.Forbidden:
-                            await self.log_to_discord(f"❌ Could not send missed 3-day DM to {member.display_name} (DMs disabled)")
-                    
-                    # Send missed 7-day DM
-                    if not dm_data["dm_7_sent"] and current_time >= dm_7_time:
-                        try:
-                            dm_message = "It's been a week since your Premium Signals trial ended. Since then, our **Gold Pioneers  have been catching trade setups daily in <#1350929852299214999>**.\n\nIf you found value in just 24 hours, imagine the results you could be seeing by now with full access. It's all about **consistency and staying plugged into the right information**.\n\nWe'd like to **personally invite you to rejoin Premium Signals** and get back into the rhythm.\n\n\n**Feel free to join us again through this link:** https://whop.com/gold-pioneer"
-                            await member.send(dm_message)
-                            AUTO_ROLE_CONFIG["dm_schedule"][member_id_str]["dm_7_sent"] = True
-                            recovered_dms += 1
-                            await self.log_to_discord(f"📤 Sent missed 7-day DM to {member.display_name}")
-                        except discord.Forbidden:
-                            await self.log_to_discord(f"❌ Could not send missed 7-day DM to {member.display_name} (DMs disabled)")
-                    
-                    # Send missed 14-day DM
-                    if not dm_data["dm_14_sent"] and current_time >= dm_14_time:
-                        try:
-                            dm_message = "Hey! It's been two weeks since your access to Premium Signals ended. We hope you've stayed active. \n\nIf you've been trading solo or passively following the free channel, you might be feeling the difference. in <#1350929852299214999>, it's not just about more signals. It's about the **structure, support, and smarter decision-making**. That edge can make all the difference over time.\n\nWe'd love to **officially invite you back into Premium Signals** and help you start compounding results again.\n\n**Feel free to join us again through this link:** https://whop.com/gold-pioneer"
-                            await member.send(dm_message)
-                            AUTO_ROLE_CONFIG["dm_schedule"][member_id_str]["dm_14_sent"] = True
-                            recovered_dms += 1
-                            await self.log_to_discord(f"📤 Sent missed 14-day DM to {member.display_name}")
-                        except discord.Forbidden:
-                            await self.log_to_discord(f"❌ Could not send missed 14-day DM to {member.display_name} (DMs disabled)")
-                    
-                except Exception as e:
-                    await self.log_to_discord(f"❌ Error processing missed DM for member {member_id_str}: {str(e)}")
-                    continue
+            # Send weekend DM
+            weekend_message = (
+                "**Welcome to FX Pip Pioneers!** As a welcome gift, we usually give our new members "
+                "**access to the Premium Signals channel for 24 hours.** However, the trading markets are currently closed for the weekend. "
+                "**Your 24-hour countdown will start on Monday at 00:01 Amsterdam time** and your premium access will expire on Tuesday at 01:00 Amsterdam time. "
+                "Good luck trading!"
+            )
+            if await self.dm_service.send(member, weekend_message) == "forbidden":
+                await self.log_to_discord(f"❌ Could not send weekend DM to {member.display_name} (DMs disabled)")
             
-            # Save updated DM schedule
-            await self.save_auto_role_config()
+        else:
+            # Regular join - 24 hours from join time
+            expiry_time = join_time + timedelta(hours=24)
             
-            if recovered_dms > 0:
-                await self.log_to_discord(f"📬 Successfully sent {recovered_dms} missed DM reminders!")
-            else:
-                await self.log_to_discord("✅ No missed DM reminders found")
-                
-        except Exception as e:
-            await self.log_to_discord(f"❌ Error during offline DM recovery: {str(e)}")
-            print(f"Offline DM recovery error: {e}")
+            AUTO_ROLE_CONFIG["active_members"][member.id] = ActiveMember(
+                join_time, AUTO_ROLE_CONFIG["role_id"], guild.id, expiry_time=expiry_time)
+            
+            # Send regular welcome DM
+            welcome_message = (
+                "**Welcome to FX Pip Pioneers!** As a welcome gift, we've given you "
+                "**access to the Premium Signals channel for 24 hours.** "
+                "Good luck trading!"
+            )
+            if await self.dm_service.send(member, welcome_message) == "forbidden":
+                await self.log_to_discord(f"❌ Could not send welcome DM to {member.display_name} (DMs disabled)")
+        
+        # Record in role history for anti-abuse
+        self.record_role_grant(member.id, guild.id, join_time)
+        
+        await self.log_to_discord(f"✅ Recovered offline joiner: {member.display_name}")
+        return True
 
     async def recover_missed_signals(self):
         """Check for trading signals that were sent while bot was offline"""
@@ -578,7 +3641,7 @@ class TradingBot(commands.Bot):
             return None
 
 
-    @tasks.loop(seconds=300)  # Check every 5 minutes for optimal API usage
+    @tasks.loop(seconds=300, name="price_tracking")  # Check every 5 minutes for optimal API usage
     async def price_tracking_task(self):
         """Background task to monitor live prices for active trades - optimized for free API tiers"""
         if not PRICE_TRACKING_CONFIG["enabled"]:
@@ -587,6 +3650,7 @@ class TradingBot(commands.Bot):
         if not PRICE_TRACKING_CONFIG["active_trades"]:
             return
         
+        started = time.perf_counter()
         try:
             # Check each active trade
             trades_to_remove = []
@@ -610,13 +3674,16 @@ class TradingBot(commands.Bot):
                     
         except Exception as e:
             print(f"Error in price tracking loop: {e}")
+        finally:
+            TRACKING_TICK.observe(value=time.perf_counter() - started)
 
-    @tasks.loop(minutes=30)
+    @tasks.loop(minutes=30, name="heartbeat")
     async def heartbeat_task(self):
         """Periodic heartbeat to track bot uptime and save status"""
-        if self.db_pool:
+        if self.db:
             try:
                 await self.save_bot_status()
+                await self.trade_stats.save_pending()
                 self.last_heartbeat = datetime.now(AMSTERDAM_TZ)
             except Exception as e:
                 print(f"Heartbeat error: {e}")
@@ -638,121 +3705,13 @@ class TradingBot(commands.Bot):
                 return
 
             # Create connection pool with Render-optimized settings
-            self.db_pool = await asyncpg.create_pool(
-                database_url,
-                min_size=1,
-                max_size=5,  # Lower for Render's limits
-                command_timeout=30,
-                server_settings={'application_name': 'discord-trading-bot'})
+            self.db = await BotRepository.connect(database_url)
             print("✅ PostgreSQL connection pool created for persistent memory")
 
-            # Create tables
-            async with self.db_pool.acquire() as conn:
-                # Role history table for anti-abuse system
-                await conn.execute('''
-                    CREATE TABLE IF NOT EXISTS role_history (
-                        member_id BIGINT PRIMARY KEY,
-                        first_granted TIMESTAMP WITH TIME ZONE NOT NULL,
-                        times_granted INTEGER DEFAULT 1,
-                        last_expired TIMESTAMP WITH TIME ZONE,
-                        guild_id BIGINT NOT NULL
-                    )
-                ''')
-
-                # Active members table for current role holders
-                await conn.execute('''
-                    CREATE TABLE IF NOT EXISTS active_members (
-                        member_id BIGINT PRIMARY KEY,
-                        role_added_time TIMESTAMP WITH TIME ZONE NOT NULL,
-                        role_id BIGINT NOT NULL,
-                        guild_id BIGINT NOT NULL,
-                        weekend_delayed BOOLEAN DEFAULT FALSE,
-                        expiry_time TIMESTAMP WITH TIME ZONE,
-                        custom_duration BOOLEAN DEFAULT FALSE
-                    )
-                ''')
-
-                # Weekend pending table
-                await conn.execute('''
-                    CREATE TABLE IF NOT EXISTS weekend_pending (
-                        member_id BIGINT PRIMARY KEY,
-                        join_time TIMESTAMP WITH TIME ZONE NOT NULL,
-                        guild_id BIGINT NOT NULL
-                    )
-                ''')
-
-                # DM schedule table for follow-up campaigns
-                await conn.execute('''
-                    CREATE TABLE IF NOT EXISTS dm_schedule (
-                        member_id BIGINT PRIMARY KEY,
-                        role_expired TIMESTAMP WITH TIME ZONE NOT NULL,
-                        guild_id BIGINT NOT NULL,
-                        dm_3_sent BOOLEAN DEFAULT FALSE,
-                        dm_7_sent BOOLEAN DEFAULT FALSE,
-                        dm_14_sent BOOLEAN DEFAULT FALSE
-                    )
-                ''')
-
-                # Auto-role config table for bot settings
-                await conn.execute('''
-                    CREATE TABLE IF NOT EXISTS auto_role_config (
-                        id SERIAL PRIMARY KEY,
-                        enabled BOOLEAN DEFAULT FALSE,
-                        role_id BIGINT,
-                        duration_hours INTEGER DEFAULT 24,
-                        custom_message TEXT
-                    )
-                ''')
-
-                # Bot status table for offline recovery
-                await conn.execute('''
-                    CREATE TABLE IF NOT EXISTS bot_status (
-                        id INTEGER PRIMARY KEY DEFAULT 1,
-                        last_online TIMESTAMP WITH TIME ZONE,
-                        heartbeat_time TIMESTAMP WITH TIME ZONE,
-                        CONSTRAINT single_row_constraint UNIQUE (id)
-                    )
-                ''')
-
-                # User levels table for level system
-                await conn.execute('''
-                    CREATE TABLE IF NOT EXISTS user_levels (
-                        user_id BIGINT PRIMARY KEY,
-                        message_count INTEGER DEFAULT 0,
-                        current_level INTEGER DEFAULT 0,
-                        guild_id BIGINT NOT NULL
-                    )
-                ''')
-
-                # Invite tracking table
-                await conn.execute('''
-                    CREATE TABLE IF NOT EXISTS invite_tracking (
-                        invite_code VARCHAR(20) PRIMARY KEY,
-                        guild_id BIGINT NOT NULL,
-                        creator_id BIGINT NOT NULL,
-                        nickname VARCHAR(255),
-                        total_joins INTEGER DEFAULT 0,
-                        total_left INTEGER DEFAULT 0,
-                        current_members INTEGER DEFAULT 0,
-                        created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
-                        last_updated TIMESTAMP WITH TIME ZONE DEFAULT NOW()
-                    )
-                ''')
-
-                # Member join tracking via invites
-                await conn.execute('''
-                    CREATE TABLE IF NOT EXISTS member_joins (
-                        id SERIAL PRIMARY KEY,
-                        member_id BIGINT NOT NULL,
-                        guild_id BIGINT NOT NULL,
-                        invite_code VARCHAR(20),
-                        joined_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
-                        left_at TIMESTAMP WITH TIME ZONE NULL,
-                        is_currently_member BOOLEAN DEFAULT TRUE
-                    )
-                ''')
+            # Apply pending schema migrations
+            await self.db.run_migrations()
 
-            print("✅ Database tables initialized")
+            print("✅ Database schema up to date")
 
             # Load existing config from database
             await self.load_config_from_db()
@@ -766,6 +3725,9 @@ class TradingBot(commands.Bot):
             # Load invite tracking data
             await self.load_invite_tracking()
 
+            # Load closed-trade statistics
+            await self.load_trade_stats()
+
         except Exception as e:
             print(f"❌ Database initialization failed: {e}")
             print(
@@ -775,84 +3737,53 @@ class TradingBot(commands.Bot):
             print("   1. Add PostgreSQL service in Render dashboard")
             print("   2. Connect it to your web service")
             print("   3. Restart the service")
-            self.db_pool = None
+            self.db = None
 
     async def load_config_from_db(self):
         """Load configuration from database"""
-        if not self.db_pool:
+        if not self.db:
             return
 
         try:
-            async with self.db_pool.acquire() as conn:
-                # Load auto-role config
-                config_row = await conn.fetchrow(
-                    'SELECT * FROM auto_role_config ORDER BY id DESC LIMIT 1')
-                if config_row:
-                    AUTO_ROLE_CONFIG["enabled"] = config_row['enabled']
-                    AUTO_ROLE_CONFIG["role_id"] = config_row['role_id']
-                    AUTO_ROLE_CONFIG["duration_hours"] = config_row[
-                        'duration_hours']
-                    if config_row['custom_message']:
-                        AUTO_ROLE_CONFIG["custom_message"] = config_row[
-                            'custom_message']
-
-                # Load active members
-                active_rows = await conn.fetch('SELECT * FROM active_members')
-                for row in active_rows:
-                    AUTO_ROLE_CONFIG["active_members"][str(
-                        row['member_id'])] = {
-                            "role_added_time":
-                            row['role_added_time'].isoformat(),
-                            "role_id":
-                            row['role_id'],
-                            "guild_id":
-                            row['guild_id'],
-                            "weekend_delayed":
-                            row['weekend_delayed'],
-                            "expiry_time":
-                            row['expiry_time'].isoformat()
-                            if row['expiry_time'] else None,
-                            "custom_duration":
-                            row['custom_duration']
-                        }
-
-                # Load weekend pending
-                weekend_rows = await conn.fetch('SELECT * FROM weekend_pending'
-                                                )
-                for row in weekend_rows:
-                    AUTO_ROLE_CONFIG["weekend_pending"][str(
-                        row['member_id'])] = {
-                            "join_time": row['join_time'].isoformat(),
-                            "guild_id": row['guild_id']
-                        }
-
-                # Load role history
-                history_rows = await conn.fetch('SELECT * FROM role_history')
-                for row in history_rows:
-                    AUTO_ROLE_CONFIG["role_history"][str(row['member_id'])] = {
-                        "first_granted":
-                        row['first_granted'].isoformat(),
-                        "times_granted":
-                        row['times_granted'],
-                        "last_expired":
-                        row['last_expired'].isoformat()
-                        if row['last_expired'] else None,
-                        "guild_id":
-                        row['guild_id']
-                    }
-
-                # Load DM schedule
-                dm_rows = await conn.fetch('SELECT * FROM dm_schedule')
-                for row in dm_rows:
-                    AUTO_ROLE_CONFIG["dm_schedule"][str(row['member_id'])] = {
-                        "role_expired": row['role_expired'].isoformat(),
-                        "guild_id": row['guild_id'],
-                        "dm_3_sent": row['dm_3_sent'],
-                        "dm_7_sent": row['dm_7_sent'],
-                        "dm_14_sent": row['dm_14_sent']
-                    }
-
-                print("✅ Configuration loaded from database")
+            state = await self.db.load_auto_role_state()
+
+            # Load auto-role config
+            config_row = state["config"][0] if state["config"] else None
+            if config_row:
+                AUTO_ROLE_CONFIG["enabled"] = config_row['enabled']
+                AUTO_ROLE_CONFIG["role_id"] = config_row['role_id']
+                AUTO_ROLE_CONFIG["duration_hours"] = config_row[
+                    'duration_hours']
+                if config_row['custom_message']:
+                    AUTO_ROLE_CONFIG["custom_message"] = config_row[
+                        'custom_message']
+
+            # Load active members
+            for row in state["active_members"]:
+                AUTO_ROLE_CONFIG["active_members"][row['member_id']] = ActiveMember(
+                    row['role_added_time'].astimezone(AMSTERDAM_TZ), row['role_id'], row['guild_id'],
+                    weekend_delayed=row['weekend_delayed'],
+                    expiry_time=row['expiry_time'].astimezone(AMSTERDAM_TZ) if row['expiry_time'] else None,
+                    custom_duration=bool(row['custom_duration']))
+
+            # Load weekend pending
+            for row in state["weekend_pending"]:
+                AUTO_ROLE_CONFIG["weekend_pending"][row['member_id']] = WeekendPending(
+                    row['join_time'].astimezone(AMSTERDAM_TZ), row['guild_id'])
+
+            # Load role history ids only; /antiabuse reads full records from the database
+            started = time.perf_counter()
+            ROLE_HISTORY.load(await self.db.load_role_history_ids())
+            print(f"✅ Loaded {len(ROLE_HISTORY)} role history ids "
+                  f"({ROLE_HISTORY.nbytes() / 1024:.0f} KiB) in {time.perf_counter() - started:.2f}s")
+
+            # Load DM schedule
+            for row in state["dm_schedule"]:
+                AUTO_ROLE_CONFIG["dm_schedule"][row['member_id']] = FollowupSchedule(
+                    row['role_expired'].astimezone(AMSTERDAM_TZ), row['guild_id'],
+                    row['dm_3_sent'], row['dm_7_sent'], row['dm_14_sent'])
+
+            print("✅ Configuration loaded from database")
 
         except Exception as e:
             print(f"❌ Failed to load config from database: {e}")
@@ -863,15 +3794,83 @@ class TradingBot(commands.Bot):
         
         # Record bot startup time for offline recovery
         self.last_online_time = datetime.now(AMSTERDAM_TZ)
-        
+
+        # Start the join pipeline, DM delivery workers, the Discord log flusher, the giveaway timer,
+        # the tick store flusher and the event-loop monitors
+        self.slow_callbacks.install()
+        self.loop_lag.start()
+        self.join_pipeline.start()
+        self.log_sink.start()
+        self.dm_service.start()
+        self.giveaway_scheduler.start()
+        self.giveaway_entries.start()
+        self.ticks.start()
+
+        # Startup stages: (name, function, dependencies, timeout in seconds)
+        for name, func, depends_on, timeout in (
+            ("database", self.init_database, (), 90),
+            ("command_sync", self.sync_commands, ("database",), 60),
+            ("gateway", self.wait_until_ready, (), None),
+            ("background_tasks", self.start_background_tasks, ("database", "gateway"), 30),
+            ("log_channel", self.announce_startup, ("gateway",), 30),
+            ("invite_cache", self.backtrack_existing_invites, ("database", "gateway"), 120),
+            ("offline_members", self.recover_offline_members, ("database", "gateway"), 300),
+            ("missed_signals", self.recover_missed_signals, ("database", "gateway"), 300),
+            ("giveaways", self.resume_giveaways, ("database", "gateway"), 300),
+        ):
+            self.startup.add(name, func, depends_on, timeout)
+        self.startup.start()
+
+        # Event handlers need the configuration from the database; everything else continues in the background
+        await self.startup.wait_for("database")
+
+    def command_tree_hash(self, guild: Optional[discord.abc.Snowflake] = None) -> Tuple[str, int]:
+        """Stable hash of the command payloads a sync would upload (names, options, descriptions)"""
+        payloads = sorted(
+            (command.to_dict(self.tree) for command in self.tree.get_commands(guild=guild)),
+            key=lambda payload: (payload.get("type", 1), payload["name"]))
+        encoded = json.dumps(payloads, sort_keys=True, separators=(",", ":"), default=str)
+        return hashlib.sha256(encoded.encode()).hexdigest(), len(payloads)
+
+    async def sync_commands(self):
+        """Sync slash commands when the command tree changed since the last recorded sync"""
+        # Command permissions are enforced by owner_check() in each command
+        if BOT_OWNER_USER_ID:
+            print(f"🔒 Bot commands restricted to owner ID: {BOT_OWNER_USER_ID}")
+        else:
+            print("⚠️ BOT_OWNER_USER_ID not set - all commands blocked for security")
+
+        guild = None
+        if COMMAND_SYNC_GUILD_ID:
+            guild = discord.Object(id=int(COMMAND_SYNC_GUILD_ID))
+            self.tree.copy_global_to(guild=guild)
+        scope = guild.id if guild else 0
+        scope_name = f"guild {scope}" if guild else "global"
+
+        command_hash, command_count = self.command_tree_hash(guild)
+        if self.db and not FORCE_COMMAND_SYNC:
+            try:
+                if await self.db.load_command_hash(scope) == command_hash:
+                    print(f"✅ {command_count} {scope_name} command(s) unchanged - skipping sync")
+                    return
+            except Exception as e:
+                print(f"⚠️ Could not read command sync state: {e}")
+
         # Sync slash commands with retry mechanism for better reliability
         max_retries = 3
         for attempt in range(max_retries):
             try:
-                synced = await self.tree.sync()
+                started = time.perf_counter()
+                synced = await self.tree.sync(guild=guild)
                 print(
-                    f"✅ Successfully synced {len(synced)} command(s) on attempt {attempt + 1}"
+                    f"✅ Successfully synced {len(synced)} {scope_name} command(s) on attempt {attempt + 1} "
+                    f"in {(time.perf_counter() - started) * 1000:.0f}ms"
                 )
+                if self.db:
+                    try:
+                        await self.db.save_command_hash(scope, command_hash, command_count)
+                    except Exception as e:
+                        print(f"⚠️ Could not record command sync state: {e}")
                 break
             except Exception as e:
                 print(
@@ -883,17 +3882,106 @@ class TradingBot(commands.Bot):
                         "⚠️ All sync attempts failed. Commands may not be available."
                     )
 
-        # Initialize invite cache for bot invite detection
-        self._cached_invites = {}
+    async def start_background_tasks(self):
+        """Start the periodic tasks once the configuration is loaded and the gateway is ready"""
+        # Start the role removal task
+        if not self.role_removal_task.is_running():
+            self.role_removal_task.start()
+
+        # Start the scheduled job dispatcher (follow-up and Monday activation DMs)
+        if not self.job_dispatch_task.is_running():
+            self.job_dispatch_task.start()
+
+        # Start the price tracking task
+        if not self.price_tracking_task.is_running():
+            self.price_tracking_task.start()
+
+        # Update bot status and start heartbeat
+        if self.db:
+            await self.save_bot_status()
+            if not self.heartbeat_task.is_running():
+                self.heartbeat_task.start()
+
+    async def resume_giveaways(self):
+        """Reload open giveaways and hand them to the scheduler; overdue ones end right away"""
+        if not self.db:
+            return
 
-        # Backtrack existing server invites for tracking
-        await self.backtrack_existing_invites()
+        now = datetime.now(AMSTERDAM_TZ)
+        overdue = 0
+        for row in await self.db.load_open_giveaways():
+            giveaway = Giveaway(
+                row['message_id'], row['channel_id'], row['creator_id'], row['required_role_id'],
+                row['winner_count'], row['end_time'].astimezone(AMSTERDAM_TZ), row['message'] or "",
+                chosen_winners=list(row['chosen_winners']))
+            self.track_giveaway(row['giveaway_id'], giveaway)
+
+        if ACTIVE_GIVEAWAYS:
+            for row in await self.db.load_giveaway_participants(list(ACTIVE_GIVEAWAYS)):
+                ACTIVE_GIVEAWAYS[row['giveaway_id']].participants.add(row['user_id'])
+
+        # Reactions added or removed while offline never reached the raw reaction handlers
+        if GIVEAWAY_CONFIG["reconcile_on_resume"]:
+            results = await asyncio.gather(
+                *(reconcile_giveaway_participants(giveaway_id) for giveaway_id in list(ACTIVE_GIVEAWAYS)),
+                return_exceptions=True)
+            for giveaway_id, result in zip(list(ACTIVE_GIVEAWAYS), results):
+                if isinstance(result, Exception):
+                    print(f"⚠️ Could not reconcile participants for {giveaway_id}: {result}")
+
+        for giveaway_id, giveaway in ACTIVE_GIVEAWAYS.items():
+            self.giveaway_scheduler.schedule(giveaway_id, giveaway.end_time)
+            if giveaway.end_time <= now:
+                overdue += 1
+
+        if ACTIVE_GIVEAWAYS:
+            await self.log_to_discord(
+                f"🎉 Resumed {len(ACTIVE_GIVEAWAYS)} giveaway(s)"
+                + (f", ending {overdue} that finished while offline" if overdue else ""))
+
+    def track_giveaway(self, giveaway_id: str, giveaway: Giveaway):
+        """Add a giveaway to the active set and the message index"""
+        ACTIVE_GIVEAWAYS[giveaway_id] = giveaway
+        GIVEAWAY_MESSAGE_INDEX[giveaway.message_id] = giveaway_id
+
+    def giveaway_row(self, giveaway_id: str) -> Tuple:
+        """Build the giveaways row for an active giveaway"""
+        data = ACTIVE_GIVEAWAYS[giveaway_id]
+        return (giveaway_id, data.message_id, data.channel_id, data.creator_id, data.required_role_id,
+                data.winner_count, data.end_time, data.message, data.chosen_winners)
+
+    async def save_giveaway(self, giveaway_id: str):
+        """Persist an active giveaway (creation and guaranteed winners)"""
+        if not self.db or giveaway_id not in ACTIVE_GIVEAWAYS:
+            return
+        try:
+            await self.db.save_giveaway(self.giveaway_row(giveaway_id))
+        except Exception as e:
+            print(f"❌ Error saving giveaway {giveaway_id}: {str(e)}")
+
+    async def close_giveaway(self, giveaway_id: str):
+        """Drop a giveaway from the active set and mark it ended in the database"""
+        giveaway = ACTIVE_GIVEAWAYS.pop(giveaway_id, None)
+        if giveaway:
+            GIVEAWAY_MESSAGE_INDEX.pop(giveaway.message_id, None)
+        if not self.db:
+            return
+        try:
+            await self.giveaway_entries.flush()
+            await self.db.mark_giveaway_ended(giveaway_id)
+        except Exception as e:
+            print(f"❌ Error marking giveaway {giveaway_id} ended: {str(e)}")
 
-        # Force sync after bot is ready for better reliability
-        self.first_sync_done = False
+    async def announce_startup(self):
+        """Set up the Discord logging channel and post the startup message"""
+        self.log_channel = self.get_channel(LOG_CHANNEL_ID)
+        if self.log_channel:
+            await self.log_to_discord(
+                "🚀 **TradingBot Started** - All systems operational!")
+        else:
+            print(f"⚠️ Log channel {LOG_CHANNEL_ID} not found")
 
-        # Initialize database
-        await self.init_database()
+        await self.log_to_discord("⚠️ Telegram integration not configured")
 
     async def backtrack_existing_invites(self):
         """Backtrack and start monitoring all existing server invites"""
@@ -902,30 +3990,26 @@ class TradingBot(commands.Bot):
             
             for guild in self.guilds:
                 try:
-                    # Fetch all current invites for this guild
-                    current_invites = await guild.invites()
-                    
-                    # Cache invites for this guild
-                    self._cached_invites[guild.id] = current_invites
+                    # Fetch all current invites for this guild into the invite cache
+                    await self.invite_cache.fetch(guild)
+                    cached_invites = self.invite_cache.guilds.get(guild.id, {})
+                    print(f"✅ Cached {len(cached_invites)} invites for {guild.name}")
                     
                     # Add any uncached invites to tracking system
-                    for invite in current_invites:
+                    for invite in cached_invites.values():
                         if invite.code not in INVITE_TRACKING:
                             # Initialize tracking for this existing invite
-                            INVITE_TRACKING[invite.code] = {
-                                "nickname": f"Pre-existing-{invite.code[:8]}",
-                                "creator_id": invite.inviter.id if invite.inviter else 0,
-                                "total_joins": invite.uses or 0,  # Start with current usage
-                                "total_left": 0,  # Can't backtrack left members
-                                "current_members": invite.uses or 0,  # Assume all are still here
-                                "guild_id": guild.id,
-                                "created_at": invite.created_at.isoformat() if invite.created_at else None,
-                                "max_uses": invite.max_uses,
-                                "temporary": invite.temporary,
-                                "backtracked": True  # Mark as backtracked
-                            }
+                            INVITE_TRACKING[invite.code] = InviteStats(
+                                f"Pre-existing-{invite.code[:8]}", invite.inviter_id, guild.id,
+                                total_joins=invite.uses,  # Start with current usage
+                                total_left=0,  # Can't backtrack left members
+                                current_members=invite.uses,  # Assume all are still here
+                                created_at=datetime.now(AMSTERDAM_TZ))
                             backtracked_count += 1
                             
+                except discord.Forbidden:
+                    print(f"⚠️ No permission to fetch invites for {guild.name}")
+                    continue
                 except Exception as e:
                     print(f"❌ Error backtracking invites for guild {guild.name}: {e}")
                     continue
@@ -952,78 +4036,9 @@ class TradingBot(commands.Bot):
         print(f"   Is ready: {self.is_ready()}")
         print(f"   Is closed: {self.is_closed()}")
 
-        # Force command sync on ready for better reliability
-        if not getattr(self, 'first_sync_done', False):
-            try:
-                synced = await self.tree.sync()
-                print(f"🔄 Force synced {len(synced)} command(s) on ready")
-                self.first_sync_done = True
-                
-                # Command permissions are enforced by owner_check() in each command
-                if BOT_OWNER_USER_ID:
-                    print(f"🔒 Bot commands restricted to owner ID: {BOT_OWNER_USER_ID}")
-                else:
-                    print("⚠️ BOT_OWNER_USER_ID not set - all commands blocked for security")
-            except Exception as e:
-                print(f"⚠️ Force sync on ready failed: {e}")
-
-        # Start the role removal task
-        if not self.role_removal_task.is_running():
-            self.role_removal_task.start()
-
-        # Start the Monday activation notification task
-        if not self.weekend_activation_task.is_running():
-            self.weekend_activation_task.start()
-
-        # Start the follow-up DM task
-        if not self.followup_dm_task.is_running():
-            self.followup_dm_task.start()
-
-        # Start the price tracking task
-        if not self.price_tracking_task.is_running():
-            self.price_tracking_task.start()
-
-        # Database initialization is now handled in setup_hook
-
-        # Set up Discord logging channel
-        self.log_channel = self.get_channel(LOG_CHANNEL_ID)
-        if self.log_channel:
-            await self.log_to_discord(
-                "🚀 **TradingBot Started** - All systems operational!")
-        else:
-            print(f"⚠️ Log channel {LOG_CHANNEL_ID} not found")
-
-        # Cache invites for all guilds to track bot invite usage
-        for guild in self.guilds:
-            try:
-                self._cached_invites[guild.id] = await guild.invites()
-                await self.log_to_discord(
-                    f"✅ Cached {len(self._cached_invites[guild.id])} invites for {guild.name}"
-                )
-            except discord.Forbidden:
-                await self.log_to_discord(
-                    f"⚠️ No permission to fetch invites for {guild.name}")
-            except Exception as e:
-                await self.log_to_discord(
-                    f"❌ Error caching invites for {guild.name}: {e}")
-
-        await self.log_to_discord("⚠️ Telegram integration not configured")
-        
-        # Check for offline members who joined while bot was offline
-        await self.recover_offline_members()
-        
-        # Check for missed DM reminders while bot was offline
-        await self.recover_offline_dm_reminders()
-        
-        # Check for missed trading signals while bot was offline
-        await self.recover_missed_signals()
-        
-        # Update bot status and start heartbeat
-        if self.db_pool:
-            await self.save_bot_status()
-            if not hasattr(self, 'heartbeat_task_started'):
-                self.heartbeat_task.start()
-                self.heartbeat_task_started = True
+        # Startup work (background tasks, invite cache, offline recovery) runs as
+        # stages of self.startup, which were waiting on the gateway to be ready.
+        # Missed DM reminders need no recovery: the job dispatcher picks up every overdue job.
 
     async def on_connect(self):
         """Called when bot connects to Discord"""
@@ -1048,12 +4063,8 @@ class TradingBot(commands.Bot):
         import traceback
         traceback.print_exc()
         
-        # Try to log to Discord channel if available
-        if self.log_channel:
-            try:
-                await self.log_channel.send(f"❌ Bot Error in event '{event}': {str(args[0]) if args else 'Unknown error'}")
-            except Exception:
-                pass
+        # Queue for the Discord error log
+        self.log_sink.emit(f"❌ Bot Error in event '{event}': {str(args[0]) if args else 'Unknown error'}")
 
     def is_weekend_time(self, dt=None):
         """Check if the given datetime (or now) falls within weekend trading closure"""
@@ -1139,69 +4150,49 @@ class TradingBot(commands.Bot):
         return expiry_time
 
     async def on_member_join(self, member):
-        """Handle new member joins and assign auto-role if enabled"""
+        """Queue new member joins for the join pipeline"""
         if not AUTO_ROLE_CONFIG["enabled"] or not AUTO_ROLE_CONFIG["role_id"]:
             return
 
+        await self.join_pipeline.submit(member)
+
+    async def process_member_join(self, member, enqueued_at, invite_lookup):
+        """Handle a queued member join and assign auto-role if enabled"""
+        log = self.join_pipeline.log
+
         try:
-            # Check if member joined through a bot invite
-            invites_before = getattr(self, '_cached_invites',
-                                     {}).get(member.guild.id, [])
-            invites_after = await member.guild.invites()
-
-            # Cache current invites for next comparison
-            if not hasattr(self, '_cached_invites'):
-                self._cached_invites = {}
-            self._cached_invites[member.guild.id] = invites_after
-
-            # Find which invite was used by comparing use counts
-            used_invite = None
-            for invite_after in invites_after:
-                for invite_before in invites_before:
-                    if (invite_after.code == invite_before.code
-                            and invite_after.uses > invite_before.uses):
-                        used_invite = invite_after
-                        break
-                if used_invite:
-                    break
+            # Find which invite was used by diffing use counts against the invite cache
+            used_invite = await invite_lookup
 
             # Track the invite usage if we found one
             if used_invite:
-                # Track the member join via this specific invite
-                await self.track_member_join_via_invite(member, used_invite.code)
-                
                 # Initialize tracking for this invite if not already tracked
                 if used_invite.code not in INVITE_TRACKING:
-                    INVITE_TRACKING[used_invite.code] = {
-                        "nickname": f"Invite-{used_invite.code[:8]}",  # Default nickname
-                        "total_joins": 0,
-                        "total_left": 0,
-                        "current_members": 0,
-                        "creator_id": used_invite.inviter.id if used_invite.inviter else 0,
-                        "guild_id": member.guild.id,
-                        "created_at": datetime.now(AMSTERDAM_TZ).isoformat(),
-                        "last_updated": datetime.now(AMSTERDAM_TZ).isoformat()
-                    }
+                    INVITE_TRACKING[used_invite.code] = InviteStats(
+                        f"Invite-{used_invite.code[:8]}",  # Default nickname
+                        used_invite.inviter_id, member.guild.id,
+                        created_at=datetime.now(AMSTERDAM_TZ))
+
+                # Track the member join via this specific invite
+                await self.track_member_join_via_invite(member, used_invite.code)
 
             # If we found the invite and it was created by a bot, ignore this member
-            if used_invite and used_invite.inviter and used_invite.inviter.bot:
-                await self.log_to_discord(
-                    f"🤖 Ignoring {member.display_name} - joined via bot invite from {used_invite.inviter.display_name}"
+            if used_invite and used_invite.inviter_bot:
+                log(
+                    f"🤖 Ignoring {member.display_name} - joined via bot invite from {used_invite.inviter_name}"
                 )
                 return
 
             role = member.guild.get_role(AUTO_ROLE_CONFIG["role_id"])
             if not role:
-                await self.log_to_discord(
+                log(
                     f"❌ Auto-role not found in guild {member.guild.name}")
                 return
 
             # Enhanced anti-abuse system checks
-            member_id_str = str(member.id)
-            
             # Check if user has already received the role before
-            if member_id_str in AUTO_ROLE_CONFIG["role_history"]:
-                await self.log_to_discord(
+            if member.id in ROLE_HISTORY:
+                log(
                     f"🚫 {member.display_name} has already received auto-role before - access denied (anti-abuse)"
                 )
                 return
@@ -1213,106 +4204,102 @@ class TradingBot(commands.Bot):
             join_time = datetime.now(AMSTERDAM_TZ)
 
             # Add the role immediately for all members
+            await self.rate_limiter.acquire("add_roles", member.guild.id)
             await member.add_roles(role, reason="Auto-role for new member")
+            self.join_pipeline.record_role_added(enqueued_at)
 
             # Check if it's weekend time to determine countdown behavior
             if self.is_weekend_time(join_time):
                 # Weekend join - expires Monday 23:59 (not Tuesday 01:00)
                 monday_expiry = self.get_monday_expiry_time(join_time)
 
-                AUTO_ROLE_CONFIG["active_members"][member_id_str] = {
-                    "role_added_time": join_time.isoformat(),
-                    "role_id": AUTO_ROLE_CONFIG["role_id"],
-                    "guild_id": member.guild.id,
-                    "weekend_delayed": True,
-                    "expiry_time": monday_expiry.isoformat()
-                }
+                AUTO_ROLE_CONFIG["active_members"][member.id] = ActiveMember(
+                    join_time, AUTO_ROLE_CONFIG["role_id"], member.guild.id,
+                    weekend_delayed=True, expiry_time=monday_expiry)
 
                 # Record in role history for anti-abuse
-                AUTO_ROLE_CONFIG["role_history"][member_id_str] = {
-                    "first_granted": join_time.isoformat(),
-                    "times_granted": 1,
-                    "last_expired": None,
-                    "guild_id": member.guild.id
-                }
+                self.record_role_grant(member.id, member.guild.id, join_time)
+
+                # Schedule the Monday activation DM
+                self.join_pipeline.schedule_job(
+                    ("monday_activation", member.id, member.guild.id, self.get_next_monday_activation_time()))
 
                 # Send weekend notification DM
-                try:
-                    weekend_message = (
-                        "**Welcome to FX Pip Pioneers!** As a welcome gift, we usually give our new members "
-                        "**access to the Premium Signals channel for 24 hours.** However, the trading markets are currently closed for the weekend. "
-                        "We're Messaging you to let you know that your 24 hours of access to <#1384668129036075109> will start counting down from "
-                        "the moment the markets open again on Monday. This way, your welcome gift won't be wasted on the weekend "
-                        "and you'll actually be able to make use of it.")
-                    await member.send(weekend_message)
-                    await self.log_to_discord(
+                weekend_message = (
+                    "**Welcome to FX Pip Pioneers!** As a welcome gift, we usually give our new members "
+                    "**access to the Premium Signals channel for 24 hours.** However, the trading markets are currently closed for the weekend. "
+                    "We're Messaging you to let you know that your 24 hours of access to <#1384668129036075109> will start counting down from "
+                    "the moment the markets open again on Monday. This way, your welcome gift won't be wasted on the weekend "
+                    "and you'll actually be able to make use of it.")
+                outcome = await self.dm_service.send(member, weekend_message)
+                if outcome == "sent":
+                    log(
                         f"✅ Sent weekend notification DM to {member.display_name}"
                     )
-                except discord.Forbidden:
-                    await self.log_to_discord(
+                elif outcome == "forbidden":
+                    log(
                         f"⚠️ Could not send weekend notification DM to {member.display_name} (DMs disabled)"
                     )
-                except Exception as e:
-                    await self.log_to_discord(
-                        f"❌ Error sending weekend notification DM to {member.display_name}: {str(e)}"
+                else:
+                    log(
+                        f"❌ Error sending weekend notification DM to {member.display_name}: {outcome}"
                     )
 
-                await self.log_to_discord(
+                log(
                     f"✅ Auto-role '{role.name}' added to {member.display_name} (expires Monday 23:59)"
                 )
 
             else:
                 # Normal join - immediate 24-hour countdown
-                AUTO_ROLE_CONFIG["active_members"][member_id_str] = {
-                    "role_added_time": join_time.isoformat(),
-                    "role_id": AUTO_ROLE_CONFIG["role_id"],
-                    "guild_id": member.guild.id,
-                    "weekend_delayed": False
-                }
+                AUTO_ROLE_CONFIG["active_members"][member.id] = ActiveMember(
+                    join_time, AUTO_ROLE_CONFIG["role_id"], member.guild.id)
 
                 # Record in role history for anti-abuse
-                AUTO_ROLE_CONFIG["role_history"][member_id_str] = {
-                    "first_granted": join_time.isoformat(),
-                    "times_granted": 1,
-                    "last_expired": None,
-                    "guild_id": member.guild.id
-                }
+                self.record_role_grant(member.id, member.guild.id, join_time)
 
                 # Send weekday welcome DM
-                try:
-                    weekday_message = (
-                        "**:star2: Welcome to FX Pip Pioneers! :star2:**\n\n"
-                        ":white_check_mark: As a welcome gift, we've given you access to our **Premium Signals channel for 24 hours.** "
-                        "That means you can start profiting from the **8–10 trade signals** we send per day right now!\n\n"
-                        "***This is your shot at consistency, clarity, and growth in trading. Let's level up together!***"
-                    )
-                    await member.send(weekday_message)
-                    await self.log_to_discord(
+                weekday_message = (
+                    "**:star2: Welcome to FX Pip Pioneers! :star2:**\n\n"
+                    ":white_check_mark: As a welcome gift, we've given you access to our **Premium Signals channel for 24 hours.** "
+                    "That means you can start profiting from the **8–10 trade signals** we send per day right now!\n\n"
+                    "***This is your shot at consistency, clarity, and growth in trading. Let's level up together!***"
+                )
+                outcome = await self.dm_service.send(member, weekday_message)
+                if outcome == "sent":
+                    log(
                         f"✅ Sent weekday welcome DM to {member.display_name}")
-                except discord.Forbidden:
-                    await self.log_to_discord(
+                elif outcome == "forbidden":
+                    log(
                         f"⚠️ Could not send weekday welcome DM to {member.display_name} (DMs disabled)"
                     )
-                except Exception as e:
-                    await self.log_to_discord(
-                        f"❌ Error sending weekday welcome DM to {member.display_name}: {str(e)}"
+                else:
+                    log(
+                        f"❌ Error sending weekday welcome DM to {member.display_name}: {outcome}"
                     )
 
-                await self.log_to_discord(
+                log(
                     f"✅ Auto-role '{role.name}' added to {member.display_name} (24h countdown starts now)"
                 )
 
-            # Save the updated config
-            await self.save_auto_role_config()
+            # The updated config is saved with the next batched pipeline flush
+            self.join_pipeline.config_dirty = True
 
         except discord.Forbidden:
-            await self.log_to_discord(
+            log(
                 f"❌ No permission to assign role to {member.display_name}")
         except Exception as e:
-            await self.log_to_discord(
+            log(
                 f"❌ Error assigning auto-role to {member.display_name}: {str(e)}"
             )
 
+    async def on_invite_create(self, invite):
+        """Keep the invite cache current without refetching"""
+        self.invite_cache.add(invite)
+
+    async def on_invite_delete(self, invite):
+        """Keep the invite cache current without refetching"""
+        self.invite_cache.remove(invite)
+
     async def on_member_remove(self, member):
         """Handle member leaving the server"""
         try:
@@ -1380,98 +4367,39 @@ class TradingBot(commands.Bot):
         # Process message for level system
         await self.process_message_for_levels(message)
 
+    def record_role_grant(self, member_id: int, guild_id: int, granted_at: datetime):
+        """Add a member to the anti-abuse history; the database row is written on the next pipeline flush"""
+        ROLE_HISTORY.add(member_id)
+        self.join_pipeline.record_role_grant(member_id, granted_at, guild_id)
+
     async def save_auto_role_config(self):
         """Save auto-role configuration to database"""
-        if not self.db_pool:
+        if not self.db:
             return  # No database available
 
         try:
-            async with self.db_pool.acquire() as conn:
-                # Save main config - use upsert with a fixed ID
-                await conn.execute(
-                    '''
-                    INSERT INTO auto_role_config (id, enabled, role_id, duration_hours, custom_message)
-                    VALUES (1, $1, $2, $3, $4)
-                    ON CONFLICT (id) DO UPDATE SET
-                        enabled = $1,
-                        role_id = $2, 
-                        duration_hours = $3,
-                        custom_message = $4
-                ''', AUTO_ROLE_CONFIG["enabled"], AUTO_ROLE_CONFIG["role_id"],
-                    AUTO_ROLE_CONFIG["duration_hours"],
-                    AUTO_ROLE_CONFIG["custom_message"])
-
-                # Save active members
-                await conn.execute('DELETE FROM active_members')
-                for member_id, data in AUTO_ROLE_CONFIG[
-                        "active_members"].items():
-                    expiry_time = None
-                    if data.get("expiry_time"):
-                        expiry_time = datetime.fromisoformat(
-                            data["expiry_time"].replace('Z', '+00:00'))
-
-                    await conn.execute(
-                        '''
-                        INSERT INTO active_members 
-                        (member_id, role_added_time, role_id, guild_id, weekend_delayed, expiry_time, custom_duration)
-                        VALUES ($1, $2, $3, $4, $5, $6, $7)
-                    ''', int(member_id),
-                        datetime.fromisoformat(data["role_added_time"].replace(
-                            'Z', '+00:00')), data["role_id"], data["guild_id"],
-                        data["weekend_delayed"], expiry_time,
-                        data.get("custom_duration", False))
-
-                # Save weekend pending
-                await conn.execute('DELETE FROM weekend_pending')
-                for member_id, data in AUTO_ROLE_CONFIG[
-                        "weekend_pending"].items():
-                    await conn.execute(
-                        '''
-                        INSERT INTO weekend_pending (member_id, join_time, guild_id)
-                        VALUES ($1, $2, $3)
-                    ''', int(member_id),
-                        datetime.fromisoformat(data["join_time"].replace(
-                            'Z', '+00:00')), data["guild_id"])
-
-                # Save role history using UPSERT to avoid conflicts
-                for member_id, data in AUTO_ROLE_CONFIG["role_history"].items(
-                ):
-                    last_expired = None
-                    if data.get("last_expired"):
-                        last_expired = datetime.fromisoformat(
-                            data["last_expired"].replace('Z', '+00:00'))
-
-                    await conn.execute(
-                        '''
-                        INSERT INTO role_history (member_id, first_granted, times_granted, last_expired, guild_id)
-                        VALUES ($1, $2, $3, $4, $5)
-                        ON CONFLICT (member_id) DO UPDATE SET
-                            first_granted = $2,
-                            times_granted = $3,
-                            last_expired = $4,
-                            guild_id = $5
-                    ''', int(member_id),
-                        datetime.fromisoformat(data["first_granted"].replace(
-                            'Z', '+00:00')), data["times_granted"],
-                        last_expired, data["guild_id"])
-
-                # Save DM schedule using UPSERT
-                for member_id, data in AUTO_ROLE_CONFIG["dm_schedule"].items():
-                    await conn.execute(
-                        '''
-                        INSERT INTO dm_schedule (member_id, role_expired, guild_id, dm_3_sent, dm_7_sent, dm_14_sent)
-                        VALUES ($1, $2, $3, $4, $5, $6)
-                        ON CONFLICT (member_id) DO UPDATE SET
-                            role_expired = $2,
-                            guild_id = $3,
-                            dm_3_sent = $4,
-                            dm_7_sent = $5,
-                            dm_14_sent = $6
-                    ''', int(member_id),
-                        datetime.fromisoformat(data["role_expired"].replace(
-                            'Z',
-                            '+00:00')), data["guild_id"], data["dm_3_sent"],
-                        data["dm_7_sent"], data["dm_14_sent"])
+            config = (AUTO_ROLE_CONFIG["enabled"], AUTO_ROLE_CONFIG["role_id"],
+                      AUTO_ROLE_CONFIG["duration_hours"],
+                      AUTO_ROLE_CONFIG["custom_message"])
+
+            active_rows = [
+                (member_id, data.role_added_time, data.role_id, data.guild_id,
+                 data.weekend_delayed, data.expiry_time, data.custom_duration)
+                for member_id, data in AUTO_ROLE_CONFIG["active_members"].items()
+            ]
+
+            weekend_rows = [
+                (member_id, data.join_time, data.guild_id)
+                for member_id, data in AUTO_ROLE_CONFIG["weekend_pending"].items()
+            ]
+
+            dm_rows = [
+                (member_id, data.role_expired, data.guild_id,
+                 data.dm_3_sent, data.dm_7_sent, data.dm_14_sent)
+                for member_id, data in AUTO_ROLE_CONFIG["dm_schedule"].items()
+            ]
+
+            await self.db.save_auto_role_state(config, active_rows, weekend_rows, dm_rows)
 
         except Exception as e:
             print(f"❌ Error saving to database: {str(e)}")
@@ -1480,40 +4408,28 @@ class TradingBot(commands.Bot):
     
     async def save_level_system(self):
         """Save level system data to database"""
-        if not self.db_pool:
+        if not self.db:
             return  # No database available
         
         try:
-            async with self.db_pool.acquire() as conn:
-                # Save user level data using UPSERT
-                for user_id, data in LEVEL_SYSTEM["user_data"].items():
-                    await conn.execute('''
-                        INSERT INTO user_levels (user_id, message_count, current_level, guild_id)
-                        VALUES ($1, $2, $3, $4)
-                        ON CONFLICT (user_id) DO UPDATE SET
-                            message_count = $2,
-                            current_level = $3,
-                            guild_id = $4
-                    ''', int(user_id), data["message_count"], data["current_level"], data["guild_id"])
+            await self.db.save_user_levels([
+                (user_id, data.message_count, data.current_level, data.guild_id)
+                for user_id, data in LEVEL_SYSTEM["user_data"].items()
+            ])
                     
         except Exception as e:
             print(f"❌ Error saving level system to database: {str(e)}")
 
     async def load_level_system(self):
         """Load level system data from database"""
-        if not self.db_pool:
+        if not self.db:
             return  # No database available
         
         try:
-            async with self.db_pool.acquire() as conn:
-                # Load user level data
-                rows = await conn.fetch('SELECT user_id, message_count, current_level, guild_id FROM user_levels')
-                for row in rows:
-                    LEVEL_SYSTEM["user_data"][str(row['user_id'])] = {
-                        "message_count": row['message_count'],
-                        "current_level": row['current_level'],
-                        "guild_id": row['guild_id']
-                    }
+            # Load user level data
+            for row in await self.db.load_user_levels():
+                LEVEL_SYSTEM["user_data"][row['user_id']] = LevelRecord(
+                    row['message_count'], row['current_level'], row['guild_id'])
                 
             if LEVEL_SYSTEM["user_data"]:
                 print(f"✅ Loaded level data for {len(LEVEL_SYSTEM['user_data'])} users")
@@ -1523,58 +4439,56 @@ class TradingBot(commands.Bot):
         except Exception as e:
             print(f"❌ Error loading level system from database: {str(e)}")
 
+    async def load_trade_stats(self):
+        """Load the precomputed trade statistics rollups from database"""
+        if not self.db:
+            return
+
+        try:
+            rows = await self.db.load_trade_stats()
+            self.trade_stats.load(rows)
+            if rows:
+                print(f"✅ Loaded {len(rows)} trade statistics rollups")
+        except Exception as e:
+            print(f"❌ Error loading trade statistics from database: {str(e)}")
+
     async def load_invite_tracking(self):
         """Load invite tracking data from database"""
-        if not self.db_pool:
+        if not self.db:
             return
         
         try:
-            async with self.db_pool.acquire() as conn:
-                # Load invite tracking data
-                rows = await conn.fetch('SELECT * FROM invite_tracking')
-                for row in rows:
-                    INVITE_TRACKING[row['invite_code']] = {
-                        "nickname": row['nickname'],
-                        "total_joins": row['total_joins'],
-                        "total_left": row['total_left'],
-                        "current_members": row['current_members'],
-                        "creator_id": row['creator_id'],
-                        "guild_id": row['guild_id'],
-                        "created_at": row['created_at'].isoformat(),
-                        "last_updated": row['last_updated'].isoformat()
-                    }
-                
-                if INVITE_TRACKING:
-                    print(f"✅ Loaded invite tracking data for {len(INVITE_TRACKING)} invites")
-                else:
-                    print("📋 No existing invite tracking data found - starting fresh")
+            # Load invite tracking data
+            for row in await self.db.load_invites():
+                INVITE_TRACKING[row['invite_code']] = InviteStats(
+                    row['nickname'], row['creator_id'], row['guild_id'],
+                    row['total_joins'], row['total_left'], row['current_members'],
+                    row['created_at'])
+            
+            if INVITE_TRACKING:
+                print(f"✅ Loaded invite tracking data for {len(INVITE_TRACKING)} invites")
+            else:
+                print("📋 No existing invite tracking data found - starting fresh")
         
         except Exception as e:
             print(f"❌ Error loading invite tracking from database: {str(e)}")
 
-    async def save_invite_tracking(self):
-        """Save invite tracking data to database"""
-        if not self.db_pool:
+    def invite_tracking_row(self, invite_code: str) -> Tuple:
+        """Build the invite_tracking row for a tracked invite"""
+        data = INVITE_TRACKING[invite_code]
+        return (invite_code, data.guild_id, data.creator_id, data.nickname,
+                data.total_joins, data.total_left, data.current_members)
+
+    async def save_invite_tracking(self, invite_codes=None):
+        """Save invite tracking data to database (all invites, or only the given codes)"""
+        if not self.db:
             return
         
         try:
-            async with self.db_pool.acquire() as conn:
-                # Update all tracked invites
-                for invite_code, data in INVITE_TRACKING.items():
-                    await conn.execute(
-                        '''
-                        INSERT INTO invite_tracking 
-                        (invite_code, guild_id, creator_id, nickname, total_joins, total_left, current_members, last_updated)
-                        VALUES ($1, $2, $3, $4, $5, $6, $7, NOW())
-                        ON CONFLICT (invite_code) DO UPDATE SET
-                            nickname = $4,
-                            total_joins = $5,
-                            total_left = $6,
-                            current_members = $7,
-                            last_updated = NOW()
-                        ''', invite_code, data["guild_id"], data["creator_id"], 
-                        data["nickname"], data["total_joins"], data["total_left"], data["current_members"]
-                    )
+            codes = INVITE_TRACKING.keys() if invite_codes is None else invite_codes
+            await self.db.save_invites([
+                self.invite_tracking_row(code) for code in codes if code in INVITE_TRACKING
+            ])
         except Exception as e:
             print(f"❌ Error saving invite tracking to database: {str(e)}")
 
@@ -1610,6 +4524,7 @@ class TradingBot(commands.Bot):
             
             price = await self.get_price_from_single_api(api_name, pair_clean)
             if price is not None:
+                self.ticks.record(pair_clean, price, api_name)
                 # Update rotation for next check
                 PRICE_TRACKING_CONFIG["api_rotation_index"] = (start_index + 1) % len(api_order)
                 print(f"✅ Price from {api_name} for {pair_clean}: ${price:.5f}")
@@ -1628,7 +4543,7 @@ class TradingBot(commands.Bot):
                     "symbols": pair_clean
                 }
                 
-                async with aiohttp.ClientSession() as session:
+                async with provider_session() as session:
                     async with session.get(url, params=params, timeout=10) as response:
                         if response.status == 200:
                             data = await response.json()
@@ -1646,7 +4561,7 @@ class TradingBot(commands.Bot):
                     "apikey": PRICE_TRACKING_CONFIG["api_keys"]["twelve_data_key"]
                 }
                 
-                async with aiohttp.ClientSession() as session:
+                async with provider_session() as session:
                     async with session.get(url, params=params, timeout=10) as response:
                         if response.status == 200:
                             data = await response.json()
@@ -1666,7 +4581,7 @@ class TradingBot(commands.Bot):
                     "apikey": PRICE_TRACKING_CONFIG["api_keys"]["alpha_vantage_key"]
                 }
                 
-                async with aiohttp.ClientSession() as session:
+                async with provider_session() as session:
                     async with session.get(url, params=params, timeout=10) as response:
                         if response.status == 200:
                             data = await response.json()
@@ -1685,7 +4600,7 @@ class TradingBot(commands.Bot):
                     "apikey": PRICE_TRACKING_CONFIG["api_keys"]["fmp_key"]
                 }
                 
-                async with aiohttp.ClientSession() as session:
+                async with provider_session() as session:
                     async with session.get(url, params=params, timeout=10) as response:
                         if response.status == 200:
                             data = await response.json()
@@ -1717,7 +4632,7 @@ class TradingBot(commands.Bot):
                     "symbols": pair_clean
                 }
                 
-                async with aiohttp.ClientSession() as session:
+                async with provider_session() as session:
                     async with session.get(url, params=params, timeout=10) as response:
                         if response.status == 200:
                             data = await response.json()
@@ -1731,7 +4646,7 @@ class TradingBot(commands.Bot):
                             await self.log_api_limit_warning("FXApi", "Access denied - API key may be invalid or expired")
         except Exception as e:
             api_errors["fxapi"] = str(e)
-            print(f"FXApi failed for {pair}: {e}")
+            print(f"FXApi failed for {pair_clean}: {e}")
         
         # Try Twelve Data API
         try:
@@ -1742,7 +4657,7 @@ class TradingBot(commands.Bot):
                     "apikey": PRICE_TRACKING_CONFIG["api_keys"]["twelve_data_key"]
                 }
                 
-                async with aiohttp.ClientSession() as session:
+                async with provider_session() as session:
                     async with session.get(url, params=params, timeout=10) as response:
                         if response.status == 200:
                             data = await response.json()
@@ -1756,7 +4671,7 @@ class TradingBot(commands.Bot):
                             await self.log_api_limit_warning("Twelve Data", "Rate limit exceeded - upgrade for higher limits")
         except Exception as e:
             api_errors["twelve_data"] = str(e)
-            print(f"Twelve Data API failed for {pair}: {e}")
+            print(f"Twelve Data API failed for {pair_clean}: {e}")
         
         # Try Alpha Vantage API
         try:
@@ -1769,7 +4684,7 @@ class TradingBot(commands.Bot):
                     "apikey": PRICE_TRACKING_CONFIG["api_keys"]["alpha_vantage_key"]
                 }
                 
-                async with aiohttp.ClientSession() as session:
+                async with provider_session() as session:
                     async with session.get(url, params=params, timeout=10) as response:
                         if response.status == 200:
                             data = await response.json()
@@ -1785,7 +4700,7 @@ class TradingBot(commands.Bot):
                             await self.log_api_limit_warning("Alpha Vantage", "Rate limit exceeded")
         except Exception as e:
             api_errors["alpha_vantage"] = str(e)
-            print(f"Alpha Vantage API failed for {pair}: {e}")
+            print(f"Alpha Vantage API failed for {pair_clean}: {e}")
         
         # Try Financial Modeling Prep API
         try:
@@ -1795,7 +4710,7 @@ class TradingBot(commands.Bot):
                     "apikey": PRICE_TRACKING_CONFIG["api_keys"]["fmp_key"]
                 }
                 
-                async with aiohttp.ClientSession() as session:
+                async with provider_session() as session:
                     async with session.get(url, params=params, timeout=10) as response:
                         if response.status == 200:
                             data = await response.json()
@@ -1810,10 +4725,14 @@ class TradingBot(commands.Bot):
                             await self.log_api_limit_warning("Financial Modeling Prep", "Rate limit exceeded - upgrade plan needed")
         except Exception as e:
             api_errors["fmp"] = str(e)
-            print(f"FMP API failed for {pair}: {e}")
+            print(f"FMP API failed for {pair_clean}: {e}")
         
+        # Record every source's quote, including ones the cross-check later rejects
+        for api_name, price in prices.items():
+            self.ticks.record(pair_clean, price, api_name)
+
         # Verify price accuracy using multiple sources
-        return await self.verify_price_accuracy(pair, prices, api_errors)
+        return await self.verify_price_accuracy(pair_clean, prices, api_errors)
     
     async def verify_price_accuracy(self, pair: str, prices: Dict[str, float], api_errors: Dict[str, str]) -> Optional[float]:
         """Verify price accuracy by cross-checking multiple API sources"""
@@ -1871,6 +4790,7 @@ class TradingBot(commands.Bot):
                      f"• Bot will continue using other API sources\n\n" + \
                      f"**Impact:** Price tracking accuracy may be reduced if multiple APIs are limited."
         
+        PROVIDER_LIMIT_HITS.inc(api_name)
         await self.log_to_discord(warning_msg)
         print(f"API LIMIT WARNING: {api_name} - {message}")
 
@@ -1939,6 +4859,38 @@ class TradingBot(commands.Bot):
         
         return None
 
+    def calculate_live_tracking_levels(self, live_price: float, pair: str, action: str):
+        """Calculate TP and SL levels based on live price for backend tracking"""
+        pip_value = pip_value_for(pair)
+        
+        # Calculate pip amounts (20, 40, 70, 50 as specified by user)
+        tp1_pips = 20 * pip_value
+        tp2_pips = 40 * pip_value  
+        tp3_pips = 70 * pip_value
+        sl_pips = 50 * pip_value
+        
+        # Determine direction based on action
+        is_buy = action.upper() == "BUY"
+        
+        if is_buy:
+            tp1 = live_price + tp1_pips
+            tp2 = live_price + tp2_pips
+            tp3 = live_price + tp3_pips
+            sl = live_price - sl_pips
+        else:  # SELL
+            tp1 = live_price - tp1_pips
+            tp2 = live_price - tp2_pips
+            tp3 = live_price - tp3_pips
+            sl = live_price + sl_pips
+        
+        return {
+            'entry': live_price,
+            'tp1': tp1,
+            'tp2': tp2,
+            'tp3': tp3,
+            'sl': sl
+        }
+
     async def check_price_levels(self, message_id: str, trade_data: Dict) -> bool:
         """Check if current price has hit any TP/SL levels"""
         try:
@@ -1951,6 +4903,14 @@ class TradingBot(commands.Bot):
             
             # Determine if we should check breakeven (after TP2 hit)
             if trade_data["breakeven_active"]:
+                # TP3 is still open after TP2
+                if action == "BUY" and current_price >= trade_data["tp3"]:
+                    await self.handle_tp_hit(message_id, trade_data, "tp3")
+                    return True
+                elif action == "SELL" and current_price <= trade_data["tp3"]:
+                    await self.handle_tp_hit(message_id, trade_data, "tp3")
+                    return True
+
                 # Check if price returned to entry (breakeven SL)
                 if action == "BUY" and current_price <= entry:
                     await self.handle_breakeven_hit(message_id, trade_data)
@@ -2001,6 +4961,7 @@ class TradingBot(commands.Bot):
         try:
             # Update trade data
             trade_data["tp_hits"].append(tp_level)
+            TRADE_EVENTS.inc(tp_level, trade_data.get("pair"))
             
             if tp_level == "tp2":
                 # After TP2, activate breakeven
@@ -2013,6 +4974,7 @@ class TradingBot(commands.Bot):
                 # Remove from active trades after TP3
                 if message_id in PRICE_TRACKING_CONFIG["active_trades"]:
                     del PRICE_TRACKING_CONFIG["active_trades"][message_id]
+                await self.trade_stats.record_close(message_id, trade_data, "tp3")
             
             # Send notification
             await self.send_tp_notification(message_id, trade_data, tp_level)
@@ -2024,10 +4986,12 @@ class TradingBot(commands.Bot):
         """Handle when SL is hit"""
         try:
             trade_data["status"] = "closed (sl hit)"
+            TRADE_EVENTS.inc("sl", trade_data.get("pair"))
             
             # Remove from active trades
             if message_id in PRICE_TRACKING_CONFIG["active_trades"]:
                 del PRICE_TRACKING_CONFIG["active_trades"][message_id]
+            await self.trade_stats.record_close(message_id, trade_data, "sl")
             
             # Send notification
             await self.send_sl_notification(message_id, trade_data)
@@ -2039,10 +5003,12 @@ class TradingBot(commands.Bot):
         """Handle when price returns to breakeven after TP2"""
         try:
             trade_data["status"] = "closed (breakeven after tp2)"
+            TRADE_EVENTS.inc("breakeven", trade_data.get("pair"))
             
             # Remove from active trades
             if message_id in PRICE_TRACKING_CONFIG["active_trades"]:
                 del PRICE_TRACKING_CONFIG["active_trades"][message_id]
+            await self.trade_stats.record_close(message_id, trade_data, "breakeven")
             
             # Send breakeven notification
             await self.send_breakeven_notification(message_id, trade_data)
@@ -2089,61 +5055,36 @@ class TradingBot(commands.Bot):
 
     async def track_member_join_via_invite(self, member, invite_code):
         """Track a member joining via specific invite"""
-        if not self.db_pool:
+        if not self.db:
             return
         
-        try:
-            async with self.db_pool.acquire() as conn:
-                # Record the join
-                await conn.execute(
-                    '''
-                    INSERT INTO member_joins (member_id, guild_id, invite_code, joined_at, is_currently_member)
-                    VALUES ($1, $2, $3, NOW(), TRUE)
-                    ''', member.id, member.guild.id, invite_code
-                )
-                
-                # Update invite tracking statistics
-                if invite_code in INVITE_TRACKING:
-                    INVITE_TRACKING[invite_code]["total_joins"] += 1
-                    INVITE_TRACKING[invite_code]["current_members"] += 1
-                    await self.save_invite_tracking()
-                    
-        except Exception as e:
-            print(f"❌ Error tracking member join via invite: {str(e)}")
+        # Update invite tracking statistics
+        stats = INVITE_TRACKING.get(invite_code)
+        if stats:
+            stats.total_joins += 1
+            stats.current_members += 1
+
+        # The join and the invite's new totals are written with the next pipeline flush
+        self.join_pipeline.record_invite_join(member.id, member.guild.id, invite_code)
 
     async def track_member_leave(self, member):
         """Track a member leaving and update invite statistics"""
-        if not self.db_pool:
+        if not self.db:
             return
         
         try:
-            async with self.db_pool.acquire() as conn:
-                # Find the member's join record and update it
-                join_record = await conn.fetchrow(
-                    '''
-                    SELECT invite_code FROM member_joins 
-                    WHERE member_id = $1 AND guild_id = $2 AND is_currently_member = TRUE
-                    ORDER BY joined_at DESC LIMIT 1
-                    ''', member.id, member.guild.id
-                )
-                
-                if join_record and join_record['invite_code']:
-                    invite_code = join_record['invite_code']
-                    
-                    # Update the member's record
-                    await conn.execute(
-                        '''
-                        UPDATE member_joins 
-                        SET left_at = NOW(), is_currently_member = FALSE
-                        WHERE member_id = $1 AND guild_id = $2 AND is_currently_member = TRUE
-                        ''', member.id, member.guild.id
-                    )
-                    
-                    # Update invite tracking statistics
-                    if invite_code in INVITE_TRACKING:
-                        INVITE_TRACKING[invite_code]["total_left"] += 1
-                        INVITE_TRACKING[invite_code]["current_members"] = max(0, INVITE_TRACKING[invite_code]["current_members"] - 1)
-                        await self.save_invite_tracking()
+            # A join still waiting for its batched write must exist before it can be closed
+            if self.join_pipeline.has_pending_join(member.id):
+                await self.join_pipeline.flush_joins()
+
+            # Close the member's join record; the invite's totals are updated in the same transaction
+            invite_code = await self.db.record_member_leave(member.id, member.guild.id)
+
+            # Mirror the database update in memory
+            stats = INVITE_TRACKING.get(invite_code) if invite_code else None
+            if stats:
+                stats.total_left += 1
+                stats.current_members = max(0, stats.current_members - 1)
                 
         except Exception as e:
             print(f"❌ Error tracking member leave: {str(e)}")
@@ -2170,11 +5111,11 @@ class TradingBot(commands.Bot):
                         await self.log_to_discord(f"🎉 {member.display_name} leveled up to Level {new_level}! Role '{new_role.name}' assigned.")
                         
                         # Send congratulations DM
-                        try:
-                            dm_message = f"Congratulations! You've leveled up to level {new_level}!"
-                            await user.send(dm_message)
+                        dm_message = f"Congratulations! You've leveled up to level {new_level}!"
+                        outcome = await self.dm_service.send(user, dm_message)
+                        if outcome == "sent":
                             await self.log_to_discord(f"📬 Sent level-up DM to {member.display_name} for Level {new_level}")
-                        except discord.Forbidden:
+                        elif outcome == "forbidden":
                             await self.log_to_discord(f"⚠️ Could not send level-up DM to {member.display_name} (DMs disabled)")
                         
                     except discord.Forbidden:
@@ -2196,286 +5137,147 @@ class TradingBot(commands.Bot):
         if message.author.bot or not message.guild:
             return
             
-        user_id = str(message.author.id)
-        guild_id = message.guild.id
-        
         # Initialize user data if not exists
-        if user_id not in LEVEL_SYSTEM["user_data"]:
-            LEVEL_SYSTEM["user_data"][user_id] = {
-                "message_count": 0,
-                "current_level": 0,
-                "guild_id": guild_id
-            }
+        record = LEVEL_SYSTEM["user_data"].get(message.author.id)
+        if record is None:
+            record = LEVEL_SYSTEM["user_data"][message.author.id] = LevelRecord(guild_id=message.guild.id)
         
         # Increment message count
-        LEVEL_SYSTEM["user_data"][user_id]["message_count"] += 1
-        current_count = LEVEL_SYSTEM["user_data"][user_id]["message_count"]
-        old_level = LEVEL_SYSTEM["user_data"][user_id]["current_level"]
+        record.message_count += 1
+        old_level = record.current_level
         
         # Calculate new level
-        new_level = self.calculate_level(current_count)
+        new_level = self.calculate_level(record.message_count)
         
         # Check if leveled up
         if new_level > old_level:
-            LEVEL_SYSTEM["user_data"][user_id]["current_level"] = new_level
+            record.current_level = new_level
             await self.handle_level_up(message.author, message.guild, old_level, new_level)
             
             # Save to database
-            await self.save_level_system()
-
-    @tasks.loop(seconds=30)  # Check every 30 seconds for instant role removal
-    async def role_removal_task(self):
-        """Background task to remove expired roles and send DMs"""
-        if not AUTO_ROLE_CONFIG["enabled"] or not AUTO_ROLE_CONFIG[
-                "active_members"]:
-            return
-
-        current_time = datetime.now(AMSTERDAM_TZ)
-        expired_members = []
-
-        for member_id, data in AUTO_ROLE_CONFIG["active_members"].items():
-            try:
-                # Handle weekend delayed members with custom expiry time
-                if data.get("weekend_delayed",
-                            False) and "expiry_time" in data:
-                    # Weekend joiners have specific expiry time (Monday 23:59)
-                    expiry_time = datetime.fromisoformat(data["expiry_time"])
-                    if expiry_time.tzinfo is None:
-                        if PYTZ_AVAILABLE:
-                            expiry_time = AMSTERDAM_TZ.localize(expiry_time)
-                        else:
-                            expiry_time = expiry_time.replace(
-                                tzinfo=AMSTERDAM_TZ)
-                    else:
-                        expiry_time = expiry_time.astimezone(AMSTERDAM_TZ)
-                else:
-                    # Normal members - 24 hours from role_added_time
-                    role_added_time = datetime.fromisoformat(
-                        data["role_added_time"])
-                    if role_added_time.tzinfo is None:
-                        if PYTZ_AVAILABLE:
-                            role_added_time = AMSTERDAM_TZ.localize(
-                                role_added_time)
-                        else:
-                            role_added_time = role_added_time.replace(
-                                tzinfo=AMSTERDAM_TZ)
-                    else:
-                        role_added_time = role_added_time.astimezone(
-                            AMSTERDAM_TZ)
-
-                    expiry_time = role_added_time + timedelta(hours=24)
-
-                if current_time >= expiry_time:
-                    expired_members.append(member_id)
-
-            except Exception as e:
-                print(f"❌ Error processing member {member_id}: {str(e)}")
-                expired_members.append(member_id)  # Remove corrupted entries
-
-        # Process expired members
-        for member_id in expired_members:
-            await self.remove_expired_role(member_id)
-
-        # Save updated config if there were changes
-        if expired_members:
-            await self.save_auto_role_config()
-
-    @tasks.loop(
-        minutes=1)  # Check every minute for Monday activation notifications
-    async def weekend_activation_task(self):
-        """Background task to send Monday activation DMs for weekend joiners"""
-        if not AUTO_ROLE_CONFIG["enabled"] or not AUTO_ROLE_CONFIG[
-                "weekend_pending"]:
-            return
-
-        current_time = datetime.now(AMSTERDAM_TZ)
-        activation_time = self.get_next_monday_activation_time()
-
-        # Check if it's past Monday 00:01 and send activation notifications
-        if current_time >= activation_time:
-            pending_members = list(AUTO_ROLE_CONFIG["weekend_pending"].keys())
-
-            for member_id in pending_members:
-                try:
-                    await self.send_monday_activation_dm(member_id)
-                except Exception as e:
-                    await self.log_to_discord(
-                        f"❌ Error processing Monday activation for member {member_id}: {str(e)}"
-                    )
-
-    async def followup_dm_task(self):
-        """Background task to send follow-up DMs after 3, 7, and 14 days"""
-        if not AUTO_ROLE_CONFIG["dm_schedule"]:
-            return
-
-        current_time = datetime.now(AMSTERDAM_TZ)
-        messages_to_send = []
-
-        # Define the follow-up messages
-        dm_messages = {
-            3:
-            "Hey! It's been 3 days since your **24-hour free access to the Premium Signals channel** ended. We hope you were able to catch good trades with us during that time.\n\nAs you've probably seen, the **free signals channel only gets about 1 signal a day**, while inside **Gold Pioneers**, members receive **8–10 high-quality signals every single day in <#1350929852299214999>**. That means way more chances to profit and grow consistently.\n\nWe'd love to **invite you back to Premium Signals** so you don't miss out on more solid opportunities.\n\n**Feel free to join us again through this link:** https://whop.com/gold-pioneer",
-            7:
-            "It's been a week since your Premium Signals trial ended. Since then, our **Gold Pioneers  have been catching trade setups daily in <#1350929852299214999>**.\n\nIf you found value in just 24 hours, imagine the results you could be seeing by now with full access. It's all about **consistency and staying plugged into the right information**.\n\nWe'd like to **personally invite you to rejoin Premium Signals** and get back into the rhythm.\n\n\n**Feel free to join us again through this link:** https://whop.com/gold-pioneer",
-            14:
-            "Hey! It's been two weeks since your access to Premium Signals ended. We hope you've stayed active. \n\nIf you've been trading solo or passively following the free channel, you might be feeling the difference. in <#1350929852299214999>, it's not just about more signals. It's about the **structure, support, and smarter decision-making**. That edge can make all the difference over time.\n\nWe'd love to **officially invite you back into Premium Signals** and help you start compounding results again.\n\n**Feel free to join us again through this link:** https://whop.com/gold-pioneer"
-        }
-
-        for member_id, schedule_data in AUTO_ROLE_CONFIG["dm_schedule"].items(
-        ):
-            try:
-                expiry_time = datetime.fromisoformat(
-                    schedule_data["role_expired"])
-                if expiry_time.tzinfo is None:
-                    expiry_time = expiry_time.replace(tzinfo=AMSTERDAM_TZ)
-                else:
-                    expiry_time = expiry_time.astimezone(AMSTERDAM_TZ)
-
-                # Check for each follow-up period
-                for days, message in dm_messages.items():
-                    sent_key = f"dm_{days}_sent"
-
-                    if not schedule_data.get(sent_key, False):
-                        time_diff = current_time - expiry_time
-
-                        if time_diff >= timedelta(days=days):
-                            messages_to_send.append({
-                                'member_id':
-                                member_id,
-                                'guild_id':
-                                schedule_data['guild_id'],
-                                'message':
-                                message,
-                                'days':
-                                days,
-                                'sent_key':
-                                sent_key
-                            })
-
-            except Exception as e:
-                await self.log_to_discord(
-                    f"❌ Error processing DM schedule for member {member_id}: {str(e)}"
-                )
-
-        # Send the messages
-        for msg_data in messages_to_send:
-            try:
-                guild = self.get_guild(msg_data['guild_id'])
-                if not guild:
-                    continue
-
-                member = guild.get_member(int(msg_data['member_id']))
-                if not member:
-                    continue
-
-                # Check if member has Gold Pioneer role - if so, skip the DM
-                gold_pioneer_role = guild.get_role(GOLD_PIONEER_ROLE_ID)
-                if gold_pioneer_role and gold_pioneer_role in member.roles:
-                    await self.log_to_discord(
-                        f"⏭️ Skipping {msg_data['days']}-day DM for {member.display_name} - already has Gold Pioneer role"
-                    )
-                    # Mark as sent even though we skipped it
-                    AUTO_ROLE_CONFIG["dm_schedule"][msg_data['member_id']][
-                        msg_data['sent_key']] = True
-                    continue
-
-                # Send the follow-up DM
-                await member.send(msg_data['message'])
-                await self.log_to_discord(
-                    f"📬 Sent {msg_data['days']}-day follow-up DM to {member.display_name}"
-                )
-
-                # Mark as sent
-                AUTO_ROLE_CONFIG["dm_schedule"][msg_data['member_id']][
-                    msg_data['sent_key']] = True
-
-            except discord.Forbidden:
-                await self.log_to_discord(
-                    f"⚠️ Could not send {msg_data['days']}-day follow-up DM to member {msg_data['member_id']} (DMs disabled)"
-                )
-                # Mark as sent to avoid retrying when DMs are disabled
-                AUTO_ROLE_CONFIG["dm_schedule"][msg_data['member_id']][
-                    msg_data['sent_key']] = True
-            except Exception as e:
-                # For other errors, implement retry logic
-                retry_count = AUTO_ROLE_CONFIG["dm_schedule"][msg_data['member_id']].get(f"dm_{msg_data['days']}_retry_count", 0)
-                max_retries = 3
-                
-                if retry_count < max_retries:
-                    # Increment retry count and try again later
-                    AUTO_ROLE_CONFIG["dm_schedule"][msg_data['member_id']][f"dm_{msg_data['days']}_retry_count"] = retry_count + 1
-                    await self.log_to_discord(
-                        f"🔄 DM retry {retry_count + 1}/{max_retries} for {msg_data['days']}-day message to member {msg_data['member_id']}: {str(e)}"
-                    )
-                else:
-                    # Max retries reached, mark as sent to stop trying
-                    AUTO_ROLE_CONFIG["dm_schedule"][msg_data['member_id']][
-                        msg_data['sent_key']] = True
-                    await self.log_to_discord(
-                        f"❌ Failed to send {msg_data['days']}-day DM to member {msg_data['member_id']} after {max_retries} retries: {str(e)}"
-                    )
-
-        # Save config if any changes were made
-        if messages_to_send:
-            await self.save_auto_role_config()
+            await self.save_level_system()
 
-    @tasks.loop(minutes=1)  # Check every minute for real-time DM sending
-    async def followup_dm_task(self):
-        """Background task to send Monday activation DMs for weekend joiners"""
+    @tasks.loop(seconds=30, name="role_removal")  # Check every 30 seconds for instant role removal
+    async def role_removal_task(self):
+        """Background task to remove expired roles and send DMs"""
         if not AUTO_ROLE_CONFIG["enabled"] or not AUTO_ROLE_CONFIG[
                 "active_members"]:
             return
 
         current_time = datetime.now(AMSTERDAM_TZ)
-        weekday = current_time.weekday()  # Monday=0
-        hour = current_time.hour
+        expired_members = [member_id for member_id, data in AUTO_ROLE_CONFIG["active_members"].items()
+                           if current_time >= data.expires_at()]
+
+        # Resolve all expired members and their DM channels in one batch
+        members = await self.member_resolver.resolve_many(
+            (AUTO_ROLE_CONFIG["active_members"][member_id].guild_id, member_id)
+            for member_id in expired_members)
+        await self.dm_service.warm(list(members))
+
+        # Process expired members concurrently; role removals and DMs are paced per route
+        await asyncio.gather(*(self.remove_expired_role(member_id, members.get(member_id))
+                               for member_id in expired_members))
+
+        # Save updated config if there were changes
+        if expired_members:
+            await self.save_auto_role_config()
 
-        # Only run on Monday between 00:00 and 01:00 to send activation messages
-        if weekday != 0 or hour > 1:
+    @tasks.loop(minutes=1, name="job_dispatch")
+    async def job_dispatch_task(self):
+        """Run scheduled jobs (follow-up and Monday activation DMs) that have come due"""
+        if not self.db:
             return
 
-        for member_id, data in AUTO_ROLE_CONFIG["active_members"].items():
-            try:
-                # Only process weekend delayed members who haven't been notified yet
-                if (data.get("weekend_delayed", False)
-                        and not data.get("monday_notification_sent", False)):
-
-                    guild = self.get_guild(data["guild_id"])
-                    if guild:
-                        member = guild.get_member(int(member_id))
-                        if member:
-                            try:
-                                activation_message = (
-                                    "Hey! The weekend is over, so the trading markets have been opened again. "
-                                    "That means your 24-hour welcome gift has officially started. "
-                                    "You now have full access to the premium channel. "
-                                    "Let's make the most of it by securing some wins together!"
-                                )
-                                await member.send(activation_message)
-                                print(
-                                    f"✅ Sent Monday activation DM to {member.display_name}"
-                                )
+        try:
+            jobs = await self.db.claim_due_jobs(JOB_SCHEDULER_CONFIG["batch_size"],
+                                                JOB_SCHEDULER_CONFIG["lease_seconds"])
+        except Exception as e:
+            print(f"❌ Error claiming scheduled jobs: {str(e)}")
+            return
+
+        if not jobs:
+            return
 
-                                # Mark as notified to avoid duplicate messages
-                                AUTO_ROLE_CONFIG["active_members"][member_id][
-                                    "monday_notification_sent"] = True
-                                await self.save_auto_role_config()
+        # Resolve every member and DM channel for the batch up front
+        members = await self.member_resolver.resolve_many((job['guild_id'], job['member_id']) for job in jobs)
+        await self.dm_service.warm(list(members))
 
-                            except discord.Forbidden:
-                                print(
-                                    f"⚠️ Could not send Monday activation DM to {member.display_name} (DMs disabled)"
-                                )
-                            except Exception as e:
-                                print(
-                                    f"❌ Error sending Monday activation DM to {member.display_name}: {str(e)}"
-                                )
+        # Jobs run concurrently; the DM service bounds and paces the actual sends
+        await asyncio.gather(*(self.run_job(job, members.get(job['member_id'])) for job in jobs))
 
-            except Exception as e:
-                print(
-                    f"❌ Error processing Monday activation for member {member_id}: {str(e)}"
-                )
+    async def run_job(self, job, member):
+        """Run one claimed job and record its outcome exactly once"""
+        followup_days = FOLLOWUP_JOB_KINDS.get(job['kind'])
+        try:
+            if followup_days:
+                outcome = await self.send_followup_dm(member, followup_days)
+            elif job['kind'] == "monday_activation":
+                outcome = await self.send_monday_activation_dm(member)
+            else:
+                outcome = "unknown_kind"
+
+            await self.db.complete_job(job['id'], outcome, job['member_id'], followup_days)
+            if followup_days:
+                schedule = AUTO_ROLE_CONFIG["dm_schedule"].get(job['member_id'])
+                if schedule:
+                    setattr(schedule, f"dm_{followup_days}_sent", True)
+
+        except Exception as e:
+            try:
+                if job['attempts'] >= JOB_SCHEDULER_CONFIG["max_attempts"]:
+                    await self.db.complete_job(job['id'], "failed", job['member_id'], followup_days)
+                    await self.log_to_discord(
+                        f"❌ Failed {job['kind']} job for member {job['member_id']} after {job['attempts']} attempts: {str(e)}"
+                    )
+                else:
+                    await self.db.retry_job(job['id'], JOB_SCHEDULER_CONFIG["retry_delay_seconds"] * job['attempts'], str(e))
+                    await self.log_to_discord(
+                        f"🔄 Retry {job['attempts']}/{JOB_SCHEDULER_CONFIG['max_attempts']} for {job['kind']} job for member {job['member_id']}: {str(e)}"
+                    )
+            except Exception as db_error:
+                # The lease expires on its own, so the job is picked up again later
+                print(f"❌ Error recording outcome of job {job['id']}: {str(db_error)}")
+
+    async def send_followup_dm(self, member, days):
+        """Send a 3/7/14-day follow-up DM; returns the job outcome"""
+        if not member:
+            return "member_not_found"
+
+        # Members who already bought Gold Pioneer don't get the sales follow-ups
+        if any(role.id == GOLD_PIONEER_ROLE_ID for role in member.roles):
+            await self.log_to_discord(
+                f"⏭️ Skipping {days}-day DM for {member.display_name} - already has Gold Pioneer role")
+            return "skipped_gold_pioneer"
 
-    async def remove_expired_role(self, member_id):
+        outcome = await self.dm_service.send(member, FOLLOWUP_DM_MESSAGES[days])
+        if outcome == "forbidden":
+            await self.log_to_discord(
+                f"⚠️ Could not send {days}-day follow-up DM to {member.display_name} (DMs disabled)")
+            return "dm_disabled"
+        if outcome != "sent":
+            raise RuntimeError(f"DM delivery {outcome}")
+
+        await self.log_to_discord(f"📬 Sent {days}-day follow-up DM to {member.display_name}")
+        return "sent"
+
+    async def send_monday_activation_dm(self, member):
+        """Tell a weekend joiner their 24 hours have started; returns the job outcome"""
+        if not member:
+            return "member_not_found"
+        if member.id not in AUTO_ROLE_CONFIG["active_members"]:
+            return "role_expired"
+
+        outcome = await self.dm_service.send(member, MONDAY_ACTIVATION_MESSAGE)
+        if outcome == "forbidden":
+            print(f"⚠️ Could not send Monday activation DM to {member.display_name} (DMs disabled)")
+            return "dm_disabled"
+        if outcome != "sent":
+            raise RuntimeError(f"DM delivery {outcome}")
+
+        print(f"✅ Sent Monday activation DM to {member.display_name}")
+        return "sent"
+
+    async def remove_expired_role(self, member_id: int, member=None):
         """Remove expired role from member and send DM"""
         try:
             data = AUTO_ROLE_CONFIG["active_members"].get(member_id)
@@ -2483,55 +5285,54 @@ class TradingBot(commands.Bot):
                 return
 
             # Get the guild and member
-            guild = self.get_guild(data["guild_id"])
+            guild = self.get_guild(data.guild_id)
             if not guild:
                 print(f"❌ Guild not found for member {member_id}")
                 del AUTO_ROLE_CONFIG["active_members"][member_id]
                 return
 
-            member = guild.get_member(int(member_id))
+            if member is None:
+                member = await self.member_resolver.resolve_one(guild.id, member_id)
             if not member:
                 print(f"❌ Member {member_id} not found in guild")
                 del AUTO_ROLE_CONFIG["active_members"][member_id]
                 return
 
             # Get the role
-            role = guild.get_role(data["role_id"])
+            role = guild.get_role(data.role_id)
             if role and role in member.roles:
+                await self.rate_limiter.acquire("remove_roles", guild.id)
                 await member.remove_roles(role, reason="Auto-role expired")
                 await self.log_to_discord(
                     f"✅ Removed expired role '{role.name}' from {member.display_name}"
                 )
 
             # Send DM to the member with the default message
-            try:
-                default_message = "Hey! Your **24-hour free access** to the premium channel has unfortunately **ran out**. We truly hope that you were able to benefit with us & we hope to see you back soon! For now, feel free to continue following our trade signals in <#1350929790148022324>."
-                await member.send(default_message)
+            default_message = "Hey! Your **24-hour free access** to the premium channel has unfortunately **ran out**. We truly hope that you were able to benefit with us & we hope to see you back soon! For now, feel free to continue following our trade signals in <#1350929790148022324>."
+            outcome = await self.dm_service.send(member, default_message)
+            if outcome == "sent":
                 await self.log_to_discord(
                     f"✅ Sent expiration DM to {member.display_name}")
-            except discord.Forbidden:
+            elif outcome == "forbidden":
                 await self.log_to_discord(
                     f"⚠️ Could not send DM to {member.display_name} (DMs disabled)"
                 )
-            except Exception as e:
+            else:
                 await self.log_to_discord(
-                    f"❌ Error sending DM to {member.display_name}: {str(e)}")
+                    f"❌ Error sending DM to {member.display_name}: {outcome}")
 
             current_time = datetime.now(AMSTERDAM_TZ)
 
             # Update role history with expiration time
-            if member_id in AUTO_ROLE_CONFIG["role_history"]:
-                AUTO_ROLE_CONFIG["role_history"][member_id][
-                    "last_expired"] = current_time.isoformat()
+            self.join_pipeline.record_role_expiry(member_id, current_time)
 
             # Schedule follow-up DMs (3, 7, 14 days after expiration)
-            AUTO_ROLE_CONFIG["dm_schedule"][member_id] = {
-                "role_expired": current_time.isoformat(),
-                "guild_id": data["guild_id"],
-                "dm_3_sent": False,
-                "dm_7_sent": False,
-                "dm_14_sent": False
-            }
+            AUTO_ROLE_CONFIG["dm_schedule"][member_id] = FollowupSchedule(current_time, data.guild_id)
+            if self.db:
+                await self.db.schedule_jobs([
+                    (kind, member_id, data.guild_id, current_time + timedelta(days=days))
+                    for kind, days in FOLLOWUP_JOB_KINDS.items()
+                ])
 
             # Remove from active tracking
             del AUTO_ROLE_CONFIG["active_members"][member_id]
@@ -2541,8 +5342,7 @@ class TradingBot(commands.Bot):
                 f"❌ Error removing expired role for member {member_id}: {str(e)}"
             )
             # Clean up corrupted entry
-            if member_id in AUTO_ROLE_CONFIG["active_members"]:
-                del AUTO_ROLE_CONFIG["active_members"][member_id]
+            AUTO_ROLE_CONFIG["active_members"].pop(member_id, None)
 
 
 bot = TradingBot()
@@ -2690,101 +5490,29 @@ def calculate_levels(entry_price: float, pair: str, entry_type: str):
     }
 
 
-    def calculate_live_tracking_levels(self, live_price: float, pair: str, action: str):
-        """Calculate TP and SL levels based on live price for backend tracking"""
-        if pair in PAIR_CONFIG:
-            pip_value = PAIR_CONFIG[pair]['pip_value']
-        else:
-            # Default values for unknown pairs
-            pip_value = 0.0001
-        
-        # Calculate pip amounts (20, 40, 70, 50 as specified by user)
-        tp1_pips = 20 * pip_value
-        tp2_pips = 40 * pip_value  
-        tp3_pips = 70 * pip_value
-        sl_pips = 50 * pip_value
-        
-        # Determine direction based on action
-        is_buy = action.upper() == "BUY"
-        
-        if is_buy:
-            tp1 = live_price + tp1_pips
-            tp2 = live_price + tp2_pips
-            tp3 = live_price + tp3_pips
-            sl = live_price - sl_pips
-        else:  # SELL
-            tp1 = live_price - tp1_pips
-            tp2 = live_price - tp2_pips
-            tp3 = live_price - tp3_pips
-            sl = live_price + sl_pips
-        
-        return {
-            'entry': live_price,
-            'tp1': tp1,
-            'tp2': tp2,
-            'tp3': tp3,
-            'sl': sl
-        }
-
-
-def get_remaining_time_display(member_id: str) -> str:
+def get_remaining_time_display(member_id: int) -> str:
     """Get formatted remaining time display for a member"""
     try:
         data = AUTO_ROLE_CONFIG["active_members"].get(member_id)
         if not data:
             return "Unknown"
 
-        current_time = datetime.now(AMSTERDAM_TZ)
-
-        if data.get("weekend_delayed", False) and "expiry_time" in data:
-            # Weekend joiners have specific expiry time (Monday 23:59)
-            expiry_time = datetime.fromisoformat(data["expiry_time"])
-            if expiry_time.tzinfo is None:
-                if PYTZ_AVAILABLE:
-                    expiry_time = AMSTERDAM_TZ.localize(expiry_time)
-                else:
-                    expiry_time = expiry_time.replace(tzinfo=AMSTERDAM_TZ)
-            else:
-                expiry_time = expiry_time.astimezone(AMSTERDAM_TZ)
-
-            time_remaining = expiry_time - current_time
+        time_remaining = data.expires_at() - datetime.now(AMSTERDAM_TZ)
 
-            if time_remaining.total_seconds() <= 0:
-                return None  # Return None for expired members to filter them out
+        if time_remaining.total_seconds() <= 0:
+            return None  # Return None for expired members to filter them out
 
-            hours = int(time_remaining.total_seconds() // 3600)
-            minutes = int((time_remaining.total_seconds() % 3600) // 60)
-            seconds = int(time_remaining.total_seconds() % 60)
+        hours = int(time_remaining.total_seconds() // 3600)
+        minutes = int((time_remaining.total_seconds() % 3600) // 60)
+        seconds = int(time_remaining.total_seconds() % 60)
 
-            # Check if it's a custom duration
-            if data.get("custom_duration", False):
+        if data.weekend_delayed and data.expiry_time:
+            # Weekend joiners have specific expiry time (Monday 23:59)
+            if data.custom_duration:
                 return f"Custom: {hours}h {minutes}m {seconds}s"
-            else:
-                return f"Weekend: {hours}h {minutes}m {seconds}s"
-
-        else:
-            # Normal member - 24 hours from role_added_time
-            role_added_time = datetime.fromisoformat(data["role_added_time"])
-            if role_added_time.tzinfo is None:
-                if PYTZ_AVAILABLE:
-                    role_added_time = AMSTERDAM_TZ.localize(role_added_time)
-                else:
-                    role_added_time = role_added_time.replace(
-                        tzinfo=AMSTERDAM_TZ)
-            else:
-                role_added_time = role_added_time.astimezone(AMSTERDAM_TZ)
+            return f"Weekend: {hours}h {minutes}m {seconds}s"
 
-            expiry_time = role_added_time + timedelta(hours=24)
-            time_remaining = expiry_time - current_time
-
-            if time_remaining.total_seconds() <= 0:
-                return None  # Return None for expired members to filter them out
-
-            hours = int(time_remaining.total_seconds() // 3600)
-            minutes = int((time_remaining.total_seconds() % 3600) // 60)
-            seconds = int(time_remaining.total_seconds() % 60)
-
-            return f"{hours}h {minutes}m {seconds}s"
+        return f"{hours}h {minutes}m {seconds}s"
 
     except Exception as e:
         print(f"Error calculating time for member {member_id}: {str(e)}")
@@ -2956,7 +5684,7 @@ async def timed_auto_role_command(interaction: discord.Interaction,
                         if not guild:
                             continue
 
-                        member = guild.get_member(int(member_id))
+                        member = guild.get_member(member_id)
                         if not member:
                             continue
 
@@ -3015,7 +5743,7 @@ async def timed_auto_role_command(interaction: discord.Interaction,
                     if not guild:
                         continue
 
-                    member = guild.get_member(int(member_id))
+                    member = guild.get_member(member_id)
                     if not member:
                         continue
 
@@ -3109,10 +5837,8 @@ async def timed_auto_role_command(interaction: discord.Interaction,
                 return
 
             # Manual adduser bypasses anti-abuse system (admin exception)
-            user_id_str = str(user.id)
-
             # Check if user already has the role or is already tracked
-            if user_id_str in AUTO_ROLE_CONFIG["active_members"]:
+            if user.id in AUTO_ROLE_CONFIG["active_members"]:
                 await interaction.response.send_message(
                     f"❌ {user.display_name} already has an active temporary role.",
                     ephemeral=True)
@@ -3136,21 +5862,12 @@ async def timed_auto_role_command(interaction: discord.Interaction,
                     # Weekend timing - expires Monday 23:59
                     expiry_time = bot.get_monday_expiry_time(now)
 
-                    AUTO_ROLE_CONFIG["active_members"][user_id_str] = {
-                        "role_added_time": now.isoformat(),
-                        "role_id": target_role.id,
-                        "guild_id": interaction.guild.id,
-                        "weekend_delayed": True,
-                        "expiry_time": expiry_time.isoformat()
-                    }
+                    AUTO_ROLE_CONFIG["active_members"][user.id] = ActiveMember(
+                        now, target_role.id, interaction.guild.id,
+                        weekend_delayed=True, expiry_time=expiry_time)
 
                     # Record in role history for anti-abuse
-                    AUTO_ROLE_CONFIG["role_history"][user_id_str] = {
-                        "first_granted": now.isoformat(),
-                        "times_granted": 1,
-                        "last_expired": None,
-                        "guild_id": interaction.guild.id
-                    }
+                    bot.record_role_grant(user.id, interaction.guild.id, now)
 
                     timing_info = f"Weekend timing (expires Monday 23:59)"
 
@@ -3168,23 +5885,13 @@ async def timed_auto_role_command(interaction: discord.Interaction,
 
                     expiry_time = now + timedelta(hours=hours, minutes=minutes)
 
-                    AUTO_ROLE_CONFIG["active_members"][user_id_str] = {
-                        "role_added_time": now.isoformat(),
-                        "role_id": target_role.id,
-                        "guild_id": interaction.guild.id,
-                        "weekend_delayed":
-                        True,  # Use weekend logic for custom timing
-                        "expiry_time": expiry_time.isoformat(),
-                        "custom_duration": True
-                    }
+                    AUTO_ROLE_CONFIG["active_members"][user.id] = ActiveMember(
+                        now, target_role.id, interaction.guild.id,
+                        weekend_delayed=True,  # Use weekend logic for custom timing
+                        expiry_time=expiry_time, custom_duration=True)
 
                     # Record in role history for anti-abuse
-                    AUTO_ROLE_CONFIG["role_history"][user_id_str] = {
-                        "first_granted": now.isoformat(),
-                        "times_granted": 1,
-                        "last_expired": None,
-                        "guild_id": interaction.guild.id
-                    }
+                    bot.record_role_grant(user.id, interaction.guild.id, now)
 
                     duration_text = []
                     if hours > 0:
@@ -3196,20 +5903,11 @@ async def timed_auto_role_command(interaction: discord.Interaction,
 
                 else:
                     # 24-hour timing
-                    AUTO_ROLE_CONFIG["active_members"][user_id_str] = {
-                        "role_added_time": now.isoformat(),
-                        "role_id": target_role.id,
-                        "guild_id": interaction.guild.id,
-                        "weekend_delayed": False
-                    }
+                    AUTO_ROLE_CONFIG["active_members"][user.id] = ActiveMember(
+                        now, target_role.id, interaction.guild.id)
 
                     # Record in role history for anti-abuse
-                    AUTO_ROLE_CONFIG["role_history"][user_id_str] = {
-                        "first_granted": now.isoformat(),
-                        "times_granted": 1,
-                        "last_expired": None,
-                        "guild_id": interaction.guild.id
-                    }
+                    bot.record_role_grant(user.id, interaction.guild.id, now)
 
                     timing_info = f"24 hours (expires {(now + timedelta(hours=24)).strftime('%A %H:%M')})"
 
@@ -3240,7 +5938,7 @@ async def timed_auto_role_command(interaction: discord.Interaction,
                 return
 
             # Check if user is tracked in the system
-            if str(user.id) not in AUTO_ROLE_CONFIG["active_members"]:
+            if user.id not in AUTO_ROLE_CONFIG["active_members"]:
                 await interaction.response.send_message(
                     f"❌ {user.display_name} is not currently tracked in the auto-role system.",
                     ephemeral=True)
@@ -3248,13 +5946,12 @@ async def timed_auto_role_command(interaction: discord.Interaction,
 
             try:
                 # Get the role info before removing
-                user_data = AUTO_ROLE_CONFIG["active_members"][str(user.id)]
-                role_id = user_data.get("role_id")
+                role_id = AUTO_ROLE_CONFIG["active_members"][user.id].role_id
                 target_role = interaction.guild.get_role(
                     role_id) if interaction.guild and role_id else None
 
                 # Remove from tracking
-                del AUTO_ROLE_CONFIG["active_members"][str(user.id)]
+                del AUTO_ROLE_CONFIG["active_members"][user.id]
 
                 # Remove the role if they still have it
                 if target_role and target_role in user.roles:
@@ -3276,7 +5973,7 @@ async def timed_auto_role_command(interaction: discord.Interaction,
 
             except discord.Forbidden:
                 # Still remove from tracking even if we can't remove the role
-                del AUTO_ROLE_CONFIG["active_members"][str(user.id)]
+                AUTO_ROLE_CONFIG["active_members"].pop(user.id, None)
                 await bot.save_auto_role_config()
 
                 await interaction.response.send_message(
@@ -3463,7 +6160,7 @@ async def database_status_command(interaction: discord.Interaction):
 
     await interaction.response.defer(ephemeral=True)
 
-    if not bot.db_pool:
+    if not bot.db:
         embed = discord.Embed(
             title="📊 Database Status",
             description=
@@ -3478,72 +6175,58 @@ async def database_status_command(interaction: discord.Interaction):
         return
 
     try:
-        async with bot.db_pool.acquire() as conn:
-            # Get database info
-            version = await conn.fetchval('SELECT version()')
-            current_time = await conn.fetchval('SELECT NOW()')
-
-            # Get table count
-            table_count = await conn.fetchval("""
-                SELECT COUNT(*) FROM information_schema.tables 
-                WHERE table_schema = 'public'
-            """)
-
-            # Get connection info
-            pool_size = bot.db_pool.get_size()
-            pool_idle = bot.db_pool.get_idle_size()
-
-            embed = discord.Embed(
-                title="📊 Database Status",
-                description="✅ **Database Connected & Working**",
-                color=discord.Color.green())
+        # Check specific bot tables
+        bot_tables = [
+            'role_history', 'active_members', 'weekend_pending',
+            'dm_schedule', 'auto_role_config'
+        ]
+        status = await bot.db.get_status(bot_tables)
+
+        version = status["version"]
+        current_time = status["server_time"]
+        table_count = status["table_count"]
+        schema_version = status["schema_version"]
+        existing_tables = status["existing_tables"]
+
+        # Get connection info
+        pool_size = bot.db.pool_size()
+        pool_idle = bot.db.pool_idle()
 
-            embed.add_field(
-                name="🗄️ PostgreSQL Info",
-                value=
-                f"Version: {version.split()[1]}\nServer Time: {current_time.strftime('%Y-%m-%d %H:%M:%S UTC')}",
-                inline=True)
+        embed = discord.Embed(
+            title="📊 Database Status",
+            description="✅ **Database Connected & Working**",
+            color=discord.Color.green())
+
+        embed.add_field(
+            name="🗄️ PostgreSQL Info",
+            value=
+            f"Version: {version.split()[1]}\nServer Time: {current_time.strftime('%Y-%m-%d %H:%M:%S UTC')}",
+            inline=True)
+
+        embed.add_field(
+            name="📊 Connection Pool",
+            value=
+            f"Pool Size: {pool_size}\nIdle Connections: {pool_idle}\nActive: {pool_size - pool_idle}",
+            inline=True)
+
+        latest_version = max(version for version, _, _ in SCHEMA_MIGRATIONS)
 
+        embed.add_field(name="📋 Tables",
+                        value=f"Total Tables: {table_count}\n"
+                        f"Schema Version: {schema_version or 0}/{latest_version}",
+                        inline=True)
+
+        if existing_tables:
             embed.add_field(
-                name="📊 Connection Pool",
-                value=
-                f"Pool Size: {pool_size}\nIdle Connections: {pool_idle}\nActive: {pool_size - pool_idle}",
-                inline=True)
-
-            embed.add_field(name="📋 Tables",
-                            value=f"Total Tables: {table_count}",
-                            inline=True)
-
-            # Check specific bot tables
-            bot_tables = [
-                'role_history', 'active_members', 'weekend_pending',
-                'dm_schedule', 'auto_role_config'
-            ]
-            existing_tables = []
-
-            for table in bot_tables:
-                exists = await conn.fetchval(
-                    """
-                    SELECT EXISTS (
-                        SELECT FROM information_schema.tables 
-                        WHERE table_schema = 'public' 
-                        AND table_name = $1
-                    )
-                """, table)
-                if exists:
-                    existing_tables.append(table)
-
-            if existing_tables:
-                embed.add_field(
-                    name="🤖 Bot Tables",
-                    value=f"Created: {len(existing_tables)}/{len(bot_tables)}\n"
-                    + "\n".join(f"✅ {table}" for table in existing_tables),
-                    inline=False)
-
-            embed.set_footer(
-                text=
-                "Database is functioning properly for persistent memory storage"
-            )
+                name="🤖 Bot Tables",
+                value=f"Created: {len(existing_tables)}/{len(bot_tables)}\n"
+                + "\n".join(f"✅ {table}" for table in existing_tables),
+                inline=False)
+
+        embed.set_footer(
+            text=
+            "Database is functioning properly for persistent memory storage"
+        )
 
     except Exception as e:
         embed = discord.Embed(title="📊 Database Status",
@@ -3561,6 +6244,131 @@ async def database_status_command(interaction: discord.Interaction):
     await interaction.followup.send(embed=embed)
 
 
+@bot.tree.command(name="memoryreport", description="[OWNER ONLY] Show memory used by the in-memory registries")
+@app_commands.describe(
+    synthetic="Also compare the old dict layout with the slotted layout for this many synthetic members (e.g. 100000)"
+)
+async def memory_report_command(interaction: discord.Interaction, synthetic: int = 0):
+    """Show entry counts and approximate size per registry"""
+    if not await owner_check(interaction):
+        return
+
+    await interaction.response.defer(ephemeral=True)
+
+    report = "🧠 **MEMORY REPORT**\n━━━━━━━━━━━━━━━━━━━━━━\n\n"
+    total_bytes = 0
+    for name, usage in registry_memory_report().items():
+        total_bytes += usage["bytes"]
+        per_entry = usage["bytes"] // usage["entries"] if usage["entries"] else 0
+        report += f"• **{name}**: {usage['entries']:,} entries, {usage['bytes'] / 1024:,.1f} KiB ({per_entry} B/entry)\n"
+    report += f"\n**Total**: {total_bytes / 1024:,.1f} KiB\n"
+
+    if synthetic > 0:
+        synthetic = min(synthetic, 500_000)
+        report += f"\n**Synthetic {synthetic:,} members (old dicts → slotted records):**\n"
+        # Building the synthetic dataset takes seconds, so keep it off the event loop
+        comparison = await asyncio.to_thread(synthetic_registry_comparison, synthetic)
+        for name, (legacy, slotted) in comparison.items():
+            report += (f"• **{name}**: {legacy / 1048576:,.1f} MiB → {slotted / 1048576:,.1f} MiB "
+                       f"({100 - slotted * 100 / legacy:.0f}% smaller)\n")
+
+    await interaction.followup.send(report, ephemeral=True)
+
+
+@bot.tree.command(name="debug", description="[OWNER ONLY] Inspect the running bot")
+@app_commands.describe(
+    action="What to inspect",
+    seconds="Profile duration in seconds (profile only, max 60)",
+    memory_action="Memory tracking: diff against the baseline, take a new baseline, or stop tracing"
+)
+@app_commands.choices(
+    action=[
+        app_commands.Choice(name="🐢 Slow callbacks", value="slow"),
+        app_commands.Choice(name="🔥 CPU profile", value="profile"),
+        app_commands.Choice(name="🧠 Memory growth", value="memory"),
+    ],
+    memory_action=[
+        app_commands.Choice(name="Diff", value="diff"),
+        app_commands.Choice(name="New baseline", value="start"),
+        app_commands.Choice(name="Stop", value="stop"),
+    ]
+)
+async def debug_command(interaction: discord.Interaction, action: str, seconds: int = 10,
+                        memory_action: str = "diff"):
+    """Owner diagnostics for the live event loop"""
+    if not await owner_check(interaction):
+        return
+
+    if action == "profile":
+        if bot.profiler.busy():
+            await interaction.response.send_message("❌ A profile is already running", ephemeral=True)
+            return
+        await interaction.response.defer(ephemeral=True)
+        stacks = await bot.profiler.profile(seconds)
+        sampled = sum(stacks.values())
+        profile = json.dumps(speedscope_profile(stacks, DEBUG_CONFIG["sample_interval"],
+                                                sampled * DEBUG_CONFIG["sample_interval"]))
+        files = [
+            discord.File(io.BytesIO(collapsed_profile(stacks).encode()), filename="profile.collapsed.txt"),
+            discord.File(io.BytesIO(profile.encode()), filename="profile.speedscope.json"),
+        ]
+        await interaction.followup.send(
+            f"🔥 **Profile**: {sampled:,} samples of the event-loop thread. "
+            f"Open the JSON at https://www.speedscope.app", files=files, ephemeral=True)
+        return
+
+    if action == "memory":
+        await interaction.response.defer(ephemeral=True)
+        if memory_action == "start":
+            bot.profiler.start_memory_tracking()
+            await interaction.followup.send("🧠 Memory baseline taken - run diff later to see growth", ephemeral=True)
+            return
+        if memory_action == "stop":
+            bot.profiler.stop_memory_tracking()
+            await interaction.followup.send("🧠 Memory tracing stopped", ephemeral=True)
+            return
+
+        diff = bot.profiler.memory_diff()
+        if diff["status"] != "diff":
+            await interaction.followup.send("🧠 Memory tracing started and baseline taken - run diff again later",
+                                            ephemeral=True)
+            return
+        report = "🧠 **MEMORY GROWTH SINCE BASELINE**\n━━━━━━━━━━━━━━━━━━━━━━\n\n"
+        report += f"**Traced:** {diff['traced_bytes'] / 1048576:,.1f} MiB (peak {diff['traced_peak_bytes'] / 1048576:,.1f} MiB)\n\n"
+        report += "**Registries:**\n"
+        for name, usage in diff["registries"].items():
+            report += (f"• **{name}**: {usage['entries']:,} entries ({usage['entries_change']:+,}), "
+                       f"{usage['bytes'] / 1024:,.1f} KiB ({usage['bytes_change'] / 1024:+,.1f})\n")
+        report += "\n**Top allocation growth:**\n"
+        for stat in diff["top_growth"][:10]:
+            report += f"• `{os.path.basename(stat['location'])}` {stat['size_change'] / 1024:+,.1f} KiB\n"
+        await interaction.followup.send(report[:2000], ephemeral=True)
+        return
+
+    if action == "slow":
+        lag, monitor = bot.loop_lag, bot.slow_callbacks
+
+        def ms(seconds):
+            return f"{seconds * 1000:,.0f}ms" if seconds is not None else "N/A"
+
+        report = "🐢 **EVENT LOOP**\n━━━━━━━━━━━━━━━━━━━━━━\n\n"
+        report += (f"**Lag:** last {ms(lag.last_lag)}, p50 {ms(lag.percentile(0.5))}, "
+                   f"p99 {ms(lag.percentile(0.99))}, max {ms(lag.max_lag)}\n")
+        report += f"**Slow threshold:** {LOOP_MONITOR_CONFIG['slow_callback_ms']}ms\n\n"
+
+        if not monitor.by_source:
+            report += "✅ No slow callbacks recorded"
+        else:
+            report += "**Worst sources (total time held):**\n"
+            for source, (count, total, worst) in monitor.top(8):
+                report += f"• `{source}`: {count}x, total {ms(total)}, max {ms(worst)}\n"
+            report += "\n**Most recent:**\n"
+            for when, elapsed, source, detail in list(monitor.recent)[-8:][::-1]:
+                report += f"• {when.strftime('%H:%M:%S')} `{source}` {ms(elapsed)} ({detail})\n"
+
+        await interaction.response.send_message(report[:2000], ephemeral=True)
+
+
 # Level System Command
 @bot.tree.command(name="level", description="Check level information for yourself or another user, or view leaderboard")
 @app_commands.describe(
@@ -3584,11 +6392,11 @@ async def level_command(interaction: discord.Interaction, user: discord.Member =
         # Get guild members and filter level data to current guild
         guild_users = []
         for user_id, data in LEVEL_SYSTEM["user_data"].items():
-            if data.get("guild_id") == interaction.guild.id:
+            if data.guild_id == interaction.guild.id:
                 guild_users.append((user_id, data))
         
         # Sort by level (descending), then by message count (descending)
-        guild_users.sort(key=lambda x: (x[1]["current_level"], x[1]["message_count"]), reverse=True)
+        guild_users.sort(key=lambda x: (x[1].current_level, x[1].message_count), reverse=True)
         
         # Create leaderboard embed
         embed = discord.Embed(
@@ -3601,12 +6409,12 @@ async def level_command(interaction: discord.Interaction, user: discord.Member =
         leaderboard_text = ""
         for i, (user_id, data) in enumerate(guild_users[:10], 1):
             try:
-                member = interaction.guild.get_member(int(user_id))
+                member = interaction.guild.get_member(user_id)
                 if member:
                     # Medal emojis for top 3
                     medal = "🥇" if i == 1 else "🥈" if i == 2 else "🥉" if i == 3 else f"**{i}.**"
-                    level = data["current_level"]
-                    messages = data["message_count"]
+                    level = data.current_level
+                    messages = data.message_count
                     
                     level_display = f"Level {level}" if level > 0 else "No Level"
                     leaderboard_text += f"{medal} **{member.display_name}**\n"
@@ -3624,8 +6432,8 @@ async def level_command(interaction: discord.Interaction, user: discord.Member =
             
             # Add server stats
             total_users = len(guild_users)
-            total_messages = sum(data["message_count"] for _, data in guild_users)
-            avg_level = sum(data["current_level"] for _, data in guild_users) / total_users if total_users > 0 else 0
+            total_messages = sum(data.message_count for _, data in guild_users)
+            avg_level = sum(data.current_level for _, data in guild_users) / total_users if total_users > 0 else 0
             
             embed.add_field(
                 name="📊 Server Statistics",
@@ -3647,9 +6455,9 @@ async def level_command(interaction: discord.Interaction, user: discord.Member =
     
     # Individual level check (original functionality)
     target_user = user or interaction.user
-    user_id = str(target_user.id)
+    user_data = LEVEL_SYSTEM["user_data"].get(target_user.id)
     
-    if user_id not in LEVEL_SYSTEM["user_data"]:
+    if user_data is None:
         await interaction.response.send_message(
             f"📊 **{target_user.display_name}** has not sent any messages yet.\n" +
             "Start chatting to begin leveling up!",
@@ -3657,9 +6465,8 @@ async def level_command(interaction: discord.Interaction, user: discord.Member =
         )
         return
     
-    user_data = LEVEL_SYSTEM["user_data"][user_id]
-    current_level = user_data["current_level"]
-    message_count = user_data["message_count"]
+    current_level = user_data.current_level
+    message_count = user_data.message_count
     
     # Calculate progress to next level
     next_level = current_level + 1
@@ -3829,23 +6636,17 @@ async def giveaway_command(interaction: discord.Interaction,
             
             giveaway_list = []
             for gid, data in ACTIVE_GIVEAWAYS.items():
-                end_time = data['end_time']
-                if isinstance(end_time, str):
-                    end_time = datetime.fromisoformat(end_time)
-                if end_time.tzinfo is None:
-                    end_time = end_time.replace(tzinfo=AMSTERDAM_TZ)
-                
-                time_left = end_time - datetime.now(AMSTERDAM_TZ)
+                time_left = data.end_time - datetime.now(AMSTERDAM_TZ)
                 if time_left.total_seconds() > 0:
                     hours_left = int(time_left.total_seconds() // 3600)
                     minutes_left = int((time_left.total_seconds() % 3600) // 60)
-                    chosen_count = len(data.get('chosen_winners', []))
+                    chosen_count = len(data.chosen_winners)
                     
                     giveaway_list.append(
                         f"**{gid}**\n" +
                         f"  ⏰ Time left: {hours_left}h {minutes_left}m\n" +
-                        f"  🏆 Winners: {data['winner_count']}\n" +
-                        f"  🎯 Guaranteed: {chosen_count}/{data['winner_count']}\n"
+                        f"  🏆 Winners: {data.winner_count}\n" +
+                        f"  🎯 Guaranteed: {chosen_count}/{data.winner_count}\n"
                     )
             
             if not giveaway_list:
@@ -3887,13 +6688,11 @@ async def giveaway_command(interaction: discord.Interaction,
                 return
             
             # Add chosen winner
-            if 'chosen_winners' not in ACTIVE_GIVEAWAYS[giveaway_id]:
-                ACTIVE_GIVEAWAYS[giveaway_id]['chosen_winners'] = []
-            
-            if user.id not in ACTIVE_GIVEAWAYS[giveaway_id]['chosen_winners']:
+            giveaway = ACTIVE_GIVEAWAYS[giveaway_id]
+            if user.id not in giveaway.chosen_winners:
                 # Check if we're not exceeding winner limit
-                current_chosen = len(ACTIVE_GIVEAWAYS[giveaway_id]['chosen_winners'])
-                max_winners = ACTIVE_GIVEAWAYS[giveaway_id]['winner_count']
+                current_chosen = len(giveaway.chosen_winners)
+                max_winners = giveaway.winner_count
                 
                 if current_chosen >= max_winners:
                     await interaction.response.send_message(
@@ -3903,12 +6702,13 @@ async def giveaway_command(interaction: discord.Interaction,
                     )
                     return
                 
-                ACTIVE_GIVEAWAYS[giveaway_id]['chosen_winners'].append(user.id)
+                giveaway.chosen_winners.append(user.id)
                 await interaction.response.send_message(
                     f"✅ **{user.mention} has been guaranteed as a winner** for giveaway `{giveaway_id}`!\n" +
-                    f"Guaranteed winners: {len(ACTIVE_GIVEAWAYS[giveaway_id]['chosen_winners'])}/{max_winners}",
+                    f"Guaranteed winners: {len(giveaway.chosen_winners)}/{max_winners}",
                     ephemeral=True
                 )
+                await bot.save_giveaway(giveaway_id)
             else:
                 await interaction.response.send_message(
                     f"❌ {user.mention} is already guaranteed as a winner for this giveaway.",
@@ -4041,17 +6841,9 @@ async def create_giveaway(interaction, settings):
         await message.add_reaction("🎉")
         
         # Store giveaway data
-        ACTIVE_GIVEAWAYS[giveaway_id] = {
-            'message_id': message.id,
-            'channel_id': GIVEAWAY_CHANNEL_ID,
-            'creator_id': interaction.user.id,
-            'required_role_id': settings['role'].id,
-            'winner_count': settings['winners'],
-            'end_time': end_time,
-            'participants': [],
-            'chosen_winners': [],
-            'settings': settings
-        }
+        bot.track_giveaway(giveaway_id, Giveaway(
+            message.id, GIVEAWAY_CHANNEL_ID, interaction.user.id, settings['role'].id,
+            settings['winners'], end_time, settings['message']))
         
         # Log to bot log channel with giveaway ID
         await bot.log_to_discord(
@@ -4068,8 +6860,9 @@ async def create_giveaway(interaction, settings):
         if hasattr(bot, '_temp_giveaway'):
             delattr(bot, '_temp_giveaway')
         
-        # Schedule the giveaway to end
-        asyncio.create_task(schedule_giveaway_end(giveaway_id))
+        # Persist it and let the scheduler end it
+        await bot.save_giveaway(giveaway_id)
+        bot.giveaway_scheduler.schedule(giveaway_id, end_time)
         
         await interaction.followup.send(
             f"✅ **Giveaway created successfully!**\n" +
@@ -4086,74 +6879,39 @@ async def create_giveaway(interaction, settings):
         )
 
 
-async def schedule_giveaway_end(giveaway_id):
-    """Schedule a giveaway to end automatically"""
-    try:
-        giveaway_data = ACTIVE_GIVEAWAYS.get(giveaway_id)
-        if not giveaway_data:
-            return
-        
-        end_time = giveaway_data['end_time']
-        now = datetime.now(AMSTERDAM_TZ)
-        
-        # Calculate sleep time
-        sleep_seconds = (end_time - now).total_seconds()
-        
-        if sleep_seconds > 0:
-            await asyncio.sleep(sleep_seconds)
-            
-        # End the giveaway if it's still active
-        if giveaway_id in ACTIVE_GIVEAWAYS:
-            await end_giveaway(giveaway_id)
-            
-    except Exception as e:
-        print(f"Error scheduling giveaway end: {e}")
-
-
-async def end_giveaway(giveaway_id, interaction=None):
-    """End a giveaway and select winners"""
+async def end_giveaway(giveaway_id, interaction=None) -> bool:
+    """End a giveaway and select winners; returns False if it is still active and should be retried"""
     try:
         if giveaway_id not in ACTIVE_GIVEAWAYS:
             if interaction:
                 await interaction.followup.send("❌ Giveaway not found.", ephemeral=True)
-            return
+            return True
         
         giveaway_data = ACTIVE_GIVEAWAYS[giveaway_id]
         
-        # Get the message
-        channel = bot.get_channel(giveaway_data['channel_id'])
+        # Get the giveaway channel
+        channel = bot.get_channel(giveaway_data.channel_id)
         if not channel:
             if interaction:
                 await interaction.followup.send("❌ Could not find giveaway channel.", ephemeral=True)
-            return
-        
-        try:
-            message = await channel.fetch_message(giveaway_data['message_id'])
-        except discord.NotFound:
-            if interaction:
-                await interaction.followup.send("❌ Giveaway message not found.", ephemeral=True)
-            return
-        
-        # Get all participants who reacted with 🎉
-        valid_participants = []
-        required_role = channel.guild.get_role(giveaway_data['required_role_id'])
+            return False
         
-        for reaction in message.reactions:
-            if str(reaction.emoji) == "🎉":
-                async for user in reaction.users():
-                    if user.bot:
-                        continue
-                    
-                    member = channel.guild.get_member(user.id)
-                    if member and required_role and required_role in member.roles:
-                        valid_participants.append(member)
+        if GIVEAWAY_CONFIG["reconcile_on_end"]:
+            try:
+                await reconcile_giveaway_participants(giveaway_id)
+            except discord.HTTPException as e:
+                print(f"⚠️ Could not reconcile participants for {giveaway_id}: {e}")
         
-        # Remove duplicates
-        valid_participants = list(set(valid_participants))
+        # Participants were recorded as they reacted; re-check they are still members with the role
+        required_role = channel.guild.get_role(giveaway_data.required_role_id)
+        members = await bot.member_resolver.resolve(channel.guild.id, giveaway_data.participants)
+        valid_participants = [member for member in members.values()
+                              if required_role and required_role in member.roles]
+        total_participants = len(valid_participants)
         
         # Get chosen winners and random winners
-        chosen_winners = giveaway_data.get('chosen_winners', [])
-        winner_count = giveaway_data['winner_count']
+        chosen_winners = giveaway_data.chosen_winners
+        winner_count = giveaway_data.winner_count
         
         final_winners = []
         
@@ -4191,7 +6949,7 @@ async def end_giveaway(giveaway_id, interaction=None):
             
             embed.add_field(
                 name="📊 Stats",
-                value=f"Total Participants: {len(valid_participants) + len(final_winners)}\nWinners Selected: {len(final_winners)}",
+                value=f"Total Participants: {total_participants}\nWinners Selected: {len(final_winners)}",
                 inline=False
             )
         else:
@@ -4215,7 +6973,7 @@ async def end_giveaway(giveaway_id, interaction=None):
                 f"**Giveaway Ended** 🏆\n"
                 f"ID: `{giveaway_id}`\n"
                 f"Winners: {', '.join(winner_names)}\n"
-                f"Total Participants: {len(valid_participants) + len(final_winners)}\n"
+                f"Total Participants: {total_participants}\n"
                 f"Channel: {channel.mention}"
             )
         else:
@@ -4227,58 +6985,113 @@ async def end_giveaway(giveaway_id, interaction=None):
             )
         
         # Remove from active giveaways
-        del ACTIVE_GIVEAWAYS[giveaway_id]
+        await bot.close_giveaway(giveaway_id)
         
         if interaction:
             await interaction.followup.send(
                 f"✅ Giveaway `{giveaway_id}` ended successfully!\n" +
                 f"🏆 Winners: {len(final_winners)}"
             )
+        return True
         
     except Exception as e:
         print(f"Error ending giveaway: {e}")
         if interaction:
             await interaction.followup.send(f"❌ Error ending giveaway: {str(e)}", ephemeral=True)
+        return False
+
+
+async def reconcile_giveaway_participants(giveaway_id: str) -> int:
+    """Rebuild a giveaway's participants from a full crawl of its reactions; returns the number of changes"""
+    giveaway = ACTIVE_GIVEAWAYS.get(giveaway_id)
+    channel = bot.get_channel(giveaway.channel_id) if giveaway else None
+    if not channel:
+        return 0
+
+    # Reactions added or removed while we crawl reach participants through the raw reaction
+    # handlers, which are newer than whatever the crawl saw for those ids; the crawl only judges
+    # entrants known before it started and ids the handlers left alone
+    known_before = set(giveaway.participants)
+    touched = set()
+    giveaway.reconcile_touched.append(touched)
+    try:
+        message = await channel.fetch_message(giveaway.message_id)
+        reacted = set()
+        for reaction in message.reactions:
+            if str(reaction.emoji) == GIVEAWAY_CONFIG["emoji"]:
+                async for user in reaction.users(limit=None):
+                    if not user.bot:
+                        reacted.add(user.id)
+
+        # Entry rules apply to reactors we have not seen yet
+        new_ids = reacted - giveaway.participants - touched
+        members = await bot.member_resolver.resolve(channel.guild.id, new_ids)
+    finally:
+        # By identity: another crawl's set can compare equal to ours
+        giveaway.reconcile_touched[:] = [other for other in giveaway.reconcile_touched if other is not touched]
+    entered = {member_id for member_id, member in members.items()
+               if member_id not in giveaway.participants and member_id not in touched
+               and any(role.id == giveaway.required_role_id for role in member.roles)}
+    withdrawn = (known_before - reacted - touched) & giveaway.participants
+
+    giveaway.participants -= withdrawn
+    giveaway.participants |= entered
+    for member_id in entered:
+        bot.giveaway_entries.record(giveaway_id, member_id, True)
+    for member_id in withdrawn:
+        bot.giveaway_entries.record(giveaway_id, member_id, False)
+    return len(entered) + len(withdrawn)
 
 
-# Add the giveaway reaction handler
 @bot.event
-async def on_reaction_add(reaction, user):
-    """Handle giveaway entry via reactions"""
-    if user.bot:
-        return
-    
-    # Check if this is a giveaway reaction
-    if str(reaction.emoji) != "🎉":
+async def on_raw_reaction_add(payload: discord.RawReactionActionEvent):
+    """Record giveaway entries as they happen; members without the required role are turned away"""
+    # Reactions on any other message exit on a single dict lookup
+    giveaway_id = GIVEAWAY_MESSAGE_INDEX.get(payload.message_id)
+    if giveaway_id is None or str(payload.emoji) != GIVEAWAY_CONFIG["emoji"]:
         return
     
-    # Find if this message is a giveaway
-    giveaway_id = None
-    for gid, data in ACTIVE_GIVEAWAYS.items():
-        if data['message_id'] == reaction.message.id:
-            giveaway_id = gid
-            break
-    
-    if not giveaway_id:
+    member = payload.member
+    if member is None or member.bot:
         return
     
-    giveaway_data = ACTIVE_GIVEAWAYS[giveaway_id]
+    giveaway = ACTIVE_GIVEAWAYS[giveaway_id]
+    for touched in giveaway.reconcile_touched:
+        touched.add(member.id)
     
     # Check if user has required role
-    required_role = reaction.message.guild.get_role(giveaway_data['required_role_id'])
-    member = reaction.message.guild.get_member(user.id)
+    if any(role.id == giveaway.required_role_id for role in member.roles):
+        if member.id not in giveaway.participants:
+            giveaway.participants.add(member.id)
+            bot.giveaway_entries.record(giveaway_id, member.id, True)
+        return
     
-    if not member or not required_role or required_role not in member.roles:
-        # Remove their reaction and send DM
-        try:
-            await reaction.remove(user)
-            await user.send(
-                "**Unfortunately, your current activity level is not high enough to enter this giveaway. " +
-                "You can level up by participating in conversations in any of our text channels.**"
-            )
-        except (discord.Forbidden, discord.NotFound):
-            pass  # Can't DM user or remove reaction
+    # Remove their reaction and send DM
+    try:
+        message = bot.get_partial_messageable(payload.channel_id).get_partial_message(payload.message_id)
+        await message.remove_reaction(payload.emoji, member)
+    except (discord.Forbidden, discord.NotFound):
+        pass  # Can't remove reaction
+    await bot.dm_service.send(
+        member,
+        "**Unfortunately, your current activity level is not high enough to enter this giveaway. " +
+        "You can level up by participating in conversations in any of our text channels.**"
+    )
+
+
+@bot.event
+async def on_raw_reaction_remove(payload: discord.RawReactionActionEvent):
+    """Withdraw a giveaway entry when the reaction is removed"""
+    giveaway_id = GIVEAWAY_MESSAGE_INDEX.get(payload.message_id)
+    if giveaway_id is None or str(payload.emoji) != GIVEAWAY_CONFIG["emoji"]:
         return
+    
+    giveaway = ACTIVE_GIVEAWAYS[giveaway_id]
+    for touched in giveaway.reconcile_touched:
+        touched.add(payload.user_id)
+    if payload.user_id in giveaway.participants:
+        giveaway.participants.discard(payload.user_id)
+        bot.giveaway_entries.record(giveaway_id, payload.user_id, False)
 
 
 # Stats command removed as per user request
@@ -4312,7 +7125,7 @@ async def dm_status_command(interaction: discord.Interaction, message_type: str
         # Clean up completed users first (those who received 14-day message)
         completed_users = []
         for member_id, dm_data in list(AUTO_ROLE_CONFIG["dm_schedule"].items()):
-            if dm_data.get("dm_14_sent", False):
+            if dm_data.dm_14_sent:
                 completed_users.append(member_id)
                 
         # Remove completed users from tracking
@@ -4338,13 +7151,13 @@ async def dm_status_command(interaction: discord.Interaction, message_type: str
             try:
                 # Get member info
                 guild = interaction.guild
-                member = guild.get_member(int(member_id)) if guild else None
+                member = guild.get_member(member_id) if guild else None
                 member_name = member.display_name if member else f"User-{member_id}"
                 
                 # Check DM status
-                dm_3_sent = dm_data.get("dm_3_sent", False)
-                dm_7_sent = dm_data.get("dm_7_sent", False)
-                dm_14_sent = dm_data.get("dm_14_sent", False)
+                dm_3_sent = dm_data.dm_3_sent
+                dm_7_sent = dm_data.dm_7_sent
+                dm_14_sent = dm_data.dm_14_sent
                 
                 if dm_3_sent: sent_3day += 1
                 if dm_7_sent: sent_7day += 1
@@ -4427,12 +7240,12 @@ async def invite_tracking_command(interaction: discord.Interaction, action: str,
             report = "📋 **INVITE TRACKING REPORT**\n━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
             
             for code, data in INVITE_TRACKING.items():
-                nickname_display = data.get("nickname", f"Invite-{code[:8]}")
+                nickname_display = data.nickname or f"Invite-{code[:8]}"
                 report += f"**{nickname_display}** (`{code}`)\n"
-                report += f"• Total Joins: **{data.get('total_joins', 0)}**\n"
-                report += f"• Total Left: **{data.get('total_left', 0)}**\n"
-                report += f"• Current Members: **{data.get('current_members', 0)}**\n"
-                report += f"• Creator: <@{data.get('creator_id', 0)}>\n\n"
+                report += f"• Total Joins: **{data.total_joins}**\n"
+                report += f"• Total Left: **{data.total_left}**\n"
+                report += f"• Current Members: **{data.current_members}**\n"
+                report += f"• Creator: <@{data.creator_id}>\n\n"
             
             # Split message if too long
             if len(report) > 2000:
@@ -4457,16 +7270,9 @@ async def invite_tracking_command(interaction: discord.Interaction, action: str,
                 try:
                     # Try to fetch the invite to get creator info
                     invite = await interaction.guild.fetch_invite(invite_code)
-                    INVITE_TRACKING[invite_code] = {
-                        "nickname": nickname,
-                        "total_joins": 0,
-                        "total_left": 0,
-                        "current_members": 0,
-                        "creator_id": invite.inviter.id if invite.inviter else 0,
-                        "guild_id": interaction.guild.id,
-                        "created_at": datetime.now(AMSTERDAM_TZ).isoformat(),
-                        "last_updated": datetime.now(AMSTERDAM_TZ).isoformat()
-                    }
+                    INVITE_TRACKING[invite_code] = InviteStats(
+                        nickname, invite.inviter.id if invite.inviter else 0, interaction.guild.id,
+                        created_at=datetime.now(AMSTERDAM_TZ))
                 except discord.NotFound:
                     await interaction.followup.send(f"❌ Invite code `{invite_code}` not found or expired.", ephemeral=True)
                     return
@@ -4475,7 +7281,7 @@ async def invite_tracking_command(interaction: discord.Interaction, action: str,
                     return
             else:
                 # Update existing nickname
-                INVITE_TRACKING[invite_code]["nickname"] = nickname
+                INVITE_TRACKING[invite_code].nickname = nickname
             
             # Save to database
             await bot.save_invite_tracking()
@@ -4488,9 +7294,9 @@ async def invite_tracking_command(interaction: discord.Interaction, action: str,
                 await interaction.followup.send("📊 No invite statistics available.", ephemeral=True)
                 return
             
-            total_joins = sum(data.get("total_joins", 0) for data in INVITE_TRACKING.values())
-            total_left = sum(data.get("total_left", 0) for data in INVITE_TRACKING.values())
-            current_members = sum(data.get("current_members", 0) for data in INVITE_TRACKING.values())
+            total_joins = sum(data.total_joins for data in INVITE_TRACKING.values())
+            total_left = sum(data.total_left for data in INVITE_TRACKING.values())
+            current_members = sum(data.current_members for data in INVITE_TRACKING.values())
             total_invites = len(INVITE_TRACKING)
             
             retention_rate = ((current_members / total_joins) * 100) if total_joins > 0 else 0
@@ -4505,11 +7311,11 @@ async def invite_tracking_command(interaction: discord.Interaction, action: str,
             
             # Top performers
             if INVITE_TRACKING:
-                sorted_invites = sorted(INVITE_TRACKING.items(), key=lambda x: x[1].get("total_joins", 0), reverse=True)
+                sorted_invites = sorted(INVITE_TRACKING.items(), key=lambda x: x[1].total_joins, reverse=True)
                 stats_report += f"**Top Performing Invites:**\n"
                 for i, (code, data) in enumerate(sorted_invites[:5]):
-                    nickname_display = data.get("nickname", f"Invite-{code[:8]}")
-                    stats_report += f"{i+1}. **{nickname_display}**: {data.get('total_joins', 0)} joins\n"
+                    nickname_display = data.nickname or f"Invite-{code[:8]}"
+                    stats_report += f"{i+1}. **{nickname_display}**: {data.total_joins} joins\n"
             
             await interaction.followup.send(stats_report, ephemeral=True)
             
@@ -4525,10 +7331,8 @@ async def invite_tracking_command(interaction: discord.Interaction, action: str,
         elif action.lower() == "reset" and invite_code == "confirm":
             # Actually reset the data
             INVITE_TRACKING.clear()
-            if bot.db_pool:
-                async with bot.db_pool.acquire() as conn:
-                    await conn.execute('DELETE FROM invite_tracking')
-                    await conn.execute('DELETE FROM member_joins')
+            if bot.db:
+                await bot.db.reset_invite_tracking()
             
             await interaction.followup.send("✅ All invite tracking data has been reset.", ephemeral=True)
             
@@ -4622,6 +7426,62 @@ async def active_trades(interaction: discord.Interaction):
     
     await interaction.response.send_message(embed=embed)
 
+@bot.tree.command(name="stats", description="[OWNER ONLY] Show trading performance statistics for closed signals")
+@app_commands.describe(
+    period="Time period to report",
+    channel="Post the statistics in this channel instead of replying"
+)
+@app_commands.choices(period=[
+    app_commands.Choice(name="📅 Today", value="day"),
+    app_commands.Choice(name="🗓️ This week", value="week"),
+    app_commands.Choice(name="📆 This month", value="month"),
+    app_commands.Choice(name="♾️ All time", value="all"),
+])
+async def stats_command(interaction: discord.Interaction, period: str = "week",
+                        channel: Optional[discord.TextChannel] = None):
+    """Show precomputed closed-trade statistics"""
+    if not await owner_check(interaction):
+        return
+
+    period_key = trade_periods(datetime.now(timezone.utc))[period]
+    totals, by_pair, by_channel = bot.trade_stats.report(period_key)
+    titles = {"day": "Today", "week": "This Week", "month": "This Month", "all": "All Time"}
+
+    def summary(row: TradeStatsRow) -> str:
+        win_rate = f"{row.win_rate()}%" if row.win_rate() is not None else "N/A"
+        return f"{row.trades} trades · {win_rate} · {row.pips:+.1f} pips"
+
+    embed = discord.Embed(
+        title=f"📈 Trading Statistics - {titles[period]}",
+        color=discord.Color.green() if totals.pips >= 0 else discord.Color.red()
+    )
+    embed.add_field(
+        name="📊 Overview",
+        value=f"**Closed Trades**: {totals.trades}\n"
+              f"**Win Rate**: {f'{totals.win_rate()}%' if totals.win_rate() is not None else 'N/A'}\n"
+              f"**Pips**: {totals.pips:+.1f}\n"
+              f"**TP1 / TP2 / TP3 Hits**: {totals.tp1_hits} / {totals.tp2_hits} / {totals.tp3_hits}\n"
+              f"**Wins / Losses / Breakeven**: {totals.wins} / {totals.losses} / {totals.breakevens}\n"
+              f"**Currently Open**: {len(PRICE_TRACKING_CONFIG['active_trades'])}",
+        inline=False
+    )
+    if by_pair:
+        lines = [f"**{pair}**: {summary(row)}"
+                 for pair, row in sorted(by_pair.items(), key=lambda item: item[1].pips, reverse=True)[:15]]
+        embed.add_field(name="💱 By Pair", value="\n".join(lines), inline=False)
+    if by_channel:
+        lines = [f"<#{channel_id}>: {summary(row)}"
+                 for channel_id, row in sorted(by_channel.items(), key=lambda item: item[1].trades, reverse=True)[:10]]
+        embed.add_field(name="📢 By Channel", value="\n".join(lines), inline=False)
+    embed.set_footer(text="Wins close at TP3, losses at SL, breakeven at entry after TP2")
+
+    if channel:
+        await channel.send(embed=embed)
+        await interaction.response.send_message(f"✅ Statistics posted in {channel.mention}", ephemeral=True)
+    else:
+        await interaction.response.send_message(embed=embed)
+
+
 @bot.tree.command(name="pricetest", description="[OWNER ONLY] Test live price retrieval for a trading pair")
 @app_commands.describe(pair="Trading pair to test")
 @app_commands.autocomplete(pair=pair_autocomplete)
@@ -4680,6 +7540,88 @@ async def test_price_retrieval(interaction: discord.Interaction, pair: str):
         await interaction.followup.send(embed=embed)
 
 
+@bot.tree.command(name="backtest", description="[OWNER ONLY] Replay a channel's past signals against recorded or downloaded prices")
+@app_commands.describe(
+    channel="Channel whose signal history to replay",
+    days="How many days of history to replay",
+    source="Price data to replay against",
+    levels="Use levels recomputed from the price at signal time (like live tracking) or the message's levels"
+)
+@app_commands.choices(
+    source=[
+        app_commands.Choice(name="📼 Recorded ticks", value="ticks"),
+        app_commands.Choice(name="🕯️ Twelve Data candles", value="candles"),
+    ],
+    levels=[
+        app_commands.Choice(name="Live tracking levels", value="live"),
+        app_commands.Choice(name="Message levels", value="message"),
+    ]
+)
+async def backtest_command(interaction: discord.Interaction, channel: discord.TextChannel, days: int = 30,
+                           source: str = "ticks", levels: str = "live"):
+    """Replay historical signals and report per-pair outcomes"""
+    if not await owner_check(interaction):
+        return
+
+    if not NUMPY_AVAILABLE:
+        await interaction.response.send_message("❌ Backtesting needs NumPy (`pip install numpy`)", ephemeral=True)
+        return
+
+    await interaction.response.defer()
+    started = time.perf_counter()
+
+    signals = []
+    since = datetime.now(timezone.utc) - timedelta(days=max(1, days))
+    async for message in channel.history(after=since, limit=BACKTEST_CONFIG["history_limit"]):
+        if not (str(message.author.id) == PRICE_TRACKING_CONFIG["owner_user_id"] or message.author.bot):
+            continue
+        if PRICE_TRACKING_CONFIG["signal_keyword"] not in message.content:
+            continue
+        trade_data = bot.parse_signal_message(message.content)
+        if trade_data:
+            trade_data["timestamp"] = int(message.created_at.timestamp() * 1000)
+            signals.append(trade_data)
+
+    if not signals:
+        await interaction.followup.send(f"📭 No trading signals found in {channel.mention} in the last {days} days")
+        return
+
+    # Price data per pair from the first signal until the last one's hold window closes
+    since_ms = min(signal["timestamp"] for signal in signals)
+    until_ms = max(signal["timestamp"] for signal in signals) + BACKTEST_CONFIG["max_hold_hours"] * 3600 * 1000
+    series = {}
+    for pair in {signal["pair"].replace("/", "").upper() for signal in signals}:
+        if source == "candles":
+            series[pair] = await fetch_candles(
+                pair, datetime.fromtimestamp(since_ms / 1000, timezone.utc),
+                min(datetime.now(timezone.utc), datetime.fromtimestamp(until_ms / 1000, timezone.utc)))
+        else:
+            ts, price = await asyncio.to_thread(bot.ticks.load, pair, since_ms, until_ms)
+            series[pair] = (ts, price, price, price)
+
+    relevel = bot.calculate_live_tracking_levels if levels == "live" else None
+    report = await asyncio.to_thread(run_backtest, signals, series, relevel)
+
+    bars = sum(len(data[0]) for data in series.values())
+    embed = discord.Embed(
+        title="🧪 Signal Backtest",
+        description=f"**{len(signals)}** signals from {channel.mention} over the last {days} days, "
+                    f"replayed against **{bars:,}** {'candles' if source == 'candles' else 'recorded ticks'}",
+        color=discord.Color.blue()
+    )
+    for pair, stats in list(report.items())[:25]:
+        win_rate = f"{stats['win_rate']}%" if stats["win_rate"] is not None else "N/A"
+        value = (f"Win rate: **{win_rate}** | Pips: **{stats['pips']:+}**\n"
+                 f"TP1 {stats['tp1']} · TP2 {stats['tp2']} · TP3 {stats['tp3']}\n"
+                 f"SL {stats['sl']} · Breakeven {stats['breakeven']} · Open {stats['open']}")
+        if stats["no_data"]:
+            value += f"\n⚠️ {stats['no_data']} without price data"
+        embed.add_field(name=f"{pair} ({stats['signals']})", value=value, inline=True)
+    embed.set_footer(text=f"Completed in {time.perf_counter() - started:.1f}s")
+
+    await interaction.followup.send(embed=embed)
+
+
 # ===== ANTI-ABUSE MANAGEMENT COMMAND =====
 @bot.tree.command(name="antiabuse", description="[OWNER ONLY] Manage anti-abuse system for auto-roles")
 @app_commands.describe(
@@ -4695,34 +7637,39 @@ async def anti_abuse_command(interaction: discord.Interaction, action: str, user
     try:
         await interaction.response.defer(ephemeral=True)
         
+        if action.lower() in ("unblock", "block") and user_id and not user_id.isdigit():
+            await interaction.followup.send("❌ User ID must be a numeric Discord ID", ephemeral=True)
+            return
+
         if action.lower() == "view":
             # Show blocked users and statistics
-            if not AUTO_ROLE_CONFIG["role_history"]:
+            if not ROLE_HISTORY:
                 await interaction.followup.send("📋 No users in anti-abuse history.", ephemeral=True)
                 return
+            if not bot.db:
+                await interaction.followup.send("❌ Database required to view anti-abuse records", ephemeral=True)
+                return
             
+            # Full records are only read from the database here, never held in memory
+            stats = await bot.db.role_history_stats()
             blocked_users = []
-            total_users = len(AUTO_ROLE_CONFIG["role_history"])
+            total_users = len(ROLE_HISTORY)
             
-            for uid, data in AUTO_ROLE_CONFIG["role_history"].items():
-                if isinstance(data, dict) and "blocked_reason" in data:
-                    try:
-                        member = interaction.guild.get_member(int(uid))
-                        member_name = member.display_name if member else f"User-{uid}"
-                        blocked_reason = data["blocked_reason"]
-                        blocked_at = data.get("blocked_at", "Unknown")
-                        blocked_users.append(f"• **{member_name}** (`{uid}`)\n  └ Reason: {blocked_reason}\n  └ Blocked: {blocked_at[:10]}")
-                    except Exception:
-                        continue
+            for row in await bot.db.load_blocked_members(10):
+                uid = row['member_id']
+                member = interaction.guild.get_member(uid)
+                member_name = member.display_name if member else f"User-{uid}"
+                blocked_at = row['blocked_at'].strftime('%Y-%m-%d') if row['blocked_at'] else "Unknown"
+                blocked_users.append(f"• **{member_name}** (`{uid}`)\n  └ Reason: {row['blocked_reason']}\n  └ Blocked: {blocked_at}")
             
             report = f"🛡️ **Anti-Abuse System Report**\n━━━━━━━━━━━━━━━━━━━━━━\n\n"
             report += f"• **Total users in history**: {total_users}\n"
-            report += f"• **Currently blocked**: {len(blocked_users)}\n\n"
+            report += f"• **Currently blocked**: {stats['blocked']}\n\n"
             
             if blocked_users:
-                report += "**🚫 Blocked Users:**\n" + "\n".join(blocked_users[:10])
-                if len(blocked_users) > 10:
-                    report += f"\n\n*...and {len(blocked_users) - 10} more*"
+                report += "**🚫 Blocked Users:**\n" + "\n".join(blocked_users)
+                if stats['blocked'] > len(blocked_users):
+                    report += f"\n\n*...and {stats['blocked'] - len(blocked_users)} more*"
             else:
                 report += "✅ No users currently blocked"
             
@@ -4733,9 +7680,10 @@ async def anti_abuse_command(interaction: discord.Interaction, action: str, user
                 await interaction.followup.send("❌ User ID required for unblock action", ephemeral=True)
                 return
             
-            if user_id in AUTO_ROLE_CONFIG["role_history"]:
-                del AUTO_ROLE_CONFIG["role_history"][user_id]
-                await bot.save_auto_role_config()
+            if int(user_id) in ROLE_HISTORY:
+                ROLE_HISTORY.discard(int(user_id))
+                if bot.db:
+                    await bot.db.delete_role_history(int(user_id))
                 await interaction.followup.send(f"✅ Unblocked user {user_id} from anti-abuse system", ephemeral=True)
                 await bot.log_to_discord(f"🔓 Owner manually unblocked user {user_id} from anti-abuse system")
             else:
@@ -4746,31 +7694,30 @@ async def anti_abuse_command(interaction: discord.Interaction, action: str, user
                 await interaction.followup.send("❌ User ID and reason required for block action", ephemeral=True)
                 return
             
-            AUTO_ROLE_CONFIG["role_history"][user_id] = {
-                "blocked_reason": f"manual_block: {reason}",
-                "blocked_by": interaction.user.id,
-                "blocked_at": datetime.now(AMSTERDAM_TZ).isoformat()
-            }
-            await bot.save_auto_role_config()
+            ROLE_HISTORY.add(int(user_id))
+            if bot.db:
+                await bot.db.block_member(int(user_id), f"manual_block: {reason}", interaction.user.id,
+                                          datetime.now(AMSTERDAM_TZ), interaction.guild.id)
             await interaction.followup.send(f"✅ Manually blocked user {user_id}: {reason}", ephemeral=True)
             await bot.log_to_discord(f"🔒 Owner manually blocked user {user_id}: {reason}")
             
         elif action.lower() == "stats":
             # Show anti-abuse statistics
-            total_history = len(AUTO_ROLE_CONFIG["role_history"])
-            blocked_new_accounts = sum(1 for data in AUTO_ROLE_CONFIG["role_history"].values() 
-                                     if isinstance(data, dict) and data.get("blocked_reason") == "account_too_new")
-            blocked_rapid_joins = sum(1 for data in AUTO_ROLE_CONFIG["role_history"].values() 
-                                    if isinstance(data, dict) and data.get("blocked_reason") == "rapid_join_pattern")
-            manual_blocks = sum(1 for data in AUTO_ROLE_CONFIG["role_history"].values() 
-                              if isinstance(data, dict) and "manual_block" in data.get("blocked_reason", ""))
+            total_history = len(ROLE_HISTORY)
+            blocked_new_accounts = blocked_rapid_joins = manual_blocks = 0
+            if bot.db:
+                stats = await bot.db.role_history_stats()
+                blocked_new_accounts = stats['new_accounts']
+                blocked_rapid_joins = stats['rapid_joins']
+                manual_blocks = stats['manual_blocks']
             
             stats_report = f"📊 **Anti-Abuse Statistics**\n━━━━━━━━━━━━━━━━━━━━━━\n\n"
             stats_report += f"• **Total users in history**: {total_history}\n"
             stats_report += f"• **Blocked (new accounts)**: {blocked_new_accounts}\n"
             stats_report += f"• **Blocked (rapid joins)**: {blocked_rapid_joins}\n"
             stats_report += f"• **Manual blocks**: {manual_blocks}\n"
-            stats_report += f"• **Normal completions**: {total_history - blocked_new_accounts - blocked_rapid_joins - manual_blocks}\n\n"
+            stats_report += f"• **Normal completions**: {total_history - blocked_new_accounts - blocked_rapid_joins - manual_blocks}\n"
+            stats_report += f"• **History memory**: {ROLE_HISTORY.nbytes() / 1024:.0f} KiB\n\n"
             stats_report += f"**🛡️ System Status**: Active\n"
             stats_report += f"**📅 Min Account Age**: 7 days\n"
             stats_report += f"**⏱️ Max Joins/Hour**: 5"
@@ -4790,64 +7737,86 @@ async def web_server():
     runner = None
     
     async def health_check(request):
-        bot_status = "Connected" if bot.is_ready() else "Connecting"
-        guild_count = len(bot.guilds) if bot.is_ready() else 0
-
-        # Check database connection status
-        database_status = "Not configured"
-        database_details = {}
-
-        if bot.db_pool:
-            try:
-                async with bot.db_pool.acquire() as conn:
-                    # Test database connection
-                    version = await conn.fetchval('SELECT version()')
-                    database_status = "Connected"
-                    database_details = {
-                        "postgresql_version":
-                        version.split()[1] if version else "Unknown",
-                        "pool_size": bot.db_pool.get_size(),
-                        "pool_idle": bot.db_pool.get_idle_size()
-                    }
-            except Exception as e:
-                database_status = f"Error: {str(e)[:50]}"
-
-        response_data = {
-            "status": "running",
-            "bot_status": bot_status,
-            "bot_user": str(bot.user) if bot.user else "Not logged in",
-            "bot_id": bot.user.id if bot.user else None,
-            "guild_count": guild_count,
-            "guild_names": [guild.name for guild in bot.guilds] if bot.is_ready() else [],
-            "database_status": database_status,
-            "database_details": database_details,
-            "uptime": str(datetime.now()),
-            "version": "2.1",
-            "last_heartbeat": str(bot.last_heartbeat) if hasattr(bot, 'last_heartbeat') and bot.last_heartbeat else "N/A",
-            "bot_latency": f"{round(bot.latency * 1000)}ms" if bot.is_ready() else "N/A",
-            "is_ready": bot.is_ready(),
-            "is_closed": bot.is_closed(),
-            "token_length": len(DISCORD_TOKEN) if DISCORD_TOKEN else 0,
-            "intents": str(bot.intents) if hasattr(bot, 'intents') else "N/A"
-        }
-
-        return web.json_response(response_data, status=200)
+        # Served from the prober's snapshot so uptime pingers never take a pool connection
+        snapshot = bot.health.snapshot
+        if snapshot is None:
+            return web.json_response({"status": "starting", "is_ready": bot.is_ready()}, status=200)
+        return web.json_response({**snapshot, "snapshot_age_seconds": round(bot.health.age(), 1)}, status=200)
+
+    async def liveness_check(request):
+        # Answering at all shows the event loop is running; a stale snapshot means the prober stopped
+        age = bot.health.age()
+        if age is not None and age > HEALTH_CONFIG["stale_after"]:
+            return web.json_response({"status": "stale", "snapshot_age_seconds": round(age, 1)}, status=503)
+        return web.json_response({"status": "ok"}, status=200)
+
+    async def readiness_check(request):
+        ready, checks = bot.health.readiness()
+        return web.json_response({"status": "ready" if ready else "not ready", "checks": checks},
+                                 status=200 if ready else 503)
+
+    def debug_authorized(request) -> bool:
+        token = DEBUG_CONFIG["token"]
+        return bool(token) and request.headers.get("Authorization") == f"Bearer {token}"
+
+    async def profile_handler(request):
+        # Owner-only: without DEBUG_TOKEN configured the endpoint does not exist
+        if not debug_authorized(request):
+            raise web.HTTPNotFound()
+        if bot.profiler.busy():
+            return web.json_response({"error": "a profile is already running"}, status=409)
+        try:
+            seconds = float(request.query.get("seconds", "10"))
+        except ValueError:
+            return web.json_response({"error": "seconds must be a number"}, status=400)
+
+        stacks = await bot.profiler.profile(seconds)
+        seconds = sum(stacks.values()) * DEBUG_CONFIG["sample_interval"]
+        if request.query.get("format") == "speedscope":
+            return web.json_response(speedscope_profile(stacks, DEBUG_CONFIG["sample_interval"], seconds))
+        return web.Response(text=collapsed_profile(stacks))
+
+    async def memory_handler(request):
+        if not debug_authorized(request):
+            raise web.HTTPNotFound()
+        action = request.query.get("action", "diff")
+        if action == "start":
+            bot.profiler.start_memory_tracking()
+            return web.json_response({"status": "baseline taken", "tracing": True})
+        if action == "stop":
+            bot.profiler.stop_memory_tracking()
+            return web.json_response({"status": "stopped", "tracing": False})
+        return web.json_response(bot.profiler.memory_diff())
 
     async def root_handler(request):
         return web.Response(text="Discord Trading Bot is running!", status=200)
 
+    async def metrics_handler(request):
+        token = METRICS_CONFIG["token"]
+        if token and request.headers.get("Authorization") != f"Bearer {token}":
+            return web.Response(text="Unauthorized", status=401)
+        return web.Response(text=METRICS.render(),
+                            headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"})
+
     app = web.Application()
     app.router.add_get('/', root_handler)
     app.router.add_get('/health', health_check)
     app.router.add_get('/status', health_check)
+    app.router.add_get('/livez', liveness_check)
+    app.router.add_get('/readyz', readiness_check)
+    app.router.add_get('/metrics', metrics_handler)
+    app.router.add_get('/debug/profile', profile_handler)
+    app.router.add_get('/debug/memory', memory_handler)
 
     try:
         runner = web.AppRunner(app)
         await runner.setup()
         site = web.TCPSite(runner, '0.0.0.0', 5000)
         await site.start()
+        bot.health.start()
         print("✅ Web server started successfully on port 5000")
         print("Health check available at: http://0.0.0.0:5000/health")
+        print("Metrics available at: http://0.0.0.0:5000/metrics")
 
         try:
             # Keep the server running
@@ -4857,6 +7826,7 @@ async def web_server():
             print("Web server shutting down...")
         finally:
             # Cleanup web server properly
+            await bot.health.stop()
             await runner.cleanup()
             print("✅ Web server cleaned up properly")
 
@@ -4880,16 +7850,12 @@ async def main():
     print(f"Bot token length: {len(DISCORD_TOKEN)} characters")
     print("Starting Discord Trading Bot...")
 
-    # Minimal startup delay to avoid overwhelming Discord
-    print("🕐 Adding minimal startup delay...")
-    await asyncio.sleep(5)  # Short delay
-
     # Create tasks for concurrent execution
     tasks = []
 
     # Web server task
     print("Starting web server...")
-    web_task = asyncio.create_task(web_server())
+    web_task = asyncio.create_task(web_server(), name="web_server")
     tasks.append(web_task)
 
     # Discord bot task with minimal retries to prevent IP banning
@@ -4996,7 +7962,7 @@ async def main():
         
         print("🔚 Bot startup sequence completed")
 
-    bot_task = asyncio.create_task(start_bot_with_retry())
+    bot_task = asyncio.create_task(start_bot_with_retry(), name="discord_bot")
     tasks.append(bot_task)
 
     # Wait for all tasks
@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+"""
+Mock Price Server
+Local stand-in for the four price APIs used by price tracking (FXApi, Twelve Data,
+Alpha Vantage, Financial Modeling Prep). Each provider gets its real URL scheme and
+JSON shape, with configurable latency, 429s, quota-exhausted responses and price
+divergence, so price tracking can be load tested without real API keys or quota.
+
+In-process: point PRICE_TRACKING_CONFIG["api_endpoints"] at MockPriceServer.endpoints().
+Standalone: run this file and start the bot with the printed PRICE_API_ENDPOINTS value.
+
+    python mock_price_server.py --port 8900 --latency 0.05 --rate-limit 0.1 \\
+        --quota twelve_data=800 --diverge fmp=0.002
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import random
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional
+
+from aiohttp import web
+
+PROVIDERS = ("fxapi", "twelve_data", "alpha_vantage", "fmp")
+
+# Starting prices for the pairs the bot trades most; other pairs start at 1.0
+DEFAULT_PRICES = {
+    "EURUSD": 1.08500, "GBPUSD": 1.27000, "USDJPY": 150.000, "AUDUSD": 0.66000,
+    "USDCAD": 1.36000, "USDCHF": 0.88000, "NZDUSD": 0.61000, "XAUUSD": 2350.00,
+}
+
+# Twelve Data time_series intervals served by the mock, in seconds
+CANDLE_INTERVALS = {"1min": 60, "5min": 300, "15min": 900, "30min": 1800, "1h": 3600}
+
+
+class ProviderBehavior:
+    """Fault injection settings for one provider"""
+    __slots__ = ("latency", "jitter", "rate_limit", "quota", "divergence")
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, rate_limit: float = 0.0,
+                 quota: Optional[int] = None, divergence: float = 0.0):
+        self.latency = latency        # seconds added to every response
+        self.jitter = jitter          # extra random 0..jitter seconds
+        self.rate_limit = rate_limit  # share of requests answered with HTTP 429
+        self.quota = quota            # requests served before the provider's quota-exhausted response
+        self.divergence = divergence  # relative offset applied to this provider's quotes
+
+    def to_dict(self) -> Dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class MockPriceServer:
+    """aiohttp app serving each provider's URL scheme and JSON shape from an in-memory price table"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, volatility: float = 0.0):
+        self.host = host
+        self.port = port
+        self.volatility = volatility  # relative random-walk step applied on every quote
+        self.prices: Dict[str, float] = dict(DEFAULT_PRICES)
+        self.behavior: Dict[str, ProviderBehavior] = {provider: ProviderBehavior() for provider in PROVIDERS}
+        self.requests: Dict[str, int] = {provider: 0 for provider in PROVIDERS}
+        self.responses: Dict[str, Dict[str, int]] = {provider: {} for provider in PROVIDERS}
+        self._runner: Optional[web.AppRunner] = None
+
+    # ----- Configuration -----
+
+    def configure(self, provider: Optional[str] = None, **settings):
+        """Change fault injection for one provider, or every provider when provider is None"""
+        for name in ([provider] if provider else PROVIDERS):
+            behavior = self.behavior[name]
+            for key, value in settings.items():
+                if key not in ProviderBehavior.__slots__:
+                    raise ValueError(f"Unknown setting: {key}")
+                setattr(behavior, key, value)
+
+    def reset_counters(self):
+        self.requests = {provider: 0 for provider in PROVIDERS}
+        self.responses = {provider: {} for provider in PROVIDERS}
+
+    # ----- Price table -----
+
+    def set_price(self, pair: str, price: float):
+        self.prices[pair.replace("/", "").upper()] = price
+
+    def quote(self, pair: str, provider: Optional[str] = None) -> float:
+        pair = pair.replace("/", "").upper()
+        price = self.prices.get(pair, 1.0)
+        if self.volatility:
+            price *= 1 + random.uniform(-self.volatility, self.volatility)
+            self.prices[pair] = price
+        if provider:
+            price *= 1 + self.behavior[provider].divergence
+        return round(price, 5)
+
+    # ----- Fault injection -----
+
+    async def _admit(self, provider: str) -> Optional[str]:
+        """Apply latency and decide the response kind: None (normal), "rate_limited" or "quota" """
+        behavior = self.behavior[provider]
+        self.requests[provider] += 1
+        delay = behavior.latency + (random.uniform(0, behavior.jitter) if behavior.jitter else 0)
+        if delay:
+            await asyncio.sleep(delay)
+        if behavior.quota is not None and self.requests[provider] > behavior.quota:
+            return "quota"
+        if behavior.rate_limit and random.random() < behavior.rate_limit:
+            return "rate_limited"
+        return None
+
+    def _respond(self, provider: str, kind: str, body, status: int = 200) -> web.Response:
+        self.responses[provider][kind] = self.responses[provider].get(kind, 0) + 1
+        return web.json_response(body, status=status)
+
+    # ----- Provider handlers -----
+
+    async def fxapi(self, request: web.Request) -> web.Response:
+        fault = await self._admit("fxapi")
+        if fault:
+            message = ("Your monthly usage limit has been reached" if fault == "quota"
+                       else "Too many requests")
+            return self._respond("fxapi", fault, {"message": message}, status=429)
+        pair = request.query.get("symbols", "")
+        return self._respond("fxapi", "ok", {"success": True, "base": pair[:3],
+                                             "rates": {pair: self.quote(pair, "fxapi")}})
+
+    async def twelve_data(self, request: web.Request) -> web.Response:
+        fault = await self._admit("twelve_data")
+        if fault == "quota":
+            # Twelve Data reports exhausted credits in a 200 body
+            return self._respond("twelve_data", fault, {
+                "code": 429, "status": "error",
+                "message": "You have run out of API credits for the day. "
+                           f"{self.requests['twelve_data'] - 1} API credits were used, with the current limit being "
+                           f"{self.behavior['twelve_data'].quota}."})
+        if fault:
+            return self._respond("twelve_data", fault, {"code": 429, "status": "error",
+                                                        "message": "Too many requests"}, status=429)
+        return self._respond("twelve_data", "ok",
+                             {"price": str(self.quote(request.query.get("symbol", ""), "twelve_data"))})
+
+    async def twelve_data_time_series(self, request: web.Request) -> web.Response:
+        """Deterministic oscillating candles, newest first, so backtests hit TPs and SLs"""
+        fault = await self._admit("twelve_data")
+        if fault:
+            return self._respond("twelve_data", fault, {"code": 429, "status": "error",
+                                                        "message": "You have run out of API credits for the day"})
+        pair = request.query.get("symbol", "").replace("/", "").upper()
+        step = CANDLE_INTERVALS.get(request.query.get("interval", "5min"))
+        if step is None:
+            return self._respond("twelve_data", "error", {"code": 400, "status": "error",
+                                                          "message": "Invalid interval"})
+        start = datetime.fromisoformat(request.query["start_date"]).replace(tzinfo=timezone.utc)
+        end = datetime.fromisoformat(request.query["end_date"]).replace(tzinfo=timezone.utc)
+        limit = int(request.query.get("outputsize", 30))
+        base = self.prices.get(pair, 1.0)
+        # Align to the interval, then walk back from the newest candle
+        moment = datetime.fromtimestamp(end.timestamp() // step * step, timezone.utc)
+        values = []
+        while moment >= start and len(values) < limit:
+            t = moment.timestamp()
+            open_, close = (base * (1 + 0.004 * math.sin(x / 7200)) for x in (t, t + step))
+            values.append({
+                "datetime": moment.strftime("%Y-%m-%d %H:%M:%S"),
+                "open": f"{open_:.5f}", "close": f"{close:.5f}",
+                "high": f"{max(open_, close) * 1.0002:.5f}", "low": f"{min(open_, close) * 0.9998:.5f}",
+            })
+            moment -= timedelta(seconds=step)
+        if not values:
+            return self._respond("twelve_data", "ok", {"code": 400, "status": "error",
+                                                       "message": "No data is available on the specified dates"})
+        return self._respond("twelve_data", "ok", {"meta": {"symbol": pair, "interval": request.query.get("interval")},
+                                                   "values": values, "status": "ok"})
+
+    async def alpha_vantage(self, request: web.Request) -> web.Response:
+        fault = await self._admit("alpha_vantage")
+        if fault == "quota":
+            # Alpha Vantage answers a 200 with a "Note" once the free tier is used up
+            return self._respond("alpha_vantage", fault, {
+                "Note": "Thank you for using Alpha Vantage! Our standard API call frequency is 5 calls per minute "
+                        "and 500 calls per day. Please visit https://www.alphavantage.co/premium/ if you would "
+                        "like to target a higher API call frequency."})
+        if fault:
+            return self._respond("alpha_vantage", fault, {"Information": "Too many requests"}, status=429)
+        base, quote = request.query.get("from_currency", ""), request.query.get("to_currency", "")
+        return self._respond("alpha_vantage", "ok", {"Realtime Currency Exchange Rate": {
+            "1. From_Currency Code": base,
+            "3. To_Currency Code": quote,
+            "5. Exchange Rate": str(self.quote(base + quote, "alpha_vantage")),
+        }})
+
+    async def fmp(self, request: web.Request) -> web.Response:
+        fault = await self._admit("fmp")
+        if fault == "quota":
+            return self._respond("fmp", fault, {
+                "Error Message": "Limit Reach . Please upgrade your plan or visit our documentation for more details"})
+        if fault:
+            return self._respond("fmp", fault, {"Error Message": "Too many requests"}, status=429)
+        pair = request.match_info["pair"]
+        return self._respond("fmp", "ok", [{"symbol": pair, "price": self.quote(pair, "fmp")}])
+
+    # ----- Control endpoints -----
+
+    async def get_config(self, request: web.Request) -> web.Response:
+        return web.json_response({
+            "behavior": {provider: behavior.to_dict() for provider, behavior in self.behavior.items()},
+            "requests": self.requests,
+            "responses": self.responses,
+            "prices": self.prices,
+        })
+
+    async def post_config(self, request: web.Request) -> web.Response:
+        """{"provider": "fmp" (optional), "settings": {...}, "prices": {"EURUSD": 1.1}, "reset_counters": true}"""
+        body = await request.json()
+        try:
+            if body.get("settings"):
+                self.configure(body.get("provider"), **body["settings"])
+        except (KeyError, ValueError) as e:
+            return web.json_response({"error": str(e)}, status=400)
+        for pair, price in body.get("prices", {}).items():
+            self.set_price(pair, float(price))
+        if body.get("reset_counters"):
+            self.reset_counters()
+        return await self.get_config(request)
+
+    # ----- Lifecycle -----
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get("/fxapi/api/latest", self.fxapi)
+        app.router.add_get("/twelvedata/price", self.twelve_data)
+        app.router.add_get("/twelvedata/time_series", self.twelve_data_time_series)
+        app.router.add_get("/alphavantage/query", self.alpha_vantage)
+        app.router.add_get("/fmp/api/v3/quote/{pair}", self.fmp)
+        app.router.add_get("/_mock/config", self.get_config)
+        app.router.add_post("/_mock/config", self.post_config)
+        return app
+
+    async def start(self):
+        self._runner = web.AppRunner(self.app(), access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        # Port 0 picks a free port; read back the one actually bound
+        self.port = site._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+
+    def endpoints(self) -> Dict[str, str]:
+        """Drop-in replacement for PRICE_TRACKING_CONFIG["api_endpoints"]"""
+        base = f"http://{self.host}:{self.port}"
+        return {
+            "fxapi": f"{base}/fxapi/api/latest",
+            "alpha_vantage": f"{base}/alphavantage/query",
+            "twelve_data": f"{base}/twelvedata/price",
+            "fmp": f"{base}/fmp/api/v3/quote",
+        }
+
+
+def _provider_values(values, cast) -> Dict[Optional[str], object]:
+    """Parse repeated "provider=value" (or a bare value for every provider) command line options"""
+    parsed = {}
+    for value in values or []:
+        provider, _, setting = value.rpartition("=")
+        if provider and provider not in PROVIDERS:
+            raise SystemExit(f"Unknown provider '{provider}' (choose from {', '.join(PROVIDERS)})")
+        parsed[provider or None] = cast(setting)
+    return parsed
+
+
+async def serve(args: argparse.Namespace):
+    server = MockPriceServer(args.host, args.port, args.volatility)
+    for option, setting, cast in (("latency", "latency", float), ("jitter", "jitter", float),
+                                  ("rate_limit", "rate_limit", float), ("quota", "quota", int),
+                                  ("diverge", "divergence", float)):
+        # Bare values apply to every provider first, then per-provider overrides
+        values = _provider_values(getattr(args, option), cast)
+        for provider in sorted(values, key=lambda name: name is not None):
+            server.configure(provider, **{setting: values[provider]})
+
+    await server.start()
+    print(f"✅ Mock price server listening on http://{args.host}:{server.port}")
+    print(f"   Fault settings and counters: http://{args.host}:{server.port}/_mock/config")
+    print(f"   Start the bot with: PRICE_API_ENDPOINTS='{json.dumps(server.endpoints())}'")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in for the bot's four price APIs")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--volatility", type=float, default=0.0001, help="relative random-walk step per quote")
+    parser.add_argument("--latency", action="append", metavar="[PROVIDER=]SECONDS", help="added response latency")
+    parser.add_argument("--jitter", action="append", metavar="[PROVIDER=]SECONDS", help="extra random latency")
+    parser.add_argument("--rate-limit", action="append", metavar="[PROVIDER=]SHARE",
+                        help="share of requests answered with 429 (0-1)")
+    parser.add_argument("--quota", action="append", metavar="[PROVIDER=]REQUESTS",
+                        help="requests served before the quota-exhausted response")
+    parser.add_argument("--diverge", action="append", metavar="[PROVIDER=]OFFSET",
+                        help="relative price offset for a provider (e.g. fmp=0.002)")
+    try:
+        asyncio.run(serve(parser.parse_args()))
+    except KeyboardInterrupt:
+        print("\nMock price server stopped")
+
+
+if __name__ == "__main__":
+    main()
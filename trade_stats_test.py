@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Trade Statistics Test Script
+Run this to verify closed trades reach the ledger and the /stats rollups exactly once,
+even when several tasks save them at the same time against a slow database
+"""
+
+import asyncio
+from types import SimpleNamespace
+
+from main import TradeStats
+
+
+class SlowTradeDatabase:
+    """Stand-in for BotDatabase.record_closed_trade with a ledger and a slow round trip"""
+
+    def __init__(self, latency: float = 0.05):
+        self.latency = latency
+        self.ledger = {}
+
+    async def record_closed_trade(self, trade, rollups):
+        await asyncio.sleep(self.latency)
+        if trade[0] in self.ledger:
+            return False  # ON CONFLICT DO NOTHING: already recorded
+        self.ledger[trade[0]] = rollups
+        return True
+
+
+def closed_trade(pair="EURUSD"):
+    return {"pair": pair, "action": "BUY", "entry": 1.1000, "tp1": 1.1020, "tp2": 1.1040,
+            "tp3": 1.1060, "sl": 1.0980, "tp_hits": ["tp1", "tp2"], "channel_id": "123"}
+
+
+async def test_concurrent_saves():
+    """Two trades closing together while the heartbeat retries the queue"""
+
+    print("🔍 Testing concurrent saves of closed trades...")
+    print("=" * 50)
+
+    db = SlowTradeDatabase()
+    stats = TradeStats(SimpleNamespace(db=db))
+
+    try:
+        await asyncio.gather(
+            stats.record_close("1001", closed_trade("EURUSD"), "tp3"),
+            stats.record_close("1002", closed_trade("GBPUSD"), "sl"),
+            stats.save_pending(),
+            stats.save_pending(),
+        )
+    except Exception as e:
+        print(f"❌ Saving failed: {e}")
+        return False
+
+    totals, by_pair, _ = stats.report("all")
+    checks = [
+        ("both trades written to the ledger", sorted(db.ledger) == ["1001", "1002"]),
+        ("nothing left waiting for retry", not stats.unsaved),
+        ("each trade counted once", totals.trades == 2 and totals.wins == 1 and totals.losses == 1),
+        ("per-pair rollups complete", set(by_pair) == {"EURUSD", "GBPUSD"}),
+    ]
+    for name, passed in checks:
+        print(f"{'✅' if passed else '❌'} {name}")
+
+    return all(passed for _, passed in checks)
+
+
+if __name__ == "__main__":
+    print("Discord Trading Bot - Trade Statistics Verification Tool")
+    print("=" * 60)
+
+    if asyncio.run(test_concurrent_saves()):
+        print("\n🎉 TRADE STATISTICS TEST PASSED!")
+    else:
+        print("\n❌ Trade statistics are out of step with the ledger")
+        raise SystemExit(1)